@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 10:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+from shop.indexes import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='supportrequest',
+            index=models.Index(condition=models.Q(('is_processed', False)), fields=['-id'], name='accounts_support_open_idx'),
+        ),
+    ]
@@ -9,5 +9,15 @@ class SupportRequest(models.Model):
     is_processed = models.BooleanField(default=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # The open requests, newest first, as the admin lists them.
+            models.Index(
+                fields=["-id"],
+                condition=models.Q(is_processed=False),
+                name="accounts_support_open_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.created_at:%Y-%m-%d %H:%M})"
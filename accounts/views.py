@@ -4,8 +4,9 @@ from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.views import generic
 
-from shop.mixins import OrderFilterMixin, BackUrlDetailMixin
+from shop.mixins import OrderFilterMixin, BackUrlDetailMixin, CursorPaginationMixin
 from shop.models import Order
+from shop.pagination import CachedCountPaginator
 from .forms import SignUpForm, SupportRequestForm, UserUpdateForm
 from django.contrib.auth import get_user_model
 
@@ -45,6 +46,8 @@ class UserListView(LoginRequiredMixin, UserPassesTestMixin, generic.ListView):
     context_object_name = "user_list"
     template_name = "accounts/user_list.html"
     paginate_by = 10
+    paginator_class = CachedCountPaginator
+    read_only = True
 
     def test_func(self):
         return self.request.user.is_staff or self.request.user.is_employee
@@ -73,12 +76,14 @@ class AccountUpdateView(LoginRequiredMixin, generic.UpdateView):
         return super().form_valid(form)
 
 
-class MyOrderListView(LoginRequiredMixin, OrderFilterMixin, generic.ListView):
+class MyOrderListView(LoginRequiredMixin, CursorPaginationMixin, OrderFilterMixin, generic.ListView):
     model = Order
     paginate_by = 10
+    paginator_class = CachedCountPaginator
     template_name = "accounts/myorder_list.html"
     context_object_name = "myorder_list"
     ordering = ["-created_at"]
+    cursor_ordering = ("-created_at", "-id")
 
     def get_base_queryset(self):
         return super().get_base_queryset().filter(user=self.request.user).order_by("-created_at")
@@ -13,3 +13,9 @@ python manage.py collectstatic --no-input
 
 # Apply any outstanding database migrations
 python manage.py migrate
+
+# The database cache's table, when REDIS_URL isn't set
+python manage.py createcachetable
+
+# Refuse to deploy with a per-process cache (shop.E001)
+python manage.py check --deploy --fail-level ERROR
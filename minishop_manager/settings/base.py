@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shop.instrumentation.SQLInstrumentationMiddleware',
+    'shop.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -127,3 +129,75 @@ LOGIN_URL = "accounts:login"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
+
+# "offset" (page numbers) or "cursor" (keyset links, no COUNT) for list views
+# that support both.
+PAGINATION_MODE = "offset"
+
+# Seconds a cart line holds its stock after the last cart change.
+CART_RESERVATION_TTL = 15 * 60
+
+# Where carts live: "database" (a "new" Order, written on every change and
+# holding stock), "session" or "cache" (no database writes until checkout;
+# pair "session" with a cache-based SESSION_ENGINE and "cache" with a shared
+# cache such as Redis or Memcached).
+CART_BACKEND = "database"
+
+# Seconds an idle cart is kept by the "cache" backend.
+CART_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# Seconds a rendered product card fragment is kept in the cache. Edits bump
+# a version in the key, so this only bounds how long unused entries linger.
+PRODUCT_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Record query count, database time and repeated queries per request, add
+# them as X-DB-* response headers and log them on the "shop.sql" logger, with
+# a warning for any SELECT repeated SQL_N_PLUS_ONE_THRESHOLD times or more.
+SQL_INSTRUMENTATION = False
+
+SQL_N_PLUS_ONE_THRESHOLD = 5
+
+# Serve the catalog read views (index, product and category list/detail)
+# with async views that use the async ORM. Only worth it under ASGI (uvicorn
+# minishop_manager.asgi:application); under WSGI each async view runs in
+# its own event loop.
+ASYNC_CATALOG_VIEWS = False
+
+# Steps the process_orders worker runs on each batch of "processing" orders
+# (see shop/fulfilment.py). Orders no step fails are marked "completed".
+ORDER_FULFILMENT_STEPS = [
+    "shop.fulfilment.require_items",
+]
+
+# Database aliases that views marked read_only read from (see
+# shop/routers.py). Writes always go to "default".
+DATABASE_ROUTERS = ["shop.routers.ReplicaRouter"]
+
+DATABASE_REPLICAS = []
+
+# Seconds a client keeps reading from the primary after a request that
+# wrote, so it sees its own changes while the replicas catch up.
+REPLICA_STICKY_SECONDS = 10
+
+# Rows each global dashboard counter (orders, products, categories, users)
+# is spread over; concurrent writes wait on one another only when they pick
+# the same row (see shop/counters.py).
+COUNTER_SHARDS = 16
+
+# Seconds the paginated list views keep the COUNT(*) of a filtered query
+# (see shop.pagination.CachedCountPaginator). Creating or deleting a row
+# drops the counts of its model sooner; an edit that moves a row in or out of
+# a filter, like an order status change, shows once the count expires.
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+
+# A per-process cache, only for the single development server process:
+# cache versions and cache carts must be shared by every worker, so
+# production uses Redis or the database cache (see prod.py), and
+# "check --deploy" fails on this one (shop.E001).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # Room for the version keys that never expire next to the fragments.
+        'OPTIONS': {'MAX_ENTRIES': 10_000},
+    }
+}
@@ -34,5 +34,70 @@ DATABASES = {
    }
 }
 
+# Reusing connections saves each request the TCP and TLS handshakes and the
+# Postgres backend startup. By default each worker thread keeps its
+# connection for POSTGRES_CONN_MAX_AGE seconds and checks it is still alive
+# before reusing it. POSTGRES_POOL=1 switches to psycopg's connection pool
+# instead. The pool comes with psycopg 3 (psycopg-pool), which Django uses
+# over psycopg2 when both are installed. Django doesn't allow a pool
+# together with persistent connections.
+# Under ASGI (DJANGO_SERVER=asgi, e.g. uvicorn minishop_manager.asgi:application)
+# requests don't keep to one thread, so persistent connections aren't reused
+# and pile up; there connections are closed after each request unless the
+# pool is on.
+if os.environ.get('POSTGRES_POOL', '').lower() in ('1', 'true', 'yes'):
+   DATABASES['default']['CONN_MAX_AGE'] = 0
+   DATABASES['default']['OPTIONS']['pool'] = {
+       'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', 2)),
+       'max_size': int(os.environ.get('POSTGRES_POOL_MAX_SIZE', 10)),
+       # Seconds a request waits for a free connection before failing.
+       'timeout': float(os.environ.get('POSTGRES_POOL_TIMEOUT', 10)),
+       # Seconds an idle connection above min_size is kept open.
+       'max_idle': float(os.environ.get('POSTGRES_POOL_MAX_IDLE', 600)),
+   }
+elif os.environ.get('DJANGO_SERVER', 'wsgi').lower() == 'asgi':
+   DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+   DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('POSTGRES_CONN_MAX_AGE', 60))
+   DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Hot standbys of the primary, as a comma-separated list of hosts. They use
+# the primary's settings otherwise, and tests treat them as mirrors of it.
+for number, host in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+   DATABASES[f'replica_{number}'] = {
+       **DATABASES['default'],
+       'HOST': host.strip(),
+       'OPTIONS': {**DATABASES['default']['OPTIONS']},
+       'TEST': {'MIRROR': 'default'},
+   }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# Set when connecting through PgBouncer in transaction pooling mode, which
+# can't keep the server-side cursors QuerySet.iterator() opens.
+DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = (
+   os.environ.get('POSTGRES_DISABLE_SERVER_SIDE_CURSORS', '').lower() in ('1', 'true', 'yes')
+)
+
+# A cache shared by all workers, so a change one of them makes (a product
+# card or category version bump, a cache cart) is seen by the others:
+# Redis at REDIS_URL, or else a table in the primary database, created by
+# "manage.py createcachetable" in build.sh.
+if os.environ.get('REDIS_URL'):
+   CACHES = {
+       'default': {
+           'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+           'LOCATION': os.environ['REDIS_URL'],
+       }
+   }
+else:
+   CACHES = {
+       'default': {
+           'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+           'LOCATION': 'django_cache',
+           'OPTIONS': {'MAX_ENTRIES': 100_000},
+       }
+   }
+
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -0,0 +1,9 @@
+from .dev import *
+
+
+# The router tests read from a second database standing in for a replica.
+# It isn't a copy of default, so it stays out of DATABASE_REPLICAS here.
+DATABASES['replica'] = {
+   'ENGINE': 'django.db.backends.sqlite3',
+   'NAME': BASE_DIR / 'db_replica.sqlite3',
+}
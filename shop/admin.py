@@ -32,21 +32,38 @@ class ProductCategoryAdmin(admin.ModelAdmin):
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ("name", "price", "category", "stock_quantity")
+    list_select_related = ("category",)
     search_fields = ("name",)
     list_filter = ("category",)
 
 
+def status_action(status, label):
+    @admin.action(description=f"Mark selected orders as {label.lower()}")
+    def action(modeladmin, request, queryset):
+        changed = queryset.set_status(status)
+        modeladmin.message_user(request, f"{changed} orders marked as {label.lower()}.")
+
+    action.__name__ = f"mark_{status}"
+    return action
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "created_at", "status")
+    list_select_related = ("user",)
     list_filter = ("status", "created_at")
     search_fields = ("user__username",)
+    actions = [
+        status_action(status, label) for status, label in Order.STATUS_CHOICES
+        if status in Order.STATUS_TRANSITIONS
+    ]
 
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ("order", "get_order_user", "product", "quantity", "get_order_status")
     list_filter = ("product",)
+    list_select_related = ("order__user", "product")
 
     def get_order_user(self, obj):
         return obj.order.user
@@ -1,5 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_backend(sender, using, **kwargs):
+    from django.db import connections
+    from shop.search import install_search_backend
+
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        install_search_backend(connection)
 
 
 class ShopConfig(AppConfig):
     name = 'shop'
+
+    def ready(self):
+        post_migrate.connect(ensure_search_backend, sender=self)
+
+        from shop import checks, signals  # noqa: F401
@@ -0,0 +1,55 @@
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import render
+
+from shop import views
+from shop.categories import aget_category_index
+from shop.counters import adashboard_counts
+from shop.mixins import AsyncDetailMixin, AsyncLoginRequiredMixin, AsyncPaginationMixin
+from shop.models import Product
+
+
+# Async versions of the catalog read views for ASGI deployments (see
+# ASYNC_CATALOG_VIEWS). They reuse the synchronous views' querysets and
+# templates, but run every query through the async ORM before rendering,
+# so the template never touches the database.
+
+
+async def index(request):
+    request.user = await request.auser()
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    context = await adashboard_counts(request.user)
+    return render(request, 'shop/index.html', context=context)
+
+
+class ProductListView(AsyncLoginRequiredMixin, AsyncPaginationMixin, views.ProductListView):
+    def get_filter_form(self):
+        form = super().get_filter_form()
+        form.fields["category"].set_index(self.category_index)
+        return form
+
+    async def get(self, request, *args, **kwargs):
+        self.category_index = await aget_category_index()
+        return await super().get(request, *args, **kwargs)
+
+
+class ProductDetailView(AsyncLoginRequiredMixin, AsyncDetailMixin, views.ProductDetailView):
+    pass
+
+
+class ProductCategoryListView(AsyncLoginRequiredMixin, AsyncPaginationMixin, views.ProductCategoryListView):
+    pagination_mode = "offset"
+
+
+class ProductCategoryDetailView(AsyncLoginRequiredMixin, AsyncDetailMixin, views.ProductCategoryDetailView):
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["products"] = self.products
+        return context
+
+    async def get(self, request, *args, **kwargs):
+        self.products = [
+            product async for product in
+            Product.objects.filter(category_id=self.kwargs["pk"]).select_related("category")
+        ]
+        return await super().get(request, *args, **kwargs)
@@ -0,0 +1,323 @@
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from shop.models import Order, OrderItem, Product
+from shop.reservations import get_held_quantities, reserve_line, sync_reservations
+
+
+class CartLine:
+    def __init__(self, product, quantity):
+        self.id = product.pk
+        self.product = product
+        self.product_id = product.pk
+        self.quantity = quantity
+        self.unit_price = product.price
+        self.line_total = quantity * Decimal(product.price)
+
+
+class DatabaseCart:
+    # The cart is the user's "new" Order; every change is written through
+    # and holds stock with reservations.
+    def __init__(self, request):
+        self.user = request.user
+
+    def get_context_data(self):
+        order = Order.objects.filter(
+            user=self.user,
+            status="new"
+        ).prefetch_related("items__product").first()
+        items = list(order.items.all()) if order else []
+        return {
+            "order": order,
+            "items": items,
+            "total": order.total if order else Decimal("0.00"),
+        }
+
+    def addable_quantity(self, product):
+        # Units held by this cart aren't part of available_quantity, so an
+        # add within it can't exceed the cart's share of the stock.
+        return product.available_quantity
+
+    def add(self, product, quantity):
+        # Returns the units added, which the stock left may cut short.
+        with transaction.atomic():
+            # The partial unique constraint turns a concurrent duplicate
+            # "new" order into an IntegrityError that get_or_create recovers
+            # from. The order is locked before the product, as sync_reservations
+            # and checkout take them.
+            order, _ = Order.objects.select_for_update().get_or_create(
+                user=self.user,
+                status="new"
+            )
+            product = Product.objects.lock_for_order(order, product.pk)
+            added = OrderItem.objects.add_quantity(order, product, quantity)
+            if added:
+                reserve_line(order, product, product.in_cart + added)
+                order.update_totals()
+        return added
+
+    def get_line(self, pk):
+        return get_object_or_404(
+            OrderItem.objects.select_related("order", "product"),
+            pk=pk,
+            order__user=self.user,
+            order__status="new"
+        )
+
+    def max_quantity(self, item):
+        held = get_held_quantities(item.order).get(item.product_id, 0)
+        return item.product.available_quantity + held
+
+    def set_quantity(self, item, quantity):
+        with transaction.atomic():
+            # Saving and deleting a line update the order's totals.
+            item.quantity = quantity
+            item.save()
+            sync_reservations(item.order)
+
+    def remove(self, item):
+        with transaction.atomic():
+            item.delete()
+            sync_reservations(item.order)
+
+    def checkout(self):
+        with transaction.atomic():
+            order = Order.objects.select_for_update().filter(
+                user=self.user,
+                status="new"
+            ).first()
+            if not order:
+                return None
+
+            quantities = dict(order.items.values_list("product_id", "quantity"))
+            held = get_held_quantities(order, lock=True)
+            Product.objects.decrement_stock(quantities, held)
+            order.reservations.all().delete()
+
+            order.items.snapshot_prices()
+            order.status = "processing"
+            order.save(update_fields=["status"])
+            order.update_totals()
+        return order
+
+
+# Seconds a cache cart change may hold the cart's lock; a lock left by a
+# crashed worker expires after this, so a change waits no longer for it.
+CART_LOCK_TIMEOUT = 5
+
+
+class CartBusy(Exception):
+    pass
+
+
+class StoredCart(ABC):
+    # Keeps {product_id: quantity} outside the database and only writes the
+    # Order and its lines at checkout. Nothing is reserved while browsing,
+    # so stock is checked once, when the order is confirmed.
+    def __init__(self, request):
+        self.request = request
+        self.user = request.user
+
+    @abstractmethod
+    def load(self):
+        pass
+
+    @abstractmethod
+    def save(self, quantities):
+        pass
+
+    def changing(self):
+        # Wraps each read-modify-write of the stored quantities.
+        return nullcontext()
+
+    def get_quantities(self):
+        return {
+            int(product_id): quantity
+            for product_id, quantity in (self.load() or {}).items()
+        }
+
+    def set_quantities(self, quantities):
+        self.save({
+            str(product_id): quantity
+            for product_id, quantity in quantities.items()
+        })
+
+    def get_lines(self, quantities, lock=False):
+        products = Product.objects.all()
+        if lock:
+            # In primary key order, as ProductQuerySet.lock takes them.
+            products = products.select_for_update().order_by("pk")
+        products = products.in_bulk(quantities)
+        return [
+            CartLine(products[product_id], quantity)
+            for product_id, quantity in quantities.items()
+            if product_id in products
+        ]
+
+    def get_context_data(self):
+        items = self.get_lines(self.get_quantities())
+        return {
+            "order": None,
+            "items": items,
+            "total": sum((item.line_total for item in items), Decimal("0.00")),
+        }
+
+    def addable_quantity(self, product):
+        in_cart = self.get_quantities().get(product.pk, 0)
+        return max(product.available_quantity - in_cart, 0)
+
+    def add(self, product, quantity):
+        with self.changing():
+            quantities = self.get_quantities()
+            quantities[product.pk] = quantities.get(product.pk, 0) + quantity
+            self.set_quantities(quantities)
+        return quantity
+
+    def get_line(self, pk):
+        quantities = self.get_quantities()
+        if pk not in quantities:
+            raise Http404("No such item in the cart.")
+        return CartLine(get_object_or_404(Product, pk=pk), quantities[pk])
+
+    def max_quantity(self, line):
+        return line.product.available_quantity
+
+    def set_quantity(self, line, quantity):
+        with self.changing():
+            quantities = self.get_quantities()
+            quantities[line.product_id] = quantity
+            self.set_quantities(quantities)
+
+    def remove(self, line):
+        with self.changing():
+            quantities = self.get_quantities()
+            quantities.pop(line.product_id, None)
+            self.set_quantities(quantities)
+
+    def checkout(self):
+        # The lines are taken out of the cart under the lock, but the order
+        # is placed outside it: waiting on product row locks must not keep
+        # the cart locked. They go back if no order is placed.
+        with self.changing():
+            quantities = self.get_quantities()
+            self.set_quantities({})
+        try:
+            order = self.place_order(quantities)
+        except Exception:
+            self.put_back(quantities)
+            raise
+        if not order:
+            self.put_back(quantities)
+        return order
+
+    def put_back(self, quantities):
+        if not quantities:
+            return
+        with self.changing():
+            current = self.get_quantities()
+            for product_id, quantity in quantities.items():
+                current[product_id] = current.get(product_id, 0) + quantity
+            self.set_quantities(current)
+
+    def place_order(self, quantities):
+        if not quantities:
+            return None
+
+        with transaction.atomic():
+            # The products are locked before their prices are read, so a
+            # price change can't land between the read and the order.
+            lines = self.get_lines(quantities, lock=True)
+            if not lines:
+                return None
+            Product.objects.decrement_stock(
+                {line.product_id: line.quantity for line in lines}
+            )
+            order = Order.objects.create(
+                user=self.user,
+                status="processing",
+                total=sum(line.line_total for line in lines),
+                item_count=sum(line.quantity for line in lines),
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product_id=line.product_id,
+                    quantity=line.quantity,
+                    unit_price=line.unit_price,
+                    line_total=line.line_total,
+                )
+                for line in lines
+            ])
+        return order
+
+
+class SessionCart(StoredCart):
+    session_key = "cart"
+
+    def load(self):
+        return self.request.session.get(self.session_key)
+
+    def save(self, quantities):
+        self.request.session[self.session_key] = quantities
+
+
+class CacheCart(StoredCart):
+    def get_cache_key(self):
+        return f"shop:cart:{self.user.pk}"
+
+    def load(self):
+        return cache.get(self.get_cache_key())
+
+    def save(self, quantities):
+        if quantities:
+            cache.set(
+                self.get_cache_key(), quantities, settings.CART_CACHE_TIMEOUT
+            )
+        else:
+            cache.delete(self.get_cache_key())
+
+    @contextmanager
+    def changing(self):
+        # cache.add() is atomic on a shared cache, so changes from two tabs
+        # or workers take turns instead of overwriting each other's lines.
+        # The lock holds a token of its own, so a change that outlived
+        # CART_LOCK_TIMEOUT doesn't release the next holder's lock.
+        key = f"{self.get_cache_key()}:lock"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + CART_LOCK_TIMEOUT
+        while not cache.add(key, token, CART_LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                raise CartBusy(self.user.pk)
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if cache.get(key) == token:
+                cache.delete(key)
+
+
+CART_BACKENDS = {
+    "database": DatabaseCart,
+    "session": SessionCart,
+    "cache": CacheCart,
+}
+
+
+def get_cart(request):
+    try:
+        backend = CART_BACKENDS[settings.CART_BACKEND]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"CART_BACKEND must be one of {', '.join(CART_BACKENDS)}."
+        )
+    return backend(request)
@@ -0,0 +1,82 @@
+import time
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from shop.models import ProductCategory
+
+
+INDEX_KEY = "shop:category-index"
+VERSION_KEY = "shop:category-index-version"
+
+# Process-local copy: (version, [(pk, name), ...], {pk: name}).
+_local_index = (None, [], {})
+
+
+def bump_category_version():
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def get_index_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def aget_index_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def cached_choices(cached, version):
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    return None
+
+
+def set_local_index(version, choices):
+    global _local_index
+    _local_index = (version, choices, dict(choices))
+    return _local_index
+
+
+def index_queryset():
+    # Always from the primary: read-only views route to replicas, and a list
+    # read from one that hasn't caught up with the change behind a version
+    # bump would be cached under the new version.
+    return ProductCategory.objects.using(DEFAULT_DB_ALIAS).order_by("id").values_list("id", "name")
+
+
+def get_category_index():
+    # One cache read per call while the version is unchanged; the shared
+    # entry saves each process its own query after a bump.
+    version = get_index_version()
+    if _local_index[0] == version:
+        return _local_index
+
+    choices = cached_choices(cache.get(INDEX_KEY), version)
+    if choices is None:
+        choices = list(index_queryset())
+        cache.set(INDEX_KEY, (version, choices), None)
+    return set_local_index(version, choices)
+
+
+async def aget_category_index():
+    version = await aget_index_version()
+    if _local_index[0] == version:
+        return _local_index
+
+    choices = cached_choices(await cache.aget(INDEX_KEY), version)
+    if choices is None:
+        choices = [choice async for choice in index_queryset()]
+        await cache.aset(INDEX_KEY, (version, choices), None)
+    return set_local_index(version, choices)
+
+
+def category_choices():
+    return get_category_index()[1]
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# Product card and list count versions, the category index and cache carts
+# are shared between workers through the default cache. In a per-process
+# cache a change made in one worker is never seen by the others.
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            "The default cache is local to each process.",
+            hint=(
+                "Use a cache shared by all workers, e.g. Redis (REDIS_URL) or "
+                "the database cache (see minishop_manager/settings/prod.py)."
+            ),
+            id="shop.E001",
+        )
+    ]
@@ -0,0 +1,117 @@
+import random
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from shop.models import Counter
+
+
+GLOBAL_COUNTERS = {
+    "categories": "shop.ProductCategory",
+    "products": "shop.Product",
+    "users": "shop.User",
+    "orders": "shop.Order",
+}
+
+USER_ORDERS_PREFIX = "orders:user:"
+
+
+def user_orders_key(user_pk):
+    return f"{USER_ORDERS_PREFIX}{user_pk}"
+
+
+def increment(name, delta=1):
+    # Every order, product, category and user write bumps a global count
+    # inside its transaction; a random shard keeps them from queueing on a
+    # single row lock until commit. Per-user counts stay on one row.
+    shard = random.randrange(settings.COUNTER_SHARDS) if name in GLOBAL_COUNTERS else 0
+    counter = Counter.objects.filter(name=name, shard=shard)
+    if not counter.update(value=F("value") + delta):
+        # First write for this shard (e.g. a user's first order); a concurrent
+        # creator wins the unique constraint and the update is retried.
+        Counter.objects.get_or_create(name=name, shard=shard)
+        counter.update(value=F("value") + delta)
+
+
+def summed(names):
+    return (
+        Counter.objects.
+        filter(name__in=names).
+        order_by().
+        values("name").
+        annotate(total=Sum("value")).
+        values_list("name", "total")
+    )
+
+
+def get_counts(names):
+    values = dict(summed(names))
+    return {name: values.get(name, 0) for name in names}
+
+
+async def aget_counts(names):
+    values = {name: value async for name, value in summed(names)}
+    return {name: values.get(name, 0) for name in names}
+
+
+def dashboard_counts(user):
+    return dashboard_context(
+        user, get_counts([*GLOBAL_COUNTERS, user_orders_key(user.pk)])
+    )
+
+
+async def adashboard_counts(user):
+    return dashboard_context(
+        user, await aget_counts([*GLOBAL_COUNTERS, user_orders_key(user.pk)])
+    )
+
+
+def dashboard_context(user, counts):
+    return {
+        "num_categories": counts["categories"],
+        "num_products": counts["products"],
+        "num_users": counts["users"],
+        "num_orders": counts["orders"],
+        "num_myorders": counts[user_orders_key(user.pk)],
+    }
+
+
+def recount():
+    Order = apps.get_model("shop", "Order")
+
+    values = {
+        name: apps.get_model(label).objects.count()
+        for name, label in GLOBAL_COUNTERS.items()
+    }
+    values.update(
+        (user_orders_key(user_pk), count)
+        for user_pk, count in (
+            Order.objects.order_by().values_list("user").annotate(count=Count("pk"))
+        )
+    )
+
+    with transaction.atomic():
+        # The whole count goes into shard 0; the other shards' rows are
+        # kept for the next increments.
+        Counter.objects.bulk_create(
+            [Counter(name=name, value=value) for name, value in values.items()],
+            update_conflicts=True,
+            unique_fields=["name", "shard"],
+            update_fields=["value"],
+            batch_size=1000,
+        )
+        Counter.objects.filter(name__in=GLOBAL_COUNTERS, shard__gt=0).update(value=0)
+        # Users whose orders are all gone keep no row at all.
+        stale = [
+            name for name in (
+                Counter.objects.
+                filter(name__startswith=USER_ORDERS_PREFIX).
+                values_list("name", flat=True)
+            )
+            if name not in values
+        ]
+        for start in range(0, len(stale), 1000):
+            Counter.objects.filter(name__in=stale[start:start + 1000]).delete()
+    return values, len(stale)
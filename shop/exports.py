@@ -0,0 +1,84 @@
+import csv
+import json
+from itertools import islice
+
+from shop.models import OrderItem
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = {
+    "orders": [
+        ("id", "id"),
+        ("created_at", "created_at"),
+        ("status", "status"),
+        ("user", "user__username"),
+        ("item_count", "item_count"),
+        ("total", "total"),
+    ],
+    "lines": [
+        ("order_id", "order_id"),
+        ("order_created_at", "order__created_at"),
+        ("order_status", "order__status"),
+        ("user", "order__user__username"),
+        ("product_id", "product_id"),
+        ("product", "product__name"),
+        ("quantity", "quantity"),
+        ("unit_price", "unit_price"),
+        ("line_total", "line_total"),
+    ],
+}
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def export_rows(orders, kind="orders", chunk_size=EXPORT_CHUNK_SIZE):
+    # Plain tuples in primary key order, fetched chunk by chunk (a server-side
+    # cursor on PostgreSQL), so memory doesn't grow with the export size.
+    fields = [field for _, field in EXPORT_COLUMNS[kind]]
+    if kind == "lines":
+        queryset = OrderItem.objects.filter(
+            order__in=orders.order_by().values("pk")
+        )
+    else:
+        queryset = orders
+    return queryset.order_by("pk").values_list(*fields).iterator(
+        chunk_size=chunk_size
+    )
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def render_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for batch in batched(rows, EXPORT_CHUNK_SIZE):
+        yield "".join(writer.writerow(row) for row in batch)
+
+
+def render_jsonl(header, rows):
+    for batch in batched(rows, EXPORT_CHUNK_SIZE):
+        yield "".join(
+            json.dumps(dict(zip(header, row)), default=str) + "\n"
+            for row in batch
+        )
+
+
+def render_export(orders, kind="orders", export_format="csv"):
+    header = [column for column, _ in EXPORT_COLUMNS[kind]]
+    rows = export_rows(orders, kind)
+    if export_format == "jsonl":
+        return render_jsonl(header, rows)
+    return render_csv(header, rows)
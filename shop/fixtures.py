@@ -0,0 +1,204 @@
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from shop.categories import bump_category_version
+from shop.counters import recount
+from shop.fragments import bump_versions
+from shop.models import Order, OrderItem, Product, ProductCategory
+
+
+DEFAULT_FIXTURE_MODELS = [
+    "shop.User",
+    "shop.ProductCategory",
+    "shop.Product",
+    "shop.Order",
+    "shop.OrderItem",
+    "accounts.SupportRequest",
+]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def sorted_models(models):
+    app_list = defaultdict(list)
+    for model in models:
+        app_list[model._meta.app_config].append(model)
+    return serializers.sort_dependencies(app_list.items(), allow_cycles=True)
+
+
+def stream_records(file, read_size=1 << 16):
+    # Yields the objects of a top-level JSON array one by one, keeping only
+    # the current read window in memory.
+    decoder = json.JSONDecoder()
+    buffer, position, eof, opened = "", 0, False, False
+    while True:
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            chunk = file.read(read_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+
+        if position >= len(buffer):
+            if opened:
+                raise ValueError("Unexpected end of fixture.")
+            return
+        if not opened:
+            if buffer[position] != "[":
+                raise ValueError("A fixture must be a JSON array.")
+            opened = True
+            position += 1
+            continue
+        if buffer[position] == "]":
+            return
+
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(read_size)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+        yield record
+
+
+def raw_insert(model, objs, using=DEFAULT_DB_ALIAS):
+    # The insert save_base(raw=True) performs, batched: values are stored as
+    # given, so objects need their pk and auto_now fields aren't overwritten.
+    connection = connections[using]
+    fields = model._meta.local_concrete_fields
+    size = connection.ops.bulk_batch_size(fields, objs) or len(objs)
+    manager = model._base_manager.using(using)
+    for chunk in batched(objs, size):
+        manager._insert(chunk, fields=fields, raw=True, using=using)
+
+
+def reset_sequences(models, using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+class FixtureLoader:
+    # Inserts deserialized objects per model in batches with raw inserts, so
+    # no save() overrides or model signals run. Meant for empty tables; rows
+    # that already exist fail the load instead of being updated.
+    def __init__(self, using=DEFAULT_DB_ALIAS, batch_size=2000):
+        self.using = using
+        self.batch_size = batch_size
+        self.pending = defaultdict(list)
+        self.loaded = defaultdict(int)
+
+    def load(self, records):
+        connection = connections[self.using]
+        with transaction.atomic(using=self.using):
+            with connection.constraint_checks_disabled():
+                for record in records:
+                    self.add(record)
+                for model in sorted_models(list(self.pending)):
+                    self.flush(model)
+            connection.check_constraints(
+                table_names=[model._meta.db_table for model in self.loaded]
+            )
+            reset_sequences(list(self.loaded), self.using)
+        return {model: self.loaded[model] for model in sorted_models(list(self.loaded))}
+
+    def add(self, record):
+        for deserialized in PythonDeserializer(
+            [record], using=self.using, ignorenonexistent=True
+        ):
+            model = type(deserialized.object)
+            if deserialized.object.pk is None:
+                raise ValueError(f"A {model._meta.label} record has no pk.")
+            self.pending[model].append(deserialized)
+            if len(self.pending[model]) >= self.batch_size:
+                self.flush(model)
+
+    def flush(self, model):
+        batch, self.pending[model] = self.pending[model], []
+        if not batch:
+            return
+
+        raw_insert(model, [deserialized.object for deserialized in batch], self.using)
+
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            source = f"{field.m2m_field_name()}_id"
+            target = f"{field.m2m_reverse_field_name()}_id"
+            through._base_manager.using(self.using).bulk_create(
+                [
+                    through(**{source: deserialized.object.pk, target: value})
+                    for deserialized in batch
+                    for value in deserialized.m2m_data.get(field.name, [])
+                ],
+                batch_size=self.batch_size,
+            )
+        self.loaded[model] += len(batch)
+
+
+def refresh_derived_data(loaded_models):
+    # Raw inserts skip OrderItem.save() and the model signals, so the
+    # snapshotted prices, order totals, counters and cache versions are
+    # brought up to date once after the load.
+    if OrderItem in loaded_models:
+        OrderItem.objects.filter(unit_price__isnull=True).snapshot_prices()
+        Order.objects.filter(
+            pk__in=OrderItem.objects.filter(order__item_count=0).values("order_id")
+        ).update_totals()
+
+    recount()
+
+    if ProductCategory in loaded_models:
+        bump_category_version()
+        for pks in batched(
+            ProductCategory.objects.values_list("pk", flat=True).iterator(), 5000
+        ):
+            bump_versions("category", pks)
+    if Product in loaded_models:
+        for pks in batched(Product.objects.values_list("pk", flat=True).iterator(), 5000):
+            bump_versions("product", pks)
+
+
+def get_fixture_models(labels):
+    models = []
+    for label in labels or DEFAULT_FIXTURE_MODELS:
+        if "." in label:
+            models.append(apps.get_model(label))
+        else:
+            models.extend(apps.get_app_config(label).get_models())
+    return sorted_models(models)
+
+
+def dump_records(models, chunk_size=2000):
+    serializer = serializers.get_serializer("python")()
+    for model in models:
+        queryset = model._default_manager.order_by(model._meta.pk.name)
+        m2m = [field.name for field in model._meta.many_to_many]
+        if m2m:
+            queryset = queryset.prefetch_related(*m2m)
+        for chunk in batched(queryset.iterator(chunk_size=chunk_size), chunk_size):
+            yield from serializer.serialize(chunk)
+
+
+def write_fixture(records, output, indent=None):
+    output.write("[")
+    for index, record in enumerate(records):
+        output.write(",\n" if index else "\n")
+        output.write(json.dumps(record, cls=DjangoJSONEncoder, indent=indent))
+    output.write("\n]\n")
@@ -1,11 +1,90 @@
+from datetime import date, datetime, time, timedelta
+
 from django import forms
+from django.utils import timezone
+from shop.categories import get_category_index
 from shop.models import Product, Order, ProductCategory
+from shop.search import search_orders
+
+
+def day_start(day):
+    # Midnight starting the day in the active timezone. Comparing
+    # created_at against it keeps the column bare for its index, unlike
+    # created_at__date, which casts every row.
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class CategoryChoiceField(forms.ChoiceField):
+    # A ModelChoiceField over ProductCategory that takes its options and
+    # validation from the cached category index instead of the database.
+    # The cleaned value is an unsaved ProductCategory carrying the pk, which
+    # is all a filter needs. The index can briefly lag a category created or
+    # deleted elsewhere, so a pk missing from it is looked up in the
+    # database, and with verify=True (forms that save the pk as a foreign
+    # key) every pk is.
+    index = None
+
+    def __init__(self, *, empty_label="---------", verify=False, **kwargs):
+        self.empty_label = empty_label
+        self.verify = verify
+        super().__init__(choices=self.get_choices, **kwargs)
+
+    def set_index(self, index):
+        # Async views pass an index loaded with aget_category_index(), so
+        # neither validation nor rendering can fall back to a sync query.
+        # Choices are reassigned because a form's copy of the field shares
+        # the widget choices of the declared field.
+        self.index = index
+        self.choices = self.get_choices
+
+    def get_index(self):
+        return self.index or get_category_index()
+
+    def get_choices(self):
+        return [("", self.empty_label), *self.get_index()[1]]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, ProductCategory):
+            return value
+        invalid = forms.ValidationError(
+            self.error_messages["invalid_choice"],
+            code="invalid_choice",
+            params={"value": value},
+        )
+        try:
+            pk = int(value)
+        except (TypeError, ValueError):
+            raise invalid
+        name = self.get_index()[2].get(pk)
+        # An index set by an async view was loaded for this request, and a
+        # query here would be a sync one.
+        if self.verify or (name is None and self.index is None):
+            category = ProductCategory.objects.filter(pk=pk).first()
+            if category is None:
+                raise invalid
+            return category
+        if name is None:
+            raise invalid
+        return ProductCategory(pk=pk, name=name)
+
+    def validate(self, value):
+        forms.Field.validate(self, value)
+
+    def prepare_value(self, value):
+        if isinstance(value, ProductCategory):
+            return value.pk
+        return value
 
 
 class ProductForm(forms.ModelForm):
+    category = CategoryChoiceField(verify=True)
+
     class Meta:
         model = Product
         fields = [
+            "sku",
             "name",
             "description",
             "price",
@@ -37,19 +116,59 @@ class ProductCategorySearchForm(forms.Form):
     )
 
 
+# Statuses staff can move an order to. "new" isn't one: a new order is the
+# user's cart, and each user has at most one.
+ORDER_STATUS_TARGETS = [
+    (status, label) for status, label in Order.STATUS_CHOICES
+    if status in Order.STATUS_TRANSITIONS
+]
+
+
 class OrderStatusUpdateForm(forms.ModelForm):
+    status = forms.ChoiceField(choices=ORDER_STATUS_TARGETS)
+
     class Meta:
         model = Order
         fields = ["status"]
 
 
+class OrderBulkStatusForm(forms.Form):
+    SCOPE_CHOICES = [
+        ("selected", "Selected orders"),
+        ("filtered", "All orders matching the filter"),
+    ]
+
+    status = forms.ChoiceField(
+        choices=ORDER_STATUS_TARGETS,
+        widget=forms.Select(attrs={"class": "form-control"}),
+    )
+    scope = forms.ChoiceField(
+        choices=SCOPE_CHOICES,
+        initial="selected",
+        widget=forms.Select(attrs={"class": "form-control"}),
+    )
+    orders = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+
+    def clean_orders(self):
+        try:
+            return [int(pk) for pk in self.cleaned_data["orders"] or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Invalid order selection.")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("scope") == "selected" and not cleaned_data.get("orders"):
+            raise forms.ValidationError("Select at least one order.")
+        return cleaned_data
+
+
 class OrderFilterForm(forms.Form):
     name = forms.CharField(
         max_length=100,
         required=False,
         label="",
         widget=forms.TextInput(attrs={
-            "placeholder": "Order ID or user",
+            "placeholder": "Order ID or user (#id, @username)",
             "class": "form-control",
         }),
     )
@@ -95,6 +214,32 @@ class OrderFilterForm(forms.Form):
         }),
     )
 
+    def filter_queryset(self, queryset):
+        name = self.cleaned_data.get("name")
+        status = self.cleaned_data.get("status")
+        total_min = self.cleaned_data.get("total_min")
+        total_max = self.cleaned_data.get("total_max")
+        date_from = self.cleaned_data.get("date_from")
+        date_to = self.cleaned_data.get("date_to")
+
+        if name:
+            queryset = search_orders(queryset, name)
+
+        if status:
+            queryset = queryset.filter(status=status)
+
+        if total_min is not None:
+            queryset = queryset.filter(total__gte=total_min)
+        if total_max is not None:
+            queryset = queryset.filter(total__lte=total_max)
+
+        if date_from:
+            queryset = queryset.filter(created_at__gte=day_start(date_from))
+        # There is no day after date.max to stop before.
+        if date_to and date_to < date.max:
+            queryset = queryset.filter(created_at__lt=day_start(date_to + timedelta(days=1)))
+        return queryset
+
 
 class ProductFilterForm(forms.Form):
     name = forms.CharField(
@@ -107,9 +252,8 @@ class ProductFilterForm(forms.Form):
         })
     )
 
-    category = forms.ModelChoiceField(
+    category = CategoryChoiceField(
         required=False,
-        queryset=ProductCategory.objects.all(),
         widget=forms.Select(attrs={
             "class": "form-control",
             "placeholder": "Category",
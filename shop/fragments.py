@@ -0,0 +1,92 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from shop.routers import reading_from_replica
+
+
+PRODUCT_CARD_TEMPLATE = "includes/product_card.html"
+
+# Per-process hit/miss tally of the product card cache.
+card_cache_stats = {"hits": 0, "misses": 0}
+
+
+def version_key(kind, pk):
+    return f"shop:card-version:{kind}:{pk}"
+
+
+def bump_version(kind, pk):
+    # A fresh timestamp rather than incr(): if a version key is evicted it
+    # comes back with a new value, so an old fragment can never match again.
+    cache.set(version_key(kind, pk), time.time_ns(), None)
+
+
+def bump_versions(kind, pks):
+    version = time.time_ns()
+    cache.set_many({version_key(kind, pk): version for pk in pks}, None)
+
+
+def may_predate_replica(versions):
+    # A version bumped within REPLICA_STICKY_SECONDS, the lag the replicas
+    # are allowed, may be newer than the rows a replica returned.
+    recent = time.time_ns() - settings.REPLICA_STICKY_SECONDS * 1_000_000_000
+    return any(version > recent for version in versions)
+
+
+def card_key(pk, show_category):
+    return f"shop:product-card:{int(show_category)}:{pk}"
+
+
+def card_version_keys(product):
+    return [
+        version_key("product", product.pk),
+        version_key("category", product.category_id),
+    ]
+
+
+def render_product_cards(products, show_category=True):
+    # Returns [(product, card html)] for a page of products. The versions
+    # and cached cards of the whole page are read with one get_many. A card
+    # is stored along with the versions it was rendered at, and reused only
+    # while both are still current.
+    products = list(products)
+    version_keys = {key for product in products for key in card_version_keys(product)}
+    cached = cache.get_many([
+        *version_keys,
+        *(card_key(product.pk, show_category) for product in products),
+    ])
+    missing = version_keys - cached.keys()
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        cached.update(cache.get_many(missing))
+
+    # A card rendered from a replica's rows is only stored once its
+    # versions are older than the replica lag, so the replica can't have
+    # served the rows from before the bump under the new versions.
+    from_replica = reading_from_replica()
+    cards = []
+    rendered = {}
+    for product in products:
+        key = card_key(product.pk, show_category)
+        versions = [cached.get(version) for version in card_version_keys(product)]
+        entry = cached.get(key)
+        if entry is not None and entry[0] == versions:
+            card_cache_stats["hits"] += 1
+            html = entry[1]
+        else:
+            card_cache_stats["misses"] += 1
+            html = str(render_to_string(
+                PRODUCT_CARD_TEMPLATE,
+                {"product": product, "show_category": show_category},
+            ))
+            if None not in versions and not (from_replica and may_predate_replica(versions)):
+                rendered[key] = (versions, html)
+        cards.append((product, mark_safe(html)))
+
+    if rendered:
+        cache.set_many(rendered, settings.PRODUCT_CARD_CACHE_TIMEOUT)
+    return cards
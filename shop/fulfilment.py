@@ -0,0 +1,82 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from shop.models import Order
+
+
+logger = logging.getLogger("shop.fulfilment")
+
+# A fulfilment step is called with the orders of a claimed batch that are
+# still going and returns the ones it failed. Steps run in the transaction
+# that holds the batch's row locks. An exception rolls back what the steps
+# did to the batch, which is then retried one order at a time; orders that
+# still raise are marked "failed".
+
+
+def require_items(orders):
+    return [order for order in orders if not order.item_count]
+
+
+def get_fulfilment_steps():
+    return [import_string(path) for path in settings.ORDER_FULFILMENT_STEPS]
+
+
+def claim_batch(batch_size):
+    # SKIP LOCKED lets parallel workers each take different orders instead
+    # of queueing behind one another's locks.
+    return list(
+        Order.objects.filter(status="processing")
+        .order_by("id")
+        .select_for_update(skip_locked=True)[:batch_size]
+        .prefetch_related("items__product")
+    )
+
+
+def run_steps(orders, steps):
+    failed = set()
+    for step in steps:
+        pending = [order for order in orders if order.pk not in failed]
+        if not pending:
+            break
+        failed.update(order.pk for order in step(pending))
+    return failed
+
+
+def run_steps_one_by_one(orders, steps):
+    # claim_batch always takes the lowest ids, so an order whose step keeps
+    # raising would otherwise be claimed, and stall the queue, forever.
+    failed = set()
+    for order in orders:
+        try:
+            with transaction.atomic():
+                failed.update(run_steps([order], steps))
+        except Exception:
+            logger.exception("Fulfilment of order %s failed; marking it failed.", order.pk)
+            failed.add(order.pk)
+    return failed
+
+
+def process_batch(batch_size, steps=None):
+    steps = get_fulfilment_steps() if steps is None else steps
+    with transaction.atomic():
+        orders = claim_batch(batch_size)
+        try:
+            with transaction.atomic():
+                failed = run_steps(orders, steps)
+        except Exception:
+            logger.warning(
+                "Fulfilment of a batch of %d orders failed; retrying them one by one.",
+                len(orders), exc_info=True,
+            )
+            failed = run_steps_one_by_one(orders, steps)
+
+        completed = [order.pk for order in orders if order.pk not in failed]
+        # The status guard keeps a status a step set itself.
+        return (
+            len(orders),
+            Order.objects.filter(pk__in=completed, status="processing").update(status="completed"),
+            Order.objects.filter(pk__in=failed, status="processing").update(status="failed"),
+        )
@@ -0,0 +1,217 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from io import StringIO
+from itertools import islice
+
+from django.db import connection, transaction
+
+from shop.categories import bump_category_version
+from shop.counters import increment
+from shop.fragments import bump_versions
+from shop.models import Order, OrderItem, Product, ProductCategory
+
+
+IMPORT_FIELDS = ["sku", "name", "description", "price", "stock_quantity", "category"]
+UPDATE_FIELDS = ["name", "description", "price", "stock_quantity", "category"]
+
+MAX_PRICE = Decimal("999999.99")
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def read_rows(file, file_format="csv"):
+    # Yields (line number, row dict); line numbers count the CSV header.
+    if file_format == "jsonl":
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield line_number, InvalidRow(f"invalid JSON: {error}")
+                continue
+            if not isinstance(row, dict):
+                yield line_number, InvalidRow("expected a JSON object")
+                continue
+            yield line_number, row
+    else:
+        for line_number, row in enumerate(csv.DictReader(file), start=2):
+            yield line_number, row
+
+
+def clean_row(row):
+    if isinstance(row, InvalidRow):
+        raise row
+
+    def text(field, max_length=None, required=True):
+        value = str(row.get(field) or "").strip()
+        if required and not value:
+            raise InvalidRow(f"{field} is required")
+        if max_length and len(value) > max_length:
+            raise InvalidRow(f"{field} is longer than {max_length} characters")
+        return value
+
+    try:
+        price = Decimal(str(row.get("price", "")).strip())
+    except InvalidOperation:
+        raise InvalidRow("price must be a number")
+    if not price.is_finite() or not 0 <= price <= MAX_PRICE:
+        raise InvalidRow(f"price must be between 0 and {MAX_PRICE}")
+
+    try:
+        stock_quantity = int(str(row.get("stock_quantity") or 0).strip())
+    except ValueError:
+        raise InvalidRow("stock_quantity must be a whole number")
+    if stock_quantity < 0:
+        raise InvalidRow("stock_quantity must not be negative")
+
+    return {
+        "sku": text("sku", 64),
+        "name": text("name", 255),
+        "description": text("description", required=False),
+        "price": price.quantize(Decimal("0.01")),
+        "stock_quantity": stock_quantity,
+        "category": text("category", 255),
+    }
+
+
+class ProductImporter:
+    def __init__(self, batch_size=5000, use_copy=False):
+        self.batch_size = batch_size
+        self.use_copy = use_copy and connection.vendor == "postgresql"
+        self.categories = dict(ProductCategory.objects.values_list("name", "pk"))
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    @property
+    def imported(self):
+        return self.created + self.updated
+
+    def run(self, rows):
+        rows = iter(rows)
+        while batch := list(islice(rows, self.batch_size)):
+            self.import_batch(batch)
+        return self
+
+    def import_batch(self, batch):
+        products = {}
+        for line_number, row in batch:
+            try:
+                values = clean_row(row)
+            except InvalidRow as error:
+                self.errors.append((line_number, str(error)))
+                continue
+            # A repeated SKU within one batch keeps its last row.
+            products[values["sku"]] = values
+        if not products:
+            return
+
+        with transaction.atomic():
+            self.resolve_categories({values["category"] for values in products.values()})
+            existing = {
+                sku: (pk, price)
+                for sku, pk, price in Product.objects.filter(
+                    sku__in=products
+                ).values_list("sku", "pk", "price")
+            }
+            if self.use_copy:
+                self.copy_upsert(products.values())
+            else:
+                self.bulk_upsert(products.values())
+
+            created = len(products) - len(existing)
+            repriced = [
+                pk for sku, (pk, price) in existing.items()
+                if products[sku]["price"] != price
+            ]
+            if created:
+                increment("products", created)
+            if repriced:
+                OrderItem.objects.filter(
+                    order__status="new", product__in=repriced
+                ).snapshot_prices()
+                Order.objects.filter(
+                    status="new", items__product__in=repriced
+                ).update_totals()
+
+        bump_versions("product", [pk for pk, _ in existing.values()])
+        self.created += created
+        self.updated += len(existing)
+
+    def resolve_categories(self, names):
+        missing = names - self.categories.keys()
+        if not missing:
+            return
+        ProductCategory.objects.bulk_create(
+            [ProductCategory(name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        self.categories.update(
+            ProductCategory.objects.filter(name__in=missing).values_list("name", "pk")
+        )
+        increment("categories", len(missing))
+        bump_category_version()
+        transaction.on_commit(bump_category_version)
+
+    def bulk_upsert(self, products):
+        Product.objects.bulk_create(
+            [
+                Product(
+                    sku=values["sku"],
+                    name=values["name"],
+                    description=values["description"],
+                    price=values["price"],
+                    stock_quantity=values["stock_quantity"],
+                    category_id=self.categories[values["category"]],
+                )
+                for values in products
+            ],
+            update_conflicts=True,
+            unique_fields=["sku"],
+            update_fields=UPDATE_FIELDS,
+        )
+
+    def copy_upsert(self, products):
+        # COPY into a temporary staging table, then one INSERT ... SELECT
+        # ... ON CONFLICT moves the batch into shop_product.
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        for values in products:
+            writer.writerow([
+                values["sku"],
+                values["name"],
+                values["description"],
+                values["price"],
+                values["stock_quantity"],
+                self.categories[values["category"]],
+            ])
+        buffer.seek(0)
+
+        columns = "sku, name, description, price, stock_quantity, category_id"
+        copy_sql = f"COPY shop_product_import ({columns}) FROM STDIN WITH (FORMAT csv)"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE IF NOT EXISTS shop_product_import ("
+                "sku varchar(64), name varchar(255), description text, "
+                "price numeric(8, 2), stock_quantity integer, category_id bigint"
+                ") ON COMMIT DELETE ROWS"
+            )
+            if hasattr(cursor, "copy_expert"):
+                cursor.copy_expert(copy_sql, buffer)
+            else:
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+            cursor.execute(
+                f"INSERT INTO shop_product ({columns}, reserved_quantity) "
+                f"SELECT {columns}, 0 FROM shop_product_import "
+                "ON CONFLICT (sku) DO UPDATE SET "
+                "name = excluded.name, "
+                "description = excluded.description, "
+                "price = excluded.price, "
+                "stock_quantity = excluded.stock_quantity, "
+                "category_id = excluded.category_id"
+            )
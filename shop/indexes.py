@@ -0,0 +1,84 @@
+import re
+
+from django.db import connections, migrations
+from django.test import RequestFactory
+from django.urls import reverse
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    # CREATE INDEX CONCURRENTLY on Postgres, so building an index on a live
+    # table doesn't block writes to it; a plain AddIndex elsewhere. The
+    # migration using it must set atomic = False.
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+
+# A full table scan in EXPLAIN output, by vendor. SQLite reports a scan in
+# index order as "SCAN table USING INDEX ...", which isn't one.
+FULL_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"\bSCAN (\w+)\s*$", re.MULTILINE),
+}
+
+
+def full_scans(queryset):
+    pattern = FULL_SCAN_PATTERNS[connections[queryset.db].vendor]
+    return sorted(set(pattern.findall(queryset.explain())))
+
+
+def view_queryset(view_class, url, user, **params):
+    request = RequestFactory().get(url, params)
+    request.user = user
+    view = view_class()
+    view.setup(request)
+    return view.get_queryset()
+
+
+def hot_queries(user):
+    # The first page of each hot list or lookup, built by the views and
+    # forms that run it.
+    from accounts.models import SupportRequest
+    from accounts.views import MyOrderListView
+    from shop.models import Order, Product
+    from shop.views import OrderListView, ProductListView
+
+    category = Product.objects.values_list("category", flat=True).first()
+    orders = reverse("shop:order-list")
+    products = reverse("shop:product-list")
+    queries = {
+        "cart": Order.objects.filter(user=user, status="new"),
+        "order list": view_queryset(OrderListView, orders, user),
+        "order status": view_queryset(OrderListView, orders, user, status="processing"),
+        "order dates": view_queryset(
+            OrderListView, orders, user, date_from="2024-01-01", date_to="2024-01-31"
+        ),
+        "order user search": view_queryset(OrderListView, orders, user, name=user.username[:4]),
+        "my orders": view_queryset(MyOrderListView, reverse("accounts:myorder-list"), user),
+        "product price": view_queryset(ProductListView, products, user, price_min="10", price_max="20"),
+        "product category price": view_queryset(
+            ProductListView, products, user, category=category, price_min="10", price_max="20"
+        ),
+        "open support requests": SupportRequest.objects.filter(is_processed=False).order_by("-id"),
+        "fulfilment queue": Order.objects.filter(status="processing").order_by("id"),
+    }
+    # The paginator's COUNT(*) reads every matching row, without the ORDER BY
+    # ... LIMIT that lets a page stop after walking a few index entries.
+    counted = [
+        "order status", "order dates", "order user search", "my orders", "product price",
+        "product category price", "open support requests",
+    ]
+    return {
+        **{name: queryset[:10] for name, queryset in queries.items()},
+        **{f"{name} count": queries[name].order_by() for name in counted},
+    }
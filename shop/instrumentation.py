@@ -0,0 +1,118 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger("shop.sql")
+
+FINGERPRINT_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    # IN lists and multi-row VALUES differ in length per call.
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(...)"),
+    (re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def fingerprint(sql):
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryRecorder:
+    # Counts and times every query on every connection through an execute
+    # wrapper, so it works without DEBUG and doesn't keep parameters.
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((fingerprint(sql), time.perf_counter() - started))
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def repeated(self):
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+    def n_plus_one(self, threshold=None):
+        # The same SELECT issued over and over within one request is almost
+        # always a relation read per row of a list.
+        threshold = threshold or settings.SQL_N_PLUS_ONE_THRESHOLD
+        return {
+            sql: count for sql, count in self.repeated().items()
+            if count >= threshold and sql.upper().startswith("SELECT")
+        }
+
+
+class SQLInstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Queries run while a streaming response is consumed aren't counted.
+        with QueryRecorder().record() as recorder:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        repeated = sum(count - 1 for count in recorder.repeated().values())
+        suspects = recorder.n_plus_one()
+
+        response["X-DB-Queries"] = recorder.count
+        response["X-DB-Time-Ms"] = f"{recorder.duration * 1000:.1f}"
+        response["X-DB-Repeated-Queries"] = repeated
+        if suspects:
+            response["X-DB-N-Plus-One"] = len(suspects)
+
+        logger.info(
+            "%s %s view=%s queries=%d db_ms=%.1f repeated=%d",
+            request.method, request.path, view, recorder.count,
+            recorder.duration * 1000, repeated,
+        )
+        for sql, count in suspects.items():
+            logger.warning("Possible N+1 in %s (%d times): %s", view, count, sql)
+        return response
+
+
+class QueryBudgetMixin:
+    @contextmanager
+    def assertQueryBudget(self, budget, n_plus_one_threshold=None):
+        with QueryRecorder().record() as recorder:
+            yield recorder
+
+        suspects = recorder.n_plus_one(n_plus_one_threshold)
+        if recorder.count > budget or suspects:
+            lines = [f"{recorder.count} queries executed, budget is {budget}."]
+            lines.extend(
+                f"Possible N+1 ({count} times): {sql}"
+                for sql, count in suspects.items()
+            )
+            self.fail("\n".join(lines))
@@ -0,0 +1,28 @@
+import statistics
+
+from django.conf import settings
+from django.test import Client
+
+
+WORDS = [
+    "beef", "pork", "lamb", "chicken", "turkey", "duck", "veal", "sausage",
+    "bacon", "ham", "salami", "steak", "fillet", "mince", "ribs", "wings",
+    "smoked", "fresh", "dry", "aged", "spicy", "marinated", "organic", "premium",
+]
+
+
+def percentile(timings, percent):
+    if len(timings) < 2:
+        return timings[0] if timings else 0.0
+    return statistics.quantiles(timings, n=100, method="inclusive")[percent - 1]
+
+
+def benchmark_client(user=None):
+    hosts = [
+        host for host in settings.ALLOWED_HOSTS
+        if host != "*" and not host.startswith(".")
+    ]
+    client = Client(HTTP_HOST=hosts[0] if hosts else "localhost")
+    if user is not None:
+        client.force_login(user)
+    return client
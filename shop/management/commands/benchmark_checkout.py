@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.urls import reverse
+
+from shop.management.commands._benchmark import benchmark_client, percentile
+from shop.models import Order, OrderItem, Product, ProductCategory
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure confirm_order latency for carts of 1, 10 and 100 lines. "
+        "All benchmark data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 100])
+        parser.add_argument("--runs", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options["lines"], options["runs"])
+            transaction.set_rollback(True)
+
+    def run(self, line_counts, runs):
+        user = get_user_model().objects.create_user(username="benchmark_checkout")
+        category = ProductCategory.objects.create(name="Benchmark checkout")
+        products = Product.objects.bulk_create(
+            Product(
+                name=f"Benchmark product {index}",
+                price=10,
+                stock_quantity=10 ** 9,
+                category=category,
+            )
+            for index in range(max(line_counts))
+        )
+        client = benchmark_client(user)
+        url = reverse("shop:order-confirm")
+
+        for lines in line_counts:
+            timings = []
+            for _ in range(runs):
+                order = Order.objects.create(user=user)
+                OrderItem.objects.bulk_create(
+                    OrderItem(
+                        order=order,
+                        product=product,
+                        quantity=1,
+                        unit_price=product.price,
+                        line_total=product.price,
+                    )
+                    for product in products[:lines]
+                )
+                started = time.perf_counter()
+                client.post(url)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            self.stdout.write(
+                f"{lines:>4} lines  p50={percentile(timings, 50):.2f}ms "
+                f"p95={percentile(timings, 95):.2f}ms"
+            )
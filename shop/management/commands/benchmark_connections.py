@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.urls import reverse
+
+from shop.management.commands._benchmark import benchmark_client, percentile
+from shop.models import Product, ProductCategory
+
+
+# CONN_MAX_AGE for each mode; "configured" keeps the database settings as
+# they are, which is how a pool from POSTGRES_POOL gets measured. Django
+# refuses persistent connections next to a pool, so "persistent" is skipped
+# when one is configured.
+MODES = {
+    "new": 0,
+    "persistent": 600,
+    "configured": None,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare catalog requests/s with a new database connection per "
+        "request, with persistent connections and with the configured "
+        "database settings. Requests run in-process, closing connections "
+        "after each one the way the WSGI handler does."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--user", help="Username to browse as. Defaults to the first user.")
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user = (
+            User.objects.filter(username=options["user"]).first()
+            if options["user"] else User.objects.order_by("pk").first()
+        )
+        category = ProductCategory.objects.annotate(
+            product_count=Count("products")
+        ).filter(product_count__gt=0).order_by("product_count", "pk").first()
+        product = Product.objects.filter(category=category).order_by("pk").first()
+        if user is None or product is None:
+            raise CommandError("The database needs a user, a product and a category; see seed_scale.")
+
+        paths = [
+            reverse("shop:index"),
+            reverse("shop:product-list"),
+            reverse("shop:product-detail", args=[product.pk]),
+            reverse("shop:productcategory-list"),
+            reverse("shop:productcategory-detail", args=[category.pk]),
+        ]
+        settings_dict = connections[options["database"]].settings_dict
+        configured = (settings_dict["CONN_MAX_AGE"], settings_dict["CONN_HEALTH_CHECKS"])
+        modes = options["modes"]
+        if settings_dict["OPTIONS"].get("pool") and "persistent" in modes:
+            self.stderr.write("A connection pool is configured; skipping \"persistent\".")
+            modes = [mode for mode in modes if mode != "persistent"]
+
+        results = {}
+        try:
+            for mode in modes:
+                if MODES[mode] is None:
+                    settings_dict["CONN_MAX_AGE"], settings_dict["CONN_HEALTH_CHECKS"] = configured
+                else:
+                    settings_dict["CONN_MAX_AGE"] = MODES[mode]
+                    settings_dict["CONN_HEALTH_CHECKS"] = bool(MODES[mode])
+                # Connections opened under the previous mode keep its close time.
+                connections.close_all()
+                results[mode] = result = self.run_load(
+                    user, paths, options["requests"], options["concurrency"], options["database"]
+                )
+                self.stdout.write(
+                    f"{mode:<11} {result['requests_per_second']:>8.1f} req/s  "
+                    f"p50={result['p50_ms']:.1f}ms  p95={result['p95_ms']:.1f}ms  "
+                    f"connections={result['connections']}  errors={result['errors']}"
+                )
+        finally:
+            settings_dict["CONN_MAX_AGE"], settings_dict["CONN_HEALTH_CHECKS"] = configured
+            connections.close_all()
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(f"Results written to {options['output']}.")
+
+    def run_load(self, user, paths, total, concurrency, database):
+        timings, errors, opened, lock = [], [0], [0], threading.Lock()
+        remaining = iter(range(total))
+
+        def count_connection(sender, connection, **kwargs):
+            if connection.alias == database:
+                with lock:
+                    opened[0] += 1
+
+        def worker(client):
+            for index in remaining:
+                started = time.perf_counter()
+                try:
+                    ok = client.get(paths[index % len(paths)]).status_code == 200
+                except Exception:
+                    ok = False
+                finally:
+                    # The test client skips the request_started and
+                    # request_finished handlers that recycle connections.
+                    close_old_connections()
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    timings.append(elapsed)
+                    errors[0] += not ok
+            connections.close_all()
+
+        clients = [benchmark_client(user) for _ in range(concurrency)]
+        connections.close_all()
+        connection_created.connect(count_connection)
+        threads = [threading.Thread(target=worker, args=[client]) for client in clients]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            connection_created.disconnect(count_connection)
+        elapsed = time.perf_counter() - started
+
+        return {
+            "requests": len(timings),
+            "errors": errors[0],
+            "connections": opened[0],
+            "requests_per_second": round(len(timings) / elapsed, 1),
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+        }
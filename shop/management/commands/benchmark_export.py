@@ -0,0 +1,81 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.exports import render_export
+from shop.models import Order, OrderItem, Product, ProductCategory
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure order line export time and peak Python memory for growing "
+        "result sizes. All benchmark data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, nargs="+", default=[10_000, 100_000])
+        parser.add_argument("--lines-per-order", type=int, default=10)
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options["lines"], options["lines_per_order"], options["format"])
+            transaction.set_rollback(True)
+
+    def run(self, line_counts, lines_per_order, export_format):
+        user = get_user_model().objects.create_user(username="benchmark_export")
+        category = ProductCategory.objects.create(name="Benchmark export")
+        products = Product.objects.bulk_create(
+            Product(name=f"Benchmark export {index}", price=10, category=category)
+            for index in range(lines_per_order)
+        )
+
+        seeded = 0
+        for lines in sorted(line_counts):
+            seeded += self.seed(user, products, lines - seeded)
+            orders = Order.objects.filter(user=user)
+
+            started = time.perf_counter()
+            written = self.export(orders, export_format)
+            elapsed = time.perf_counter() - started
+
+            # Tracing slows the export down a lot, so memory gets its own pass.
+            tracemalloc.start()
+            self.export(orders, export_format)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            self.stdout.write(
+                f"{lines:>9} lines  {elapsed:.2f}s  {lines / elapsed:,.0f} lines/s  "
+                f"{written / 2 ** 20:.1f} MiB written  peak {peak / 2 ** 20:.1f} MiB"
+            )
+
+    def export(self, orders, export_format):
+        return sum(
+            len(chunk) for chunk in render_export(orders, "lines", export_format)
+        )
+
+    def seed(self, user, products, lines):
+        created = 0
+        while created < lines:
+            orders = Order.objects.bulk_create(
+                Order(user=user, status="completed")
+                for _ in range(min(1000, (lines - created) // len(products) or 1))
+            )
+            items = [
+                OrderItem(
+                    order=order,
+                    product=product,
+                    quantity=1,
+                    unit_price=product.price,
+                    line_total=product.price,
+                )
+                for order in orders
+                for product in products
+            ]
+            OrderItem.objects.bulk_create(items, batch_size=5000)
+            created += len(items)
+        return created
@@ -0,0 +1,108 @@
+import itertools
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from shop.forms import OrderFilterForm
+from shop.management.commands._benchmark import percentile
+from shop.models import Order
+
+
+def legacy_filter_queryset(form, queryset):
+    # OrderFilterForm.filter_queryset before searching through search_orders
+    # and bounding dates with day_start, for comparison.
+    data = form.cleaned_data
+    if data.get("name"):
+        if data["name"].isdigit():
+            queryset = queryset.filter(id=int(data["name"]))
+        else:
+            queryset = queryset.filter(user__username__icontains=data["name"])
+    if data.get("status"):
+        queryset = queryset.filter(status=data["status"])
+    if data.get("total_min") is not None:
+        queryset = queryset.filter(total__gte=data["total_min"])
+    if data.get("total_max") is not None:
+        queryset = queryset.filter(total__lte=data["total_max"])
+    if data.get("date_from"):
+        queryset = queryset.filter(created_at__date__gte=data["date_from"])
+    if data.get("date_to"):
+        queryset = queryset.filter(created_at__date__lte=data["date_to"])
+    return queryset
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the order list filter (COUNT plus the first page) for every "
+        "combination of search, status, total range and date range on the "
+        "current data (see seed_scale --orders), against the previous "
+        "filter implementation."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        order = Order.objects.exclude(status="new").order_by("-pk").first()
+        if order is None:
+            raise CommandError("There are no orders; run seed_scale first.")
+        user = (
+            type(order.user).objects.annotate(order_count=Count("orders"))
+            .filter(order_count__gt=0).order_by("order_count", "pk").first()
+        )
+        day = timezone.localdate(order.created_at) - timedelta(days=60)
+
+        searches = {
+            "": "",
+            "#id": f"#{order.pk}",
+            "@username": f"@{user.username}",
+            "username part": user.username[1:-1],
+            "number": str(order.pk),
+        }
+        dimensions = [
+            [("", {})] + [(f"name={label}", {"name": name}) for label, name in searches.items() if name],
+            [("", {}), ("status", {"status": "failed"})],
+            [("", {}), ("total", {"total_min": "50", "total_max": "200"})],
+            [("", {}), ("dates", {"date_from": day.isoformat(), "date_to": (day + timedelta(days=30)).isoformat()})],
+        ]
+
+        results = {}
+        base = Order.objects.select_related("user").order_by("-created_at", "-id")
+        for combination in itertools.product(*dimensions):
+            label = " ".join(part for part, _ in combination if part) or "unfiltered"
+            params = {key: value for _, values in combination for key, value in values.items()}
+            form = OrderFilterForm(params)
+            if not form.is_valid():
+                raise CommandError(f"{label}: {form.errors.as_text()}")
+
+            results[label] = result = {}
+            for name, build in [("legacy", legacy_filter_queryset), ("current", OrderFilterForm.filter_queryset)]:
+                result[name] = self.measure(build(form, base), options["runs"], options["page_size"])
+            self.stdout.write(
+                f"{label:<42} legacy p50={result['legacy']['p50_ms']:>9.2f}ms  "
+                f"current p50={result['current']['p50_ms']:>9.2f}ms  "
+                f"rows={result['current']['count']}"
+            )
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(f"Results written to {options['output']}.")
+
+    def measure(self, queryset, runs, page_size):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            count = queryset.count()
+            list(queryset[:page_size])
+            timings.append((time.perf_counter() - started) * 1000)
+        return {
+            "count": count,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+        }
@@ -0,0 +1,66 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+
+from shop.fragments import card_cache_stats
+from shop.management.commands._benchmark import benchmark_client, percentile
+from shop.models import Product, ProductCategory
+
+
+DUMMY_CACHE = {
+    "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare product list response times for a 10-card page with the "
+        "product card cache disabled and warm. All benchmark data is rolled "
+        "back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options["runs"])
+            transaction.set_rollback(True)
+
+    def run(self, runs):
+        user = get_user_model().objects.create_user(username="benchmark_cards")
+        category = ProductCategory.objects.create(name="Benchmark cards")
+        for index in range(10):
+            Product.objects.create(
+                name=f"Benchmark card {index}",
+                description="Benchmark product",
+                price=10,
+                stock_quantity=100,
+                category=category,
+            )
+        client = benchmark_client(user)
+        url = f"{reverse('shop:product-list')}?category={category.pk}"
+
+        with override_settings(CACHES=DUMMY_CACHE):
+            self.measure("uncached", client, url, runs)
+        client.get(url)
+        self.measure("cached", client, url, runs)
+
+    def measure(self, label, client, url, runs):
+        hits, misses = card_cache_stats["hits"], card_cache_stats["misses"]
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(
+            f"{label:<9} p50={percentile(timings, 50):.2f}ms "
+            f"p95={percentile(timings, 95):.2f}ms "
+            f"hits={card_cache_stats['hits'] - hits} "
+            f"misses={card_cache_stats['misses'] - misses}"
+        )
@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from shop.management.commands._benchmark import WORDS
+from shop.models import Product, ProductCategory
+from shop.search import search_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare p50/p95 latency of a paginated product search page "
+        "(count + first page) against the icontains lookup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=500_000)
+        parser.add_argument("--runs", type=int, default=200)
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        # The seeded catalog is rolled back, so the run leaves no rows (and
+        # no counters to repair) behind.
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        self.seed_catalog(options["products"], options["batch_size"])
+
+        queries = [
+            " ".join(random.sample(WORDS, random.randint(1, 2)))
+            for _ in range(options["runs"])
+        ]
+        base = Product.objects.select_related("category").order_by("id")
+        page_size = options["page_size"]
+
+        paths = {
+            "icontains": lambda q: base.filter(name__icontains=q),
+            "search": lambda q: search_products(base, q),
+        }
+        for label, build in paths.items():
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                queryset = build(query)
+                queryset.count()
+                list(queryset[:page_size])
+                timings.append((time.perf_counter() - started) * 1000)
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            self.stdout.write(
+                f"{label:<10} p50={statistics.median(timings):.2f}ms p95={p95:.2f}ms"
+            )
+
+    def seed_catalog(self, size, batch_size):
+        missing = size - Product.objects.count()
+        if missing <= 0:
+            return
+
+        category, _ = ProductCategory.objects.get_or_create(name="Benchmark")
+        self.stdout.write(f"Seeding {missing} products...")
+        while missing > 0:
+            batch = min(batch_size, missing)
+            Product.objects.bulk_create(
+                Product(
+                    name=" ".join(random.sample(WORDS, 3)).title(),
+                    description=" ".join(random.sample(WORDS, 8)),
+                    price=random.randint(100, 100_000) / 100,
+                    stock_quantity=random.randint(0, 500),
+                    category=category,
+                )
+                for _ in range(batch)
+            )
+            missing -= batch
+        # Autovacuum can't see the uncommitted rows; the planner needs their
+        # statistics to pick the trigram index.
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Product._meta.db_table}")
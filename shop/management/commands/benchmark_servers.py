@@ -0,0 +1,220 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from shop.management.commands._benchmark import percentile
+from shop.models import Product, ProductCategory
+
+
+SERVERS = {
+    "wsgi": {
+        "command": [
+            "-m", "gunicorn", "minishop_manager.wsgi:application",
+            "--bind", "127.0.0.1:{port}", "--workers", "{workers}",
+            "--threads", "{threads}", "--log-level", "warning",
+        ],
+        "interface": "wsgi",
+        "async_views": False,
+    },
+    "asgi": {
+        "command": [
+            "-m", "uvicorn", "minishop_manager.asgi:application",
+            "--port", "{port}", "--workers", "{workers}",
+            "--no-access-log", "--log-level", "warning",
+        ],
+        "interface": "asgi",
+        "async_views": False,
+    },
+    "asgi-async": {
+        "command": [
+            "-m", "uvicorn", "minishop_manager.asgi:application",
+            "--port", "{port}", "--workers", "{workers}",
+            "--no-access-log", "--log-level", "warning",
+        ],
+        "interface": "asgi",
+        "async_views": True,
+    },
+}
+
+# Settings module the servers run with: the current settings, production-like
+# (no DEBUG query log), with the catalog views switched as requested.
+SERVER_SETTINGS = """\
+from {settings_module} import *
+
+DEBUG = False
+ALLOWED_HOSTS = ["127.0.0.1"]
+ASYNC_CATALOG_VIEWS = {async_views}
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare catalog throughput of gunicorn+WSGI, uvicorn+ASGI with the "
+        "sync views and uvicorn+ASGI with the async catalog views, using the "
+        "current database. Each server gets the same workers, URL mix and "
+        "client concurrency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servers", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=4,
+                            help="Threads per gunicorn worker.")
+        parser.add_argument("--user", help="Username to browse as. Defaults to the first user.")
+        parser.add_argument("--output", help="Also write the results to this JSON file.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        user = (
+            User.objects.filter(username=options["user"]).first()
+            if options["user"] else User.objects.order_by("pk").first()
+        )
+        # Category pages list every product, so the smallest non-empty
+        # category keeps one huge page from dominating the comparison.
+        category = ProductCategory.objects.annotate(
+            product_count=Count("products")
+        ).filter(product_count__gt=0).order_by("product_count", "pk").first()
+        product = Product.objects.filter(category=category).order_by("pk").first()
+        if user is None or product is None or category is None:
+            raise CommandError("The database needs a user, a product and a category; see seed_scale.")
+
+        paths = [
+            reverse("shop:index"),
+            reverse("shop:product-list"),
+            reverse("shop:product-detail", args=[product.pk]),
+            reverse("shop:productcategory-list"),
+            reverse("shop:productcategory-detail", args=[category.pk]),
+        ]
+        client = Client()
+        client.force_login(user)
+        cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+        results = {}
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for name in options["servers"]:
+                    results[name] = self.benchmark(name, directory, paths, cookie, options)
+        finally:
+            client.logout()
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(f"Results written to {options['output']}.")
+
+    def benchmark(self, name, directory, paths, cookie, options):
+        server = SERVERS[name]
+        settings_module = f"benchmark_{name.replace('-', '_')}_settings"
+        Path(directory, f"{settings_module}.py").write_text(SERVER_SETTINGS.format(
+            settings_module=os.environ["DJANGO_SETTINGS_MODULE"],
+            async_views=server["async_views"],
+        ))
+        port = free_port()
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": settings_module,
+            # Read by the production settings' connection reuse.
+            "DJANGO_SERVER": server["interface"],
+            "PYTHONPATH": os.pathsep.join(
+                [directory, str(settings.BASE_DIR), os.environ.get("PYTHONPATH", "")]
+            ),
+        }
+        command = [sys.executable] + [
+            part.format(port=port, workers=options["workers"], threads=options["threads"])
+            for part in server["command"]
+        ]
+        process = subprocess.Popen(command, env=env, cwd=settings.BASE_DIR)
+        try:
+            self.wait_until_ready(port, process)
+            result = self.run_load(port, paths, cookie, options["requests"], options["concurrency"])
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        self.stdout.write(
+            f"{name:<11} {result['requests_per_second']:>8.1f} req/s  "
+            f"p50={result['p50_ms']:.1f}ms  p95={result['p95_ms']:.1f}ms  "
+            f"errors={result['errors']}"
+        )
+        return result
+
+    def wait_until_ready(self, port, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"The server exited with code {process.returncode}.")
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                connection.request("GET", reverse("accounts:login"))
+                connection.getresponse().read()
+                connection.close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError("The server did not start in time.")
+
+    def run_load(self, port, paths, cookie, total, concurrency):
+        timings, errors, lock = [], [0], threading.Lock()
+        remaining = iter(range(total))
+
+        def worker():
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            for index in remaining:
+                started = time.perf_counter()
+                try:
+                    connection.request("GET", paths[index % len(paths)], headers={"Cookie": cookie})
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    ok = False
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    timings.append(elapsed)
+                    errors[0] += not ok
+            connection.close()
+
+        # Warm up every worker's caches and connections first.
+        for path in paths * 4:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            connection.request("GET", path, headers={"Cookie": cookie})
+            connection.getresponse().read()
+            connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            "requests": len(timings),
+            "errors": errors[0],
+            "requests_per_second": round(len(timings) / elapsed, 1),
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+        }
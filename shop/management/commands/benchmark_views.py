@@ -0,0 +1,223 @@
+import json
+import subprocess
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from shop.management.commands._benchmark import benchmark_client, percentile
+from shop.models import Order, OrderItem, Product, ProductCategory
+
+
+NAMESPACES = ["shop", "accounts"]
+
+# Logging out ends the benchmark session and the export is measured by
+# benchmark_export. POST-only views get their own scenarios below.
+SKIPPED = {
+    "accounts:logout",
+    "shop:order-export",
+    "shop:add-to-cart",
+    "shop:cart-update",
+    "shop:cart-remove",
+    "shop:order-confirm",
+}
+
+
+def named_patterns(namespaces):
+    for resolver in get_resolver().url_patterns:
+        if isinstance(resolver, URLResolver) and resolver.namespace in namespaces:
+            for pattern in resolver.url_patterns:
+                if pattern.name:
+                    yield f"{resolver.namespace}:{pattern.name}", pattern
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the shop and accounts URLs against the current data (see "
+        "seed_scale) and write per-view p50/p95 latency and query counts to "
+        "a JSON file. Changes made by the replay are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--user", help="Username to browse as. Defaults to the user with the most orders.")
+        parser.add_argument("--output", default="benchmark_views.json")
+        parser.add_argument("--compare", metavar="RESULTS", help="Earlier results file to compare against.")
+
+    def handle(self, *args, **options):
+        previous = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as file:
+                    previous = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read {options['compare']}: {error}")
+
+        with transaction.atomic():
+            results = self.run(options["user"], options["runs"])
+            transaction.set_rollback(True)
+
+        with open(options["output"], "w") as file:
+            json.dump(results, file, indent=2)
+            file.write("\n")
+        self.stdout.write(f"Results written to {options['output']}.")
+
+        if previous:
+            self.compare(previous["views"], results["views"])
+
+    def run(self, username, runs):
+        user = self.get_user(username)
+        user.is_staff = True
+        user.save(update_fields=["is_staff"])
+
+        product = Product.objects.filter(
+            pk=OrderItem.objects.values("product").annotate(lines=Count("id"))
+            .order_by("-lines").values("product")[:1]
+        ).first() or Product.objects.first()
+        if product is None:
+            raise CommandError("There are no products; run seed_scale first.")
+        Product.objects.filter(pk=product.pk).update(stock_quantity=10 ** 9)
+        order = Order.objects.filter(user=user).order_by("-created_at").first()
+        samples = {
+            Product: product.pk,
+            ProductCategory: product.category_id,
+            Order: order.pk if order else None,
+            get_user_model(): user.pk,
+        }
+
+        client = benchmark_client(user)
+        add_url = reverse("shop:add-to-cart", args=[product.pk])
+
+        def add_to_cart():
+            client.post(add_url, {"quantity": 1})
+
+        def cart_line_url(name):
+            def prepare():
+                add_to_cart()
+                return reverse(name, args=[self.cart_line_pk(user, product)])
+            return prepare
+
+        def confirm_url():
+            add_to_cart()
+            return reverse("shop:order-confirm")
+
+        views = {}
+        for name, pattern in named_patterns(NAMESPACES):
+            if name in SKIPPED:
+                continue
+            kwargs = {}
+            if "pk" in pattern.pattern.converters:
+                model = getattr(getattr(pattern.callback, "view_class", None), "model", None)
+                if samples.get(model) is None:
+                    self.stderr.write(f"Skipping {name}: no sample object.")
+                    continue
+                kwargs["pk"] = samples[model]
+            url = reverse(name, kwargs=kwargs)
+            views[name] = self.measure(client, "get", lambda url=url: url, runs)
+
+        views["shop:add-to-cart"] = self.measure(client, "post", lambda: add_url, runs, {"quantity": 1})
+        views["shop:cart-update"] = self.measure(client, "post", cart_line_url("shop:cart-update"), runs, {"quantity": 2})
+        views["shop:cart-remove"] = self.measure(client, "post", cart_line_url("shop:cart-remove"), runs)
+        views["shop:order-confirm"] = self.measure(client, "post", confirm_url, runs)
+
+        return {
+            "meta": {
+                "created": timezone.now().isoformat(),
+                "revision": git_revision(),
+                "database": connection.vendor,
+                "cart_backend": settings.CART_BACKEND,
+                "runs": runs,
+                "user": user.username,
+                "rows": {
+                    "users": get_user_model().objects.count(),
+                    "categories": ProductCategory.objects.count(),
+                    "products": Product.objects.count(),
+                    "orders": Order.objects.count(),
+                    "order_lines": OrderItem.objects.count(),
+                },
+            },
+            "views": views,
+        }
+
+    def get_user(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User {username!r} does not exist.")
+        busiest = Order.objects.values("user").annotate(orders=Count("id")).order_by("-orders").values("user")[:1]
+        user = User.objects.filter(pk__in=busiest).first() or User.objects.first()
+        if user is None:
+            raise CommandError("There are no users; run seed_scale first.")
+        return user
+
+    def cart_line_pk(self, user, product):
+        # Stored carts address their lines by product, the database cart by
+        # the OrderItem.
+        if settings.CART_BACKEND != "database":
+            return product.pk
+        return OrderItem.objects.get(
+            order__user=user, order__status="new", product=product
+        ).pk
+
+    def measure(self, client, method, prepare, runs, data=None):
+        # The first request warms caches and is only used to count queries.
+        url = prepare()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, data)
+        query_count = len(queries.captured_queries)
+
+        timings = []
+        for _ in range(runs):
+            url = prepare()
+            started = time.perf_counter()
+            getattr(client, method)(url, data)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        result = {
+            "url": url,
+            "method": method.upper(),
+            "status": response.status_code,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "queries": query_count,
+        }
+        self.stdout.write(
+            f"{method.upper():<5}{url:<40}{result['status']:>4}  "
+            f"p50={result['p50_ms']:.2f}ms  p95={result['p95_ms']:.2f}ms  "
+            f"queries={query_count}"
+        )
+        return result
+
+    def compare(self, previous, current):
+        self.stdout.write("")
+        for name, result in current.items():
+            before = previous.get(name)
+            if before is None:
+                self.stdout.write(f"{name:<32} new")
+                continue
+            change = (
+                (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+                if before["p50_ms"] else 0.0
+            )
+            self.stdout.write(
+                f"{name:<32} p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f}ms "
+                f"({change:+.0f}%)  queries {before['queries']} -> {result['queries']}"
+            )
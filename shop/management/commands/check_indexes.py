@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from shop.indexes import full_scans, hot_queries
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot order, product, cart and support request queries and "
+        "fail if any of them scans its whole table. Run it on a seeded "
+        "database (see seed_scale) after ANALYZE, so the planner sees "
+        "realistic table sizes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Username the queries run for. Defaults to the user with the most orders.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options["user"]:
+            user = User.objects.filter(username=options["user"]).first()
+        else:
+            user = User.objects.annotate(order_count=Count("orders")).order_by("-order_count", "pk").first()
+        if user is None:
+            raise CommandError("There are no users; run seed_scale first.")
+
+        failed = []
+        for name, queryset in hot_queries(user).items():
+            table = queryset.model._meta.db_table
+            scanned = table in full_scans(queryset)
+            if scanned:
+                failed.append(name)
+            self.stdout.write(f"{'FULL SCAN' if scanned else 'ok':<9}  {name} ({table})")
+            if options["verbosity"] > 1:
+                self.stdout.write(queryset.explain())
+
+        if failed:
+            raise CommandError(f"Full table scans in: {', '.join(failed)}.")
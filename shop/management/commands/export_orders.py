@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.exports import EXPORT_COLUMNS, EXPORT_FORMATS, render_export
+from shop.forms import OrderFilterForm
+from shop.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream orders or order lines as CSV or JSON Lines, filtered like "
+        "the staff order list."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=list(EXPORT_COLUMNS), default="orders")
+        parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--output", "-o", help="File to write; stdout by default.")
+        for field in OrderFilterForm.base_fields:
+            parser.add_argument(f"--{field.replace('_', '-')}", dest=field)
+
+    def handle(self, *args, **options):
+        form = OrderFilterForm({
+            field: options[field]
+            for field in OrderFilterForm.base_fields
+            if options[field] is not None
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        orders = form.filter_queryset(Order.objects.all())
+
+        chunks = render_export(orders, options["kind"], options["format"])
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.fixtures import dump_records, get_fixture_models, write_fixture
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a dumpdata-style JSON fixture, streaming each model's rows in "
+        "primary key order. Defaults to the models of the seed fixture."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("labels", nargs="*", help="app_label or app_label.Model")
+        parser.add_argument("--output", "-o")
+        parser.add_argument("--indent", type=int)
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            models = get_fixture_models(options["labels"])
+        except LookupError as error:
+            raise CommandError(error)
+
+        records = dump_records(models, options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                write_fixture(records, output, options["indent"])
+        else:
+            self.stdout.ending = None
+            write_fixture(records, self.stdout, options["indent"])
@@ -0,0 +1,42 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError
+
+from shop.fixtures import FixtureLoader, refresh_derived_data, stream_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a dumpdata-style JSON fixture into empty tables: records are "
+        "streamed from the file and inserted per model in batches, without "
+        "model signals. Existing rows are not updated; use loaddata for that."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixture")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        path = Path(options["fixture"])
+        if not path.is_file():
+            raise CommandError(f"{path} does not exist.")
+
+        loader = FixtureLoader(options["database"], options["batch_size"])
+        started = time.perf_counter()
+        try:
+            with path.open(encoding="utf-8") as file:
+                loaded = loader.load(stream_records(file))
+        except (DeserializationError, IntegrityError, ValueError) as error:
+            raise CommandError(f"Could not load {path}: {error}")
+        refresh_derived_data(loaded)
+        elapsed = time.perf_counter() - started
+
+        for model, count in loaded.items():
+            self.stdout.write(f"{model._meta.label}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Installed {sum(loaded.values())} objects in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,58 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from shop.imports import ProductImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV or JSON Lines file with the "
+        "columns sku, name, description, price, stock_quantity and category "
+        "(a category name; missing categories are created). Rows are matched "
+        "on sku. Invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"])
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--copy",
+            action="store_true",
+            help="On PostgreSQL, load each batch with COPY into a staging table.",
+        )
+        parser.add_argument("--max-errors", type=int, default=50,
+                            help="How many row errors to print.")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.is_file():
+            raise CommandError(f"{path} does not exist.")
+        file_format = options["format"] or (
+            "jsonl" if path.suffix in (".jsonl", ".ndjson") else "csv"
+        )
+        if options["copy"] and connection.vendor != "postgresql":
+            raise CommandError("--copy needs a PostgreSQL database.")
+
+        importer = ProductImporter(options["batch_size"], options["copy"])
+        started = time.perf_counter()
+        with path.open(newline="", encoding="utf-8-sig") as file:
+            importer.run(read_rows(file, file_format))
+        elapsed = time.perf_counter() - started
+
+        for line_number, message in importer.errors[:options["max_errors"]]:
+            self.stderr.write(f"line {line_number}: {message}")
+        if len(importer.errors) > options["max_errors"]:
+            self.stderr.write(
+                f"... and {len(importer.errors) - options['max_errors']} more errors"
+            )
+
+        rate = importer.imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {importer.imported} products ({importer.created} created, "
+            f"{importer.updated} updated, {len(importer.errors)} rejected) "
+            f"in {elapsed:.2f}s, {rate:,.0f} rows/s."
+        ))
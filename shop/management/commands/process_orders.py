@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from shop.fulfilment import get_fulfilment_steps, logger, process_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Fulfil orders in \"processing\": claim them in batches, run the "
+        "ORDER_FULFILMENT_STEPS and mark them completed or failed. Several "
+        "workers can run side by side on databases with SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and poll for new orders every --interval seconds when idle.",
+        )
+        parser.add_argument("--interval", type=float, default=5)
+
+    def handle(self, *args, **options):
+        if not connection.features.has_select_for_update_skip_locked:
+            self.stderr.write(
+                f"{connection.vendor} has no SKIP LOCKED; run a single worker."
+            )
+        steps = get_fulfilment_steps()
+
+        while True:
+            claimed = completed = failed = 0
+            started = time.perf_counter()
+            while True:
+                try:
+                    batch, batch_completed, batch_failed = process_batch(options["batch_size"], steps)
+                except Exception:
+                    # E.g. a lost database connection; the batch was rolled
+                    # back and is claimed again on the next round.
+                    if not options["loop"]:
+                        raise
+                    logger.exception("Order batch failed; retrying in %ss.", options["interval"])
+                    connection.close()
+                    break
+                claimed += batch
+                completed += batch_completed
+                failed += batch_failed
+                if batch < options["batch_size"]:
+                    break
+            elapsed = time.perf_counter() - started
+
+            if claimed or not options["loop"]:
+                self.stdout.write(
+                    f"Processed {claimed} orders ({completed} completed, {failed} failed) "
+                    f"in {elapsed:.2f}s, {claimed / elapsed:,.0f} orders/s."
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalculate the stored Order.total and Order.item_count in bulk, "
+        "first snapshotting the current product price into order lines that "
+        "have none (e.g. lines loaded from a fixture)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk = 0
+        updated = 0
+        snapshotted = 0
+
+        while True:
+            pks = list(
+                Order.objects.
+                filter(pk__gt=last_pk).
+                order_by("pk").
+                values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            with transaction.atomic():
+                snapshotted += OrderItem.objects.filter(
+                    order__gte=pks[0], order__lte=pks[-1], unit_price__isnull=True
+                ).snapshot_prices()
+                updated += Order.objects.filter(
+                    pk__gte=pks[0], pk__lte=pks[-1]
+                ).update_totals()
+            last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshotted prices for {snapshotted} order lines and updated "
+            f"totals for {updated} orders."
+        ))
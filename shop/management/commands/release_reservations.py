@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.reservations import reconcile_reserved_quantities, release_expired
+
+
+class Command(BaseCommand):
+    help = "Release expired cart stock reservations in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and release expired holds every --interval seconds.",
+        )
+        parser.add_argument("--interval", type=float, default=30)
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help="Recompute Product.reserved_quantity from the reservation table.",
+        )
+
+    def handle(self, *args, **options):
+        if options["reconcile"]:
+            updated = reconcile_reserved_quantities()
+            self.stdout.write(f"Reconciled reserved quantities of {updated} products.")
+
+        while True:
+            released = 0
+            while True:
+                batch = release_expired(options["batch_size"])
+                released += batch
+                if batch < options["batch_size"]:
+                    break
+            self.stdout.write(f"Released {released} expired reservations.")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
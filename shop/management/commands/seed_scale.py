@@ -0,0 +1,160 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from shop.fixtures import raw_insert, refresh_derived_data, reset_sequences
+from shop.management.commands._benchmark import WORDS
+from shop.models import Order, OrderItem, Product, ProductCategory
+
+
+STATUSES = ["completed", "processing", "failed"]
+STATUS_WEIGHTS = [70, 20, 10]
+
+
+def zipf_weights(size, exponent):
+    return list(accumulate(1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Add synthetic users, categories, products and orders with skewed "
+        "distributions: a few categories hold most products, a few products "
+        "get most order lines and a few users place most orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--categories", type=int, default=200)
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--orders", type=int, default=200_000)
+        parser.add_argument("--max-lines", type=int, default=20)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--skew", type=float, default=1.1,
+                            help="Zipf exponent for category, product and user popularity.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.run_id = f"{int(time.time()):x}"
+        started = time.perf_counter()
+
+        users = self.seed_users(options["users"])
+        categories = self.seed_categories(options["categories"])
+        products = self.seed_products(options["products"], categories, options["skew"])
+        if users and products:
+            self.seed_orders(
+                options["orders"], users, products, options["skew"],
+                options["max_lines"], options["days"],
+            )
+        refresh_derived_data({ProductCategory, Product, Order, OrderItem})
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users, {len(categories)} categories, "
+            f"{len(products)} products and {options['orders']} orders "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
+
+    def seed_users(self, count):
+        User = get_user_model()
+        password = make_password(None)
+        pks = []
+        for start in range(0, count, self.batch_size):
+            created = User.objects.bulk_create(
+                User(
+                    username=f"scale_{self.run_id}_{index}",
+                    email=f"scale_{self.run_id}_{index}@example.com",
+                    password=password,
+                )
+                for index in range(start, min(start + self.batch_size, count))
+            )
+            pks.extend(user.pk for user in created)
+        self.stdout.write(f"{len(pks)} users")
+        return pks
+
+    def seed_categories(self, count):
+        created = ProductCategory.objects.bulk_create(
+            ProductCategory(name=f"{self.random.choice(WORDS).title()} {self.run_id}-{index}")
+            for index in range(count)
+        )
+        self.stdout.write(f"{len(created)} categories")
+        return [category.pk for category in created]
+
+    def seed_products(self, count, categories, skew):
+        weights = zipf_weights(len(categories), skew)
+        products = []
+        for start in range(0, count, self.batch_size):
+            batch = [
+                Product(
+                    name=" ".join(self.random.sample(WORDS, 3)).title(),
+                    description=" ".join(self.random.sample(WORDS, 8)),
+                    price=Decimal(
+                        min(self.random.lognormvariate(3, 1), 999_999)
+                    ).quantize(Decimal("0.01")),
+                    stock_quantity=self.random.choice([0, *range(1, 500)]),
+                    category_id=self.random.choices(categories, cum_weights=weights)[0],
+                )
+                for _ in range(min(self.batch_size, count - start))
+            ]
+            created = Product.objects.bulk_create(batch)
+            products.extend((product.pk, product.price) for product in created)
+        self.stdout.write(f"{len(products)} products")
+        return products
+
+    def seed_orders(self, count, users, products, skew, max_lines, days):
+        # Orders carry a spread of created_at values, which a normal insert
+        # would replace with auto_now_add, so they go in raw with explicit pks.
+        user_weights = zipf_weights(len(users), skew)
+        product_weights = zipf_weights(len(products), skew)
+        self.random.shuffle(products)
+        next_pk = (Order.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+        now = timezone.now()
+        lines = 0
+
+        for start in range(0, count, self.batch_size):
+            orders, items = [], []
+            for _ in range(min(self.batch_size, count - start)):
+                order = Order(
+                    pk=next_pk,
+                    user_id=self.random.choices(users, cum_weights=user_weights)[0],
+                    created_at=now - timedelta(days=days * self.random.random() ** 2),
+                    status=self.random.choices(STATUSES, STATUS_WEIGHTS)[0],
+                    total=Decimal("0.00"),
+                    item_count=0,
+                )
+                next_pk += 1
+                size = min(max_lines, int(self.random.expovariate(1 / 2)) + 1)
+                picked = set(self.random.choices(
+                    range(len(products)), cum_weights=product_weights, k=size
+                ))
+                for index in picked:
+                    product_pk, price = products[index]
+                    quantity = min(int(self.random.expovariate(1 / 1.5)) + 1, 10)
+                    item = OrderItem(
+                        order=order,
+                        product_id=product_pk,
+                        quantity=quantity,
+                        unit_price=price,
+                        line_total=quantity * price,
+                    )
+                    order.total += item.line_total
+                    order.item_count += quantity
+                    items.append(item)
+                orders.append(order)
+
+            with transaction.atomic():
+                raw_insert(Order, orders)
+                OrderItem.objects.bulk_create(items)
+            lines += len(items)
+        reset_sequences([Order])
+        self.stdout.write(f"{count} orders with {lines} lines")
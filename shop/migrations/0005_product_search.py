@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from shop.search import install_search_backend, uninstall_search_backend
+
+
+def install_search(apps, schema_editor):
+    install_search_backend(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    uninstall_search_backend(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_alter_order_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
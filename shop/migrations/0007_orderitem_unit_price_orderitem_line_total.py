@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 10_000
+
+
+def batches(queryset):
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:BATCH_SIZE]
+        )
+        if not pks:
+            return
+        yield queryset.filter(pk__gte=pks[0], pk__lte=pks[-1])
+        last_pk = pks[-1]
+
+
+def backfill_prices(apps, schema_editor):
+    Product = apps.get_model("shop", "Product")
+    Order = apps.get_model("shop", "Order")
+    OrderItem = apps.get_model("shop", "OrderItem")
+
+    price = Subquery(Product.objects.filter(pk=OuterRef("product_id")).values("price"))
+    for batch in batches(OrderItem.objects.all()):
+        batch.update(unit_price=price, line_total=F("quantity") * price)
+
+    items = OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order")
+    for batch in batches(Order.objects.all()):
+        batch.update(
+            total=Coalesce(
+                Subquery(items.annotate(sum=Sum("line_total")).values("sum")),
+                Value(Decimal("0.00")),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0006_order_total_order_item_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def merge_duplicates(apps, schema_editor):
+    Order = apps.get_model("shop", "Order")
+    OrderItem = apps.get_model("shop", "OrderItem")
+    touched_orders = set()
+
+    duplicated_carts = (
+        Order.objects.filter(status="new")
+        .values("user")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("user", flat=True)
+    )
+    for user_id in list(duplicated_carts):
+        keep, *extra = Order.objects.filter(user_id=user_id, status="new").order_by("created_at", "pk")
+        OrderItem.objects.filter(order__in=extra).update(order=keep)
+        Order.objects.filter(pk__in=[order.pk for order in extra]).delete()
+        touched_orders.add(keep.pk)
+
+    duplicated_lines = (
+        OrderItem.objects.values("order", "product")
+        .annotate(count=Count("id"), keep=Min("id"), quantity_sum=Sum("quantity"), line_total_sum=Sum("line_total"))
+        .filter(count__gt=1)
+    )
+    for line in list(duplicated_lines):
+        OrderItem.objects.filter(pk=line["keep"]).update(
+            quantity=line["quantity_sum"],
+            line_total=line["line_total_sum"],
+        )
+        OrderItem.objects.filter(order=line["order"], product=line["product"]).exclude(pk=line["keep"]).delete()
+        touched_orders.add(line["order"])
+
+    items = OrderItem.objects.filter(order=OuterRef("pk")).order_by().values("order")
+    Order.objects.filter(pk__in=touched_orders).update(
+        total=Coalesce(
+            Subquery(items.annotate(sum=Sum("line_total")).values("sum")),
+            Value(Decimal("0.00")),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+        item_count=Coalesce(
+            Subquery(items.annotate(sum=Sum("quantity")).values("sum")),
+            Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_orderitem_unit_price_orderitem_line_total'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'new')), fields=('user',), name='unique_new_order_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'product'), name='unique_order_product'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-18 09:08
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+COUNTED = {
+    "categories": "shop.ProductCategory",
+    "products": "shop.Product",
+    "users": "shop.User",
+    "orders": "shop.Order",
+}
+
+
+def fill_counters(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Counter = apps.get_model("shop", "Counter")
+    Order = apps.get_model("shop", "Order")
+
+    counters = [
+        Counter(name=name, value=apps.get_model(label).objects.using(db_alias).count())
+        for name, label in COUNTED.items()
+    ]
+    counters.extend(
+        Counter(name=f"orders:user:{user_pk}", value=count)
+        for user_pk, count in (
+            Order.objects.using(db_alias).order_by().
+            values_list("user").annotate(count=Count("pk"))
+        )
+    )
+    Counter.objects.using(db_alias).bulk_create(counters, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_product_reserved_quantity_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
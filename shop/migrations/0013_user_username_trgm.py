@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from shop.search import install_username_search, uninstall_username_search
+
+
+def install(apps, schema_editor):
+    install_username_search(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    uninstall_username_search(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    # The index is built concurrently on Postgres.
+    atomic = False
+
+    dependencies = [
+        ('shop', '0012_order_product_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
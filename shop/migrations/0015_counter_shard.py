@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_product_name_upper_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='counter',
+            name='shard',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='counter',
+            name='name',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name='counter',
+            constraint=models.UniqueConstraint(fields=('name', 'shard'), name='unique_counter_shard'),
+        ),
+    ]
@@ -1,50 +1,26 @@
-from django.db.models import Sum, F
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.mixins import AccessMixin
+from django.core.paginator import InvalidPage, Page
+from django.http import Http404
 from shop.forms import OrderFilterForm, ProductFilterForm
 from shop.models import Order, Product
+from shop.pagination import CursorPage, CursorPaginator, InvalidCursor
+from shop.search import search_products
 
 
 class OrderFilterMixin:
     filter_from_class = OrderFilterForm
 
     def get_base_queryset(self):
-        return (
-            Order.objects.
-            select_related("user").
-            prefetch_related("items__product").
-            annotate(total=Sum(F("items__quantity")*F("items__product__price")))
-        )
+        return Order.objects.select_related("user")
 
     def get_queryset(self):
-        queryset = self.get_base_queryset().order_by("-created_at")
+        queryset = self.get_base_queryset().order_by("-created_at", "-id")
         form = self.filter_from_class(self.request.GET)
 
         if form.is_valid():
-            name = form.cleaned_data.get("name")
-            status = form.cleaned_data.get("status")
-            total_min = form.cleaned_data.get("total_min")
-            total_max = form.cleaned_data.get("total_max")
-            date_from = form.cleaned_data.get("date_from")
-            date_to = form.cleaned_data.get("date_to")
-
-            if name:
-                if name.isdigit():
-                    queryset = queryset.filter(id=int(name))
-                else:
-                    queryset = queryset.filter(user__username__icontains=name)
-
-
-            if status:
-                queryset = queryset.filter(status=status)
-
-            if total_min is not None:
-                queryset = queryset.filter(total__gte=total_min)
-            if total_max is not None:
-                queryset = queryset.filter(total__lte=total_max)
-
-            if date_from:
-                queryset = queryset.filter(created_at__date__gte=date_from)
-            if date_to:
-                queryset = queryset.filter(created_at__date__lte=date_to)
+            queryset = form.filter_queryset(queryset)
         self.filter_form = form
         return queryset
 
@@ -61,7 +37,7 @@ class ProductFilterMixin:
 
     def get_queryset(self):
         queryset = Product.objects.select_related("category").order_by("id")
-        form = self.filter_from_class(self.request.GET)
+        form = self.get_filter_form()
 
         if form.is_valid():
             name = form.cleaned_data.get("name")
@@ -73,7 +49,7 @@ class ProductFilterMixin:
                 if name.isdigit():
                     queryset = queryset.filter(id=int(name))
                 else:
-                    queryset = queryset.filter(name__icontains=name)
+                    queryset = search_products(queryset, name)
 
 
             if category:
@@ -88,6 +64,9 @@ class ProductFilterMixin:
         self.filter_form = form
         return queryset
 
+    def get_filter_form(self):
+        return self.filter_from_class(self.request.GET)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["filter_form"] = getattr(
@@ -96,6 +75,43 @@ class ProductFilterMixin:
         return context
 
 
+class CursorPaginationMixin:
+    cursor_ordering = ("id",)
+    cursor_kwarg = "cursor"
+    pagination_mode = None
+
+    def get_pagination_mode(self):
+        return self.pagination_mode or settings.PAGINATION_MODE
+
+    def paginate_queryset(self, queryset, page_size):
+        # Relevance-ordered results (e.g. a product search) can't be seeked
+        # on the cursor key, so they keep the regular page numbers.
+        if (
+            self.get_pagination_mode() != "cursor"
+            or tuple(queryset.query.order_by) != tuple(self.cursor_ordering)
+        ):
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+
+        query = self.request.GET.copy()
+        query.pop(self.page_kwarg, None)
+        query.pop(self.cursor_kwarg, None)
+        page.set_query(query, self.cursor_kwarg)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["cursor_pagination"] = isinstance(
+            context.get("page_obj"), CursorPage
+        )
+        return context
+
+
 class BackUrlDetailMixin:
     def get_back_url(self):
         return self.request.META.get("HTTP_REFERER")
@@ -104,3 +120,79 @@ class BackUrlDetailMixin:
         context = super().get_context_data(**kwargs)
         context["back_url"] = self.get_back_url()
         return context
+
+
+class AsyncLoginRequiredMixin(AccessMixin):
+    # Loads the user with the async ORM and puts it on request.user, which
+    # templates and context processors would otherwise load synchronously.
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncPaginationMixin(CursorPaginationMixin):
+    # ListView paginates inside get_context_data(), which is synchronous, so
+    # async views fetch the page first and hand it over from there.
+    async def apaginate_queryset(self, queryset, page_size):
+        if (
+            self.get_pagination_mode() == "cursor"
+            and tuple(queryset.query.order_by) == tuple(self.cursor_ordering)
+        ):
+            paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+            try:
+                page = await paginator.apage(self.request.GET.get(self.cursor_kwarg))
+            except InvalidCursor:
+                raise Http404("Invalid cursor.")
+
+            query = self.request.GET.copy()
+            query.pop(self.page_kwarg, None)
+            query.pop(self.cursor_kwarg, None)
+            page.set_query(query, self.cursor_kwarg)
+            return paginator, page, page.object_list, page.has_other_pages()
+
+        paginator = self.get_paginator(
+            queryset, page_size, allow_empty_first_page=self.get_allow_empty()
+        )
+        paginator.count = await (
+            paginator.acount() if hasattr(paginator, "acount") else queryset.acount()
+        )
+        page_number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            # A cached count may need an exact recount to validate the page.
+            number = await sync_to_async(paginator.validate_number)(
+                paginator.num_pages if page_number == "last" else page_number
+            )
+        except InvalidPage as error:
+            raise Http404(f"Invalid page ({page_number}): {error}")
+
+        bottom = (number - 1) * page_size
+        object_list = [obj async for obj in queryset[bottom:bottom + page_size]]
+        if hasattr(paginator, "check_page"):
+            try:
+                await sync_to_async(paginator.check_page)(number, object_list)
+            except InvalidPage as error:
+                raise Http404(f"Invalid page ({page_number}): {error}")
+        page = Page(object_list, number, paginator)
+        return paginator, page, object_list, page.has_other_pages()
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.paginated
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        self.paginated = await self.apaginate_queryset(
+            self.object_list, self.get_paginate_by(self.object_list)
+        )
+        return self.render_to_response(self.get_context_data())
+
+
+class AsyncDetailMixin:
+    async def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        try:
+            self.object = await queryset.aget(pk=self.kwargs[self.pk_url_kwarg])
+        except queryset.model.DoesNotExist:
+            raise Http404(f"No {queryset.model._meta.verbose_name} found matching the query")
+        return self.render_to_response(self.get_context_data(object=self.object))
@@ -1,4 +1,9 @@
-from django.db import models
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connections, models, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 
 
@@ -16,19 +21,219 @@ class ProductCategory(models.Model):
         return self.name
 
 
+def by_pk(values):
+    return Case(
+        *(When(pk=pk, then=Value(value)) for pk, value in values.items()),
+        default=Value(0),
+        output_field=models.IntegerField(),
+    )
+
+
+class OutOfStock(Exception):
+    def __init__(self, products, available):
+        super().__init__(products)
+        self.products = products
+        self.available = available
+
+
+class ProductQuerySet(models.QuerySet):
+    def lock(self, pks):
+        # Rows are always locked in primary key order so that checkouts and
+        # reservation updates sharing products can't deadlock.
+        return list(
+            self.select_for_update().
+            filter(pk__in=pks).
+            order_by("pk").
+            only("pk", "name", "stock_quantity", "reserved_quantity")
+        )
+
+    def lock_for_order(self, order, pk):
+        # The product locked as lock() does, with the units the order holds
+        # of it and has in its line.
+        of_order = {"order": order, "product": OuterRef("pk")}
+        return self.select_for_update().annotate(
+            held=Coalesce(
+                Subquery(StockReservation.objects.filter(**of_order).values("quantity")),
+                Value(0),
+            ),
+            in_cart=Coalesce(
+                Subquery(OrderItem.objects.filter(**of_order).values("quantity")),
+                Value(0),
+            ),
+        ).only("pk", "name", "price", "stock_quantity", "reserved_quantity").get(pk=pk)
+
+    def adjust_reserved(self, deltas):
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return 0
+        self.lock(deltas)
+        return self.filter(pk__in=deltas).update(
+            reserved_quantity=F("reserved_quantity") + by_pk(deltas)
+        )
+
+    def decrement_stock(self, quantities, held=None):
+        # held: units this order already reserves; they are released in the
+        # same statement and don't count against the order's availability.
+        held = held or {}
+        products = self.lock(quantities)
+        available = {
+            product.pk: product.available_quantity + held.get(product.pk, 0)
+            for product in products
+        }
+        failed = [
+            product for product in products
+            if available[product.pk] < quantities[product.pk]
+        ]
+        if failed:
+            raise OutOfStock(failed, available)
+
+        delta = by_pk(quantities)
+        updated = self.filter(
+            pk__in=quantities,
+            stock_quantity__gte=delta,
+        ).update(
+            stock_quantity=F("stock_quantity") - delta,
+            reserved_quantity=F("reserved_quantity") - by_pk(held),
+        )
+        if updated != len(quantities):
+            failed = list(self.filter(pk__in=quantities, stock_quantity__lt=delta))
+            raise OutOfStock(
+                failed, {product.pk: product.stock_quantity for product in failed}
+            )
+        return updated
+
+
 class Product(models.Model):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     stock_quantity = models.PositiveIntegerField(default=0)
+    reserved_quantity = models.PositiveIntegerField(default=0)
     category = models.ForeignKey(
         ProductCategory, on_delete=models.CASCADE, related_name="products"
     )
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["price"], name="shop_product_price_idx"),
+            models.Index(fields=["category", "price"], name="shop_product_cat_price_idx"),
+        ]
+
+    @property
+    def available_quantity(self):
+        return max(self.stock_quantity - self.reserved_quantity, 0)
+
     def __str__(self):
         return self.name
 
 
+class OrderItemQuerySet(models.QuerySet):
+    def add_quantity(self, order, product, quantity):
+        # product comes from Product.objects.lock_for_order(): its row stays
+        # locked until commit, so the stock the line is clamped to can't be
+        # taken by another cart meanwhile. One INSERT ... ON CONFLICT
+        # statement adds the line or increments it. Returns the units added.
+        available = product.stock_quantity - product.reserved_quantity + product.held
+        added = min(quantity, available - product.in_cart)
+        if added <= 0:
+            return 0
+
+        connection = connections[self.db]
+        item_table = connection.ops.quote_name(self.model._meta.db_table)
+        new_quantity = f"{item_table}.quantity + excluded.quantity"
+        sql = (
+            f"INSERT INTO {item_table} "
+            "(order_id, product_id, quantity, unit_price, line_total) "
+            "VALUES (%s, %s, %s, %s, %s) "
+            "ON CONFLICT (order_id, product_id) DO UPDATE SET "
+            f"quantity = {new_quantity}, "
+            "unit_price = excluded.unit_price, "
+            f"line_total = ({new_quantity}) * excluded.unit_price"
+        )
+        params = [
+            order.pk,
+            product.pk,
+            added,
+            product.price,
+            added * Decimal(product.price),
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+        return added
+
+    def delete(self):
+        # Lines deleted in bulk (the admin action) update their orders in one
+        # statement. There is no post_delete receiver on purpose: it would
+        # keep a cascade from Product from fast-deleting the lines.
+        with transaction.atomic(using=self.db):
+            order_ids = list(self.order_by().values_list("order_id", flat=True).distinct())
+            result = super().delete()
+            Order.objects.filter(pk__in=order_ids).update_totals()
+        return result
+
+    def snapshot_prices(self):
+        price = Subquery(
+            Product.objects.filter(pk=OuterRef("product_id")).values("price")
+        )
+        return self.update(
+            unit_price=price,
+            line_total=F("quantity") * price,
+        )
+
+
+class OrderQuerySet(models.QuerySet):
+    def update_totals(self):
+        items = (
+            OrderItem.objects.
+            filter(order=OuterRef("pk")).
+            order_by().
+            values("order")
+        )
+        return self.update(
+            total=Coalesce(
+                Subquery(items.annotate(sum=Sum("line_total")).values("sum")),
+                Value(Decimal("0.00")),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+            item_count=Coalesce(
+                Subquery(items.annotate(sum=Sum("quantity")).values("sum")),
+                Value(0),
+            ),
+        )
+
+    def release_held_stock(self):
+        # For orders about to be deleted, whose reservations go with them. The
+        # lock keeps release_expired from releasing the same holds meanwhile.
+        held = (
+            StockReservation.objects.
+            select_for_update().
+            filter(order__in=self).
+            values_list("product_id", "quantity")
+        )
+        deltas = defaultdict(int)
+        for product_id, quantity in held:
+            deltas[product_id] -= quantity
+        return Product.objects.adjust_reserved(deltas)
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            self.release_held_stock()
+            return super().delete()
+
+    def set_status(self, status):
+        # The allowed source statuses are part of the UPDATE's WHERE clause,
+        # so orders that can't make the move are left alone and the result
+        # is the number of orders actually changed.
+        if status not in Order.STATUS_TRANSITIONS:
+            raise ValueError(f"Orders can't be moved to {status!r} in bulk.")
+        return self.filter(
+            status__in=Order.STATUS_TRANSITIONS[status]
+        ).update(status=status)
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ("new", "New"),
@@ -37,6 +242,14 @@ class Order(models.Model):
         ("failed", "Failed"),
     ]
 
+    # Bulk status changes: target status -> statuses it can be reached from.
+    # A "new" order is a cart and only leaves that state through checkout.
+    STATUS_TRANSITIONS = {
+        "processing": ["failed"],
+        "completed": ["processing"],
+        "failed": ["processing"],
+    }
+
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="orders"
     )
@@ -44,9 +257,45 @@ class Order(models.Model):
     status = models.CharField(
         max_length=20, choices=STATUS_CHOICES, default="new"
     )
+    total = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, db_index=True
+    )
+    item_count = models.PositiveIntegerField(default=0)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Also the index behind every cart lookup by user.
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(status="new"),
+                name="unique_new_order_per_user",
+            ),
+        ]
+        # Order lists sort newest first, optionally within a status or a user.
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="shop_order_created_idx"),
+            models.Index(fields=["status", "-created_at", "-id"], name="shop_order_status_created_idx"),
+            models.Index(fields=["user", "-created_at", "-id"], name="shop_order_user_created_idx"),
+            # The process_orders queue: small however many orders are done.
+            models.Index(
+                fields=["id"],
+                condition=models.Q(status="processing"),
+                name="shop_order_processing_idx",
+            ),
+        ]
 
     def get_total_price(self):
-        return sum(item.get_total_price() for item in self.items.all())
+        return sum(item.line_total for item in self.items.all())
+
+    def update_totals(self):
+        Order.objects.filter(pk=self.pk).update_totals()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=self._state.db):
+            Order.objects.filter(pk=self.pk).release_held_stock()
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return f"Order #{self.id}"
@@ -60,9 +309,83 @@ class OrderItem(models.Model):
         Product, on_delete=models.CASCADE, related_name="order_items"
     )
     quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(
+        max_digits=8, decimal_places=2, null=True, blank=True
+    )
+    line_total = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0
+    )
+
+    objects = OrderItemQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order", "product"],
+                name="unique_order_product",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.unit_price is None:
+            self.unit_price = self.product.price
+        self.line_total = self.quantity * Decimal(self.unit_price)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {
+                *update_fields, "unit_price", "line_total"
+            }
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=self._state.db):
+            result = super().delete(*args, **kwargs)
+            Order.objects.filter(pk=self.order_id).update_totals()
+        return result
 
     def get_total_price(self):
-        return self.quantity * self.product.price
+        return self.line_total
 
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
+
+
+class StockReservation(models.Model):
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="reservations"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="reservations"
+    )
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["order", "product"],
+                name="unique_reservation_order_product",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product} x {self.quantity} until {self.expires_at:%Y-%m-%d %H:%M}"
+
+
+class Counter(models.Model):
+    # A count is the sum of its rows. Hot counts are spread over several
+    # shards, so concurrent writers rarely wait on the same row lock.
+    name = models.CharField(max_length=100)
+    shard = models.PositiveSmallIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "shard"],
+                name="unique_counter_shard",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -0,0 +1,267 @@
+import base64
+import binascii
+import hashlib
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from shop.counters import GLOBAL_COUNTERS, get_counts
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_query = ""
+        self.previous_query = ""
+        self.first_query = ""
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return self.paginator.encode_cursor(self.object_list[-1], "n")
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return self.paginator.encode_cursor(self.object_list[0], "p")
+        return None
+
+    def set_query(self, query, cursor_kwarg="cursor"):
+        self.first_query = query.urlencode()
+        for attr, cursor in (
+            ("next_query", self.next_cursor),
+            ("previous_query", self.previous_cursor),
+        ):
+            if cursor:
+                page_query = query.copy()
+                page_query[cursor_kwarg] = cursor
+                setattr(self, attr, page_query.urlencode())
+
+
+# Keyset paginator: pages are addressed by the ordering key of their first or
+# last row instead of an OFFSET, and no COUNT(*) is run. The ordering must be
+# unique, e.g. ("-created_at", "-id").
+class CursorPaginator:
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.fields = [
+            (field.lstrip("-"), field.startswith("-")) for field in self.ordering
+        ]
+
+    def encode_cursor(self, obj, direction):
+        values = [self._encode_value(getattr(obj, name)) for name, _ in self.fields]
+        payload = json.dumps([direction, values], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+            if direction not in ("n", "p") or len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            # Fields turn None into None, which no seek condition accepts.
+            if not all(isinstance(value, (str, int, float)) for value in values):
+                raise InvalidCursor(cursor)
+            opts = self.queryset.model._meta
+            return direction, [
+                opts.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, ValidationError, binascii.Error):
+            raise InvalidCursor(cursor)
+
+    def page(self, cursor=None):
+        queryset, values, backwards = self._page_queryset(cursor)
+        return self._make_page(list(queryset), values, backwards)
+
+    async def apage(self, cursor=None):
+        queryset, values, backwards = self._page_queryset(cursor)
+        return self._make_page([obj async for obj in queryset], values, backwards)
+
+    def _page_queryset(self, cursor):
+        direction, values = "n", None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        backwards = direction == "p"
+
+        queryset = self.queryset.order_by(*(
+            self._flip(field) if backwards else field for field in self.ordering
+        ))
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        return queryset[:self.per_page + 1], values, backwards
+
+    def _make_page(self, object_list, values, backwards):
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if backwards:
+            object_list.reverse()
+            return CursorPage(object_list, self, True, has_more)
+        return CursorPage(object_list, self, has_more, values is not None)
+
+    def _seek(self, values, backwards):
+        condition = Q()
+        for index, (name, descending) in enumerate(self.fields):
+            lookup = "lt" if descending != backwards else "gt"
+            equal = {
+                prefix_name: value
+                for (prefix_name, _), value in zip(self.fields[:index], values)
+            }
+            condition |= Q(**equal, **{f"{name}__{lookup}": values[index]})
+        return condition
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _encode_value(value):
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        return value
+
+
+def count_version_key(model):
+    return f"shop:count-version:{model._meta.label_lower}"
+
+
+def bump_count_version(model):
+    cache.set(count_version_key(model), time.time_ns(), None)
+
+
+def get_count_version(model):
+    key = count_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+class CachedCountPaginator(Paginator):
+    # Unfiltered lists of a counted model show its counter rows (see
+    # shop.counters) as "about N". Other COUNT(*) results are cached per
+    # query for PAGINATION_COUNT_CACHE_TIMEOUT seconds, and dropped early when
+    # a row of the model is created or deleted; edits and bulk writes wait
+    # for the timeout. Pages are sliced from the queryset, not cut to such a
+    # count, and the page's rows correct it: a short page ends the list, and
+    # rows past the count's last page, or a page with none, get one exact
+    # recount before the page is refused.
+    counters = {label: name for name, label in GLOBAL_COUNTERS.items()}
+    # The counter the count was read from; such counts are estimates.
+    counter = None
+    estimated = False
+    # Whether the count came from the cache or the counters, not a COUNT(*)
+    # in this request.
+    stale = False
+
+    def cache_key(self):
+        sql, params = self.object_list.order_by().query.sql_with_params()
+        digest = hashlib.sha256(f"{sql}{params!r}".encode()).hexdigest()
+        model = self.object_list.model
+        return f"shop:list-count:{model._meta.label_lower}:{get_count_version(model)}:{digest}"
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        name = self.counters.get(self.object_list.model._meta.label)
+        if name and not query.where and not query.distinct and not query.is_sliced:
+            self.counter = name
+            self.estimated = self.stale = True
+            return get_counts([name])[name]
+
+        try:
+            key = self.cache_key()
+        except EmptyResultSet:
+            # QuerySet.none(), or a filter that can't match anything.
+            return 0
+        count = cache.get(key)
+        if count is not None:
+            self.stale = True
+            return count
+        count = self.object_list.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    async def acount(self):
+        return await sync_to_async(lambda: self.count)()
+
+    def set_count(self, count):
+        self.estimated = self.stale = False
+        self.__dict__["count"] = count
+        self.__dict__.pop("num_pages", None)
+        if self.counter is None:
+            cache.set(self.cache_key(), count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+
+    def recount(self):
+        self.set_count(self.object_list.count())
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.stale:
+                raise
+            self.recount()
+            return super().validate_number(number)
+
+    def check_page(self, number, object_list):
+        if not self.stale:
+            return
+        bottom = (number - 1) * self.per_page
+        rows = len(object_list)
+        if rows == self.per_page:
+            # Counters can miss rows for good (loaddata, bulk_create() until
+            # the recount command); cached counts expire.
+            if (
+                self.counter
+                and number >= self.num_pages
+                and self.object_list[bottom + rows:].exists()
+            ):
+                self.recount()
+        elif rows or number == 1:
+            if bottom + rows != self.count:
+                self.set_count(bottom + rows)
+            self.estimated = False
+        else:
+            self.recount()
+            self.validate_number(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = self.object_list[bottom:bottom + self.per_page]
+        self.check_page(number, object_list)
+        return self._get_page(object_list, number, self)
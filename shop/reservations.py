@@ -0,0 +1,110 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from shop.models import Order, Product, StockReservation
+
+
+def reservation_expiry():
+    return timezone.now() + timedelta(seconds=settings.CART_RESERVATION_TTL)
+
+
+def get_held_quantities(order, lock=False):
+    reservations = StockReservation.objects.filter(order=order)
+    if lock:
+        reservations = reservations.select_for_update()
+    return dict(reservations.values_list("product_id", "quantity"))
+
+
+def sync_reservations(order):
+    # Makes the order's holds match its lines and extends them by the TTL.
+    # Must run inside the transaction that changed the lines; the order row
+    # lock serializes concurrent cart actions of the same user.
+    list(Order.objects.select_for_update().filter(pk=order.pk).values_list("pk"))
+    wanted = dict(order.items.values_list("product_id", "quantity"))
+    held = get_held_quantities(order, lock=True)
+
+    if wanted:
+        expires_at = reservation_expiry()
+        StockReservation.objects.bulk_create(
+            [
+                StockReservation(
+                    order=order,
+                    product_id=product_id,
+                    quantity=quantity,
+                    expires_at=expires_at,
+                )
+                for product_id, quantity in wanted.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["order", "product"],
+            update_fields=["quantity", "expires_at"],
+        )
+    if held.keys() - wanted.keys():
+        StockReservation.objects.filter(
+            order=order, product_id__in=held.keys() - wanted.keys()
+        ).delete()
+
+    Product.objects.adjust_reserved({
+        product_id: wanted.get(product_id, 0) - held.get(product_id, 0)
+        for product_id in wanted.keys() | held.keys()
+    })
+
+
+def reserve_line(order, product, quantity):
+    # Holds quantity units of a product for the order, and extends that
+    # hold by the TTL. product comes from Product.objects.lock_for_order().
+    StockReservation.objects.bulk_create(
+        [StockReservation(
+            order=order,
+            product_id=product.pk,
+            quantity=quantity,
+            expires_at=reservation_expiry(),
+        )],
+        update_conflicts=True,
+        unique_fields=["order", "product"],
+        update_fields=["quantity", "expires_at"],
+    )
+    Product.objects.filter(pk=product.pk).update(
+        reserved_quantity=F("reserved_quantity") + quantity - product.held
+    )
+
+
+def release_expired(batch_size=1000, now=None):
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = list(
+            StockReservation.objects.
+            select_for_update(skip_locked=True).
+            filter(expires_at__lte=now).
+            order_by("pk").
+            values_list("pk", "product_id", "quantity")[:batch_size]
+        )
+        if not expired:
+            return 0
+
+        deltas = defaultdict(int)
+        for _, product_id, quantity in expired:
+            deltas[product_id] -= quantity
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in expired]).delete()
+        Product.objects.adjust_reserved(deltas)
+    return len(expired)
+
+
+def reconcile_reserved_quantities():
+    held = (
+        StockReservation.objects.
+        filter(product=OuterRef("pk")).
+        order_by().
+        values("product").
+        annotate(sum=Sum("quantity")).
+        values("sum")
+    )
+    return Product.objects.update(
+        reserved_quantity=Coalesce(Subquery(held), Value(0))
+    )
@@ -0,0 +1,108 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+
+# Set for each request by ReplicaRoutingMiddleware. Outside a request
+# (management commands, the shell, workers) everything uses the primary.
+_routing = ContextVar("shop_replica_routing", default=None)
+
+# The app label DatabaseCache routes its table under.
+CACHE_APP_LABEL = "django_cache"
+
+# Reads that stay on the primary even in read-only views: a session written
+# at login and read from a lagging replica would log the user back out, and
+# the database cache would miss version bumps.
+PRIMARY_ONLY_APPS = {"sessions", CACHE_APP_LABEL}
+
+# Present while a client's own writes may not have reached the replicas yet.
+STICKY_COOKIE = "db_primary"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def read_only(view):
+    view.read_only = True
+    return view
+
+
+def is_read_only(view):
+    return getattr(getattr(view, "view_class", view), "read_only", False)
+
+
+def reading_from_replica():
+    state = _routing.get()
+    return state is not None and state["replica"] is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if (
+            state is None
+            or state["replica"] is None
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+        ):
+            return None
+        return state["replica"]
+
+    def db_for_write(self, model, **hints):
+        # Always the primary, also for objects that were read from a replica.
+        # Filling the database cache isn't a change of the client's own.
+        state = _routing.get()
+        if state is not None and model._meta.app_label != CACHE_APP_LABEL:
+            state["wrote"] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The primary and its replicas hold the same rows.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary by replication.
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    # Views marked read-only (read_only = True, or the read_only decorator)
+    # read from one of DATABASE_REPLICAS for GET and HEAD requests. After a
+    # request that wrote, the client reads from the primary for
+    # REPLICA_STICKY_SECONDS, so e.g. the order list right after checkout
+    # shows the new order.
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {"replica": None, "wrote": False}
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        if state["wrote"] or request.method not in SAFE_METHODS:
+            response.set_cookie(
+                STICKY_COOKIE, "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if (
+            state is not None
+            and request.method in ("GET", "HEAD")
+            and STICKY_COOKIE not in request.COOKIES
+            and is_read_only(view_func)
+        ):
+            state["replica"] = random.choice(settings.DATABASE_REPLICAS)
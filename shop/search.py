@@ -0,0 +1,202 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+
+SQLITE_FTS_TABLE = "shop_product_fts"
+
+SQLITE_FTS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_ai AFTER INSERT ON shop_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_ad AFTER DELETE ON shop_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS shop_product_fts_au AFTER UPDATE OF name, description ON shop_product BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+POSTGRES_SEARCH_VECTOR = (
+    "to_tsvector('simple', \"shop_product\".\"name\" || ' ' || \"shop_product\".\"description\")"
+)
+
+# The name filter is icontains, which compiles to UPPER(name) LIKE UPPER(%s)
+# on Postgres; the trigram index has to be on that expression to serve it.
+POSTGRES_NAME_INDEX = (
+    "CREATE INDEX IF NOT EXISTS shop_product_name_upper_trgm "
+    "ON shop_product USING gin ((UPPER(name::text)) gin_trgm_ops)"
+)
+
+POSTGRES_INDEXES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    POSTGRES_NAME_INDEX,
+    "CREATE INDEX IF NOT EXISTS shop_product_search_vector "
+    "ON shop_product USING gin (to_tsvector('simple', name || ' ' || description))",
+]
+
+
+# Order search by username: icontains compiles to UPPER(username) LIKE
+# UPPER(%s) on Postgres, which a trigram index on the same expression serves.
+POSTGRES_USERNAME_INDEX = (
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS shop_user_username_trgm "
+    "ON shop_user USING gin ((UPPER(username::text)) gin_trgm_ops)"
+)
+
+
+def install_search_backend(using_connection):
+    vendor = using_connection.vendor
+    with using_connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5("
+                "name, description, content='shop_product', content_rowid='id')"
+            )
+            # Rebuilding shop_product (e.g. an AlterField on SQLite) drops the
+            # triggers, so the index is resynced whenever they go missing.
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master "
+                "WHERE type = 'trigger' AND name LIKE 'shop_product_fts_%'"
+            )
+            if cursor.fetchone()[0] < len(SQLITE_FTS_TRIGGERS):
+                for statement in SQLITE_FTS_TRIGGERS:
+                    cursor.execute(statement)
+                cursor.execute(
+                    f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')"
+                )
+        elif vendor == "postgresql":
+            for statement in POSTGRES_INDEXES:
+                cursor.execute(statement)
+
+
+def uninstall_search_backend(using_connection):
+    vendor = using_connection.vendor
+    with using_connection.cursor() as cursor:
+        if vendor == "sqlite":
+            for suffix in ("ai", "ad", "au"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS shop_product_fts_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}")
+        elif vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS shop_product_search_vector")
+            cursor.execute("DROP INDEX IF EXISTS shop_product_name_upper_trgm")
+            cursor.execute("DROP INDEX IF EXISTS shop_product_name_trgm")
+
+
+def install_name_search(using_connection):
+    # Replaces the trigram index on bare name that earlier installs created,
+    # which the UPPER(name) LIKE filter couldn't use.
+    if using_connection.vendor == "postgresql":
+        with using_connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(POSTGRES_NAME_INDEX)
+            cursor.execute("DROP INDEX IF EXISTS shop_product_name_trgm")
+
+
+def uninstall_name_search(using_connection):
+    if using_connection.vendor == "postgresql":
+        with using_connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS shop_product_name_trgm "
+                "ON shop_product USING gin (name gin_trgm_ops)"
+            )
+            cursor.execute("DROP INDEX IF EXISTS shop_product_name_upper_trgm")
+
+
+def install_username_search(using_connection):
+    if using_connection.vendor == "postgresql":
+        with using_connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(POSTGRES_USERNAME_INDEX)
+
+
+def uninstall_username_search(using_connection):
+    if using_connection.vendor == "postgresql":
+        with using_connection.cursor() as cursor:
+            cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS shop_user_username_trgm")
+
+
+def build_fts_query(query):
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_products(queryset, query):
+    query = query.strip()
+    if not query:
+        return queryset
+
+    # The database the queryset reads from, which may be a replica.
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        return (
+            queryset.annotate(
+                search_match=RawSQL(
+                    f"{POSTGRES_SEARCH_VECTOR} @@ websearch_to_tsquery('simple', %s)",
+                    [query],
+                    output_field=BooleanField(),
+                ),
+                search_rank=RawSQL(
+                    f"ts_rank({POSTGRES_SEARCH_VECTOR}, websearch_to_tsquery('simple', %s))"
+                    " + similarity(\"shop_product\".\"name\", %s)",
+                    [query, query],
+                    output_field=FloatField(),
+                ),
+            )
+            .filter(Q(name__icontains=query) | Q(search_match=True))
+            .order_by("-search_rank", "id")
+        )
+
+    if vendor == "sqlite":
+        match = build_fts_query(query)
+        if match:
+            # A join (rather than a correlated subquery) lets SQLite drive the
+            # query from the FTS index and read bm25 once per matching row.
+            return queryset.extra(
+                tables=[SQLITE_FTS_TABLE],
+                where=[
+                    f"{SQLITE_FTS_TABLE}.rowid = \"shop_product\".\"id\"",
+                    f"{SQLITE_FTS_TABLE} MATCH %s",
+                ],
+                params=[match],
+                select={"search_rank": f"-{SQLITE_FTS_TABLE}.rank"},
+            ).order_by("-search_rank", "id")
+
+    return queryset.filter(name__icontains=query)
+
+
+def parse_order_id(text):
+    # Anything longer can't be a bigint primary key.
+    return int(text) if re.fullmatch(r"[0-9]{1,18}", text) else None
+
+
+def search_orders(queryset, query):
+    # "#123" finds an order by id and "@name" a user's orders by exact
+    # username. Anything else matches usernames containing it, and a number
+    # also the order with that id. Matching users are found first, on the
+    # username index, and their orders then read by user_id.
+    query = query.strip()
+    if query.startswith("#"):
+        order_id = parse_order_id(query[1:])
+        return queryset.none() if order_id is None else queryset.filter(pk=order_id)
+    if query.startswith("@") and len(query) > 1:
+        return queryset.filter(user__username=query[1:])
+
+    users = get_user_model().objects.filter(username__icontains=query).values("pk")
+    order_id = parse_order_id(query)
+    if order_id is not None:
+        return queryset.filter(Q(pk=order_id) | Q(user__in=users))
+    return queryset.filter(user__in=users)
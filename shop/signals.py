@@ -0,0 +1,124 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from shop.categories import bump_category_version
+from shop.counters import increment, user_orders_key
+from shop.fragments import bump_version
+from shop.models import Order, OrderItem, Product, ProductCategory, User
+from shop.pagination import bump_count_version
+
+
+# Signals don't fire for bulk_create() or QuerySet.update(); code that
+# creates rows that way bumps the counters itself, and the recount command
+# repairs any drift.
+COUNTED = {
+    ProductCategory: "categories",
+    Product: "products",
+    User: "users",
+}
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=User)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(COUNTED[sender])
+
+
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=User)
+def count_deleted(sender, instance, **kwargs):
+    increment(COUNTED[sender], -1)
+
+
+@receiver(post_save, sender=Order)
+def count_order_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment("orders")
+        increment(user_orders_key(instance.user_id))
+
+
+@receiver(post_delete, sender=Order)
+def count_order_deleted(sender, instance, **kwargs):
+    increment("orders", -1)
+    increment(user_orders_key(instance.user_id), -1)
+
+
+@receiver(post_save, sender=OrderItem)
+def update_order_totals(sender, instance, raw=False, **kwargs):
+    # Lines saved one at a time, as edits in the admin. Bulk writes
+    # (add_quantity, snapshot_prices, bulk_create) and deletes update the
+    # totals themselves.
+    if not raw:
+        Order.objects.filter(pk=instance.order_id).update_totals()
+
+
+# A product's lines are fast-deleted by the cascade, so its orders are
+# noted before and updated after, in one statement per product.
+@receiver(pre_delete, sender=Product)
+def note_product_orders(sender, instance, **kwargs):
+    instance._line_order_ids = list(
+        OrderItem.objects.filter(product=instance).values_list("order_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def update_product_orders(sender, instance, **kwargs):
+    order_ids = getattr(instance, "_line_order_ids", None)
+    if order_ids:
+        Order.objects.filter(pk__in=order_ids).update_totals()
+
+
+@receiver(pre_delete, sender=User)
+def release_deleted_user_stock(sender, instance, **kwargs):
+    # Orders deleted directly release their holds in Order.delete(); a
+    # deleted product's holds need no release, its reserved_quantity goes
+    # with it.
+    Order.objects.filter(user=instance).release_held_stock()
+
+
+def bump_now_and_on_commit(bump, *args):
+    # The second bump drops anything another process cached from the old
+    # rows between this write and the commit.
+    bump(*args)
+    transaction.on_commit(lambda: bump(*args))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_card(sender, instance, **kwargs):
+    bump_now_and_on_commit(bump_version, "product", instance.pk)
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def invalidate_category_cards(sender, instance, **kwargs):
+    bump_now_and_on_commit(bump_version, "category", instance.pk)
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def invalidate_category_index(sender, instance, **kwargs):
+    bump_now_and_on_commit(bump_category_version)
+
+
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=User)
+def invalidate_created_list_counts(sender, instance, created, raw=False, **kwargs):
+    # Edits (every login saves the user, every fulfilment step the order)
+    # leave the cached counts to their timeout.
+    if created:
+        bump_now_and_on_commit(bump_count_version, sender)
+
+
+@receiver(post_delete, sender=ProductCategory)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=User)
+def invalidate_list_counts(sender, instance, **kwargs):
+    bump_now_and_on_commit(bump_count_version, sender)
@@ -0,0 +1,11 @@
+from django import template
+
+from shop.fragments import render_product_cards
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_cards(products, show_category=True):
+    return render_product_cards(products, show_category)
@@ -0,0 +1,11 @@
+from django.urls import include, path
+
+from minishop_manager.urls import urlpatterns as project_urlpatterns
+from shop.urls import async_catalog_urlpatterns, urlpatterns as shop_urlpatterns
+
+
+# The project URLs with ASYNC_CATALOG_VIEWS switched on.
+urlpatterns = [
+    path("", include((async_catalog_urlpatterns + shop_urlpatterns, "shop"))),
+    *project_urlpatterns,
+]
@@ -0,0 +1,138 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+
+from shop.categories import bump_category_version
+from shop.models import Order, Product, ProductCategory
+
+
+@override_settings(ROOT_URLCONF="shop.tests.async_urls")
+class AsyncCatalogViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username="async_user", password="async_user_pass"
+        )
+        cls.category = ProductCategory.objects.create(name="Async category")
+        cls.other_category = ProductCategory.objects.create(name="Other category")
+        cls.products = [
+            Product.objects.create(
+                name=f"Async product {index}",
+                price=10 + index,
+                stock_quantity=5,
+                category=cls.category if index % 2 else cls.other_category,
+            )
+            for index in range(15)
+        ]
+        Order.objects.create(user=cls.user, status="completed")
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+
+    def test_catalog_urls_resolve_to_async_views(self):
+        for url in (
+            reverse("shop:index"),
+            reverse("shop:product-list"),
+            reverse("shop:product-detail", args=[self.products[0].pk]),
+            reverse("shop:productcategory-list"),
+            reverse("shop:productcategory-detail", args=[self.category.pk]),
+        ):
+            with self.subTest(url=url):
+                self.assertTrue(iscoroutinefunction(resolve(url).func))
+
+    async def test_login_required(self):
+        await self.async_client.alogout()
+        for url in (reverse("shop:index"), reverse("shop:product-list")):
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response.url.startswith(reverse("accounts:login")))
+
+    async def test_index(self):
+        response = await self.async_client.get(reverse("shop:index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["num_products"], 15)
+        self.assertEqual(response.context["num_myorders"], 1)
+
+    async def test_product_list_filters_and_paginates(self):
+        # A stale category index is reloaded with the async ORM too.
+        bump_category_version()
+        response = await self.async_client.get(reverse("shop:product-list"), {"page": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [product.pk for product in response.context["product_list"]],
+            [product.pk for product in self.products[10:]],
+        )
+        self.assertEqual(response.context["paginator"].num_pages, 2)
+
+        response = await self.async_client.get(
+            reverse("shop:product-list"), {"category": self.category.pk}
+        )
+        self.assertEqual(
+            [product.pk for product in response.context["product_list"]],
+            [product.pk for product in self.products[1::2]],
+        )
+        self.assertContains(response, "Async category")
+
+        response = await self.async_client.get(reverse("shop:product-list"), {"page": 9})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "django_cache",
+        },
+    })
+    async def test_database_cache(self):
+        # Database cache reads are ORM queries, which the event loop refuses.
+        await sync_to_async(call_command)("createcachetable", verbosity=0)
+        for url in (
+            reverse("shop:index"),
+            reverse("shop:product-list"),
+            reverse("shop:product-list"),
+            reverse("shop:product-detail", args=[self.products[0].pk]),
+            reverse("shop:productcategory-list"),
+            reverse("shop:productcategory-detail", args=[self.category.pk]),
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Async product 1")
+
+    @override_settings(PAGINATION_MODE="cursor")
+    async def test_product_list_cursor_pagination(self):
+        response = await self.async_client.get(reverse("shop:product-list"))
+        page = response.context["page_obj"]
+        self.assertTrue(response.context["cursor_pagination"])
+        response = await self.async_client.get(
+            reverse("shop:product-list"), {"cursor": page.next_cursor}
+        )
+        self.assertEqual(
+            [product.pk for product in response.context["product_list"]],
+            [product.pk for product in self.products[10:]],
+        )
+
+    async def test_product_detail(self):
+        response = await self.async_client.get(
+            reverse("shop:product-detail", args=[self.products[0].pk])
+        )
+        self.assertContains(response, "Async product 0")
+        self.assertContains(response, "Other category")
+
+        response = await self.async_client.get(reverse("shop:product-detail", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_category_list_and_detail(self):
+        response = await self.async_client.get(reverse("shop:productcategory-list"))
+        self.assertEqual(
+            [(category.name, category.product_count)
+             for category in response.context["productcategory_list"]],
+            [("Async category", 7), ("Other category", 8)],
+        )
+
+        response = await self.async_client.get(
+            reverse("shop:productcategory-detail", args=[self.category.pk])
+        )
+        self.assertEqual(len(response.context["products"]), 7)
+        self.assertContains(response, "Async product 1")
@@ -0,0 +1,111 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from accounts.models import SupportRequest
+from shop.counters import dashboard_counts
+from shop.fixtures import stream_records
+from shop.models import Order, OrderItem, Product, ProductCategory
+
+
+SEED_FIXTURE = Path(settings.BASE_DIR) / "minishop_manager_db_data.json"
+
+
+class StreamRecordsTest(TestCase):
+    def test_records_split_across_reads(self):
+        fixture = '[\n {"pk": 1, "name": "a, ]"},\n {"pk": 2, "nested": [1, {"x": 2}]}\n]\n'
+        for read_size in (1, 3, 7, 1024):
+            self.assertEqual(
+                list(stream_records(StringIO(fixture), read_size)),
+                [{"pk": 1, "name": "a, ]"}, {"pk": 2, "nested": [1, {"x": 2}]}],
+            )
+
+    def test_empty_array(self):
+        self.assertEqual(list(stream_records(StringIO(" [ ] "))), [])
+
+    def test_truncated_fixture(self):
+        with self.assertRaises(ValueError):
+            list(stream_records(StringIO('[{"pk": 1}, {"pk": '), 4))
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(stream_records(StringIO('{"pk": 1}')))
+
+
+class FastLoaddataTest(TestCase):
+    def load(self, path):
+        stdout = StringIO()
+        call_command("fast_loaddata", str(path), stdout=stdout)
+        return stdout.getvalue()
+
+    def test_loads_seed_fixture(self):
+        stdout = self.load(SEED_FIXTURE)
+        self.assertIn("Installed 52 objects", stdout)
+        self.assertEqual(Product.objects.count(), 8)
+        self.assertEqual(OrderItem.objects.count(), 27)
+        self.assertEqual(SupportRequest.objects.count(), 1)
+
+        admin = get_user_model().objects.get(username="admin.user")
+        self.assertTrue(admin.is_superuser)
+        self.assertEqual(dashboard_counts(admin)["num_orders"], 7)
+
+        # Raw inserts keep auto_now_add values from the fixture and the
+        # derived totals are filled in after the load.
+        order = Order.objects.get(pk=1)
+        self.assertEqual(order.created_at.year, 2025)
+        self.assertEqual(order.item_count, 7)
+        self.assertFalse(OrderItem.objects.filter(unit_price__isnull=True).exists())
+
+        product = Product.objects.create(name="New", price=1, category_id=1)
+        self.assertEqual(product.pk, 9)
+
+    def test_dump_round_trip(self):
+        self.load(SEED_FIXTURE)
+        first = StringIO()
+        call_command("fast_dumpdata", stdout=first)
+
+        SupportRequest.objects.all().delete()
+        ProductCategory.objects.all().delete()
+        get_user_model().objects.all().delete()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = Path(directory.name) / "dump.json"
+        path.write_text(first.getvalue(), encoding="utf-8")
+        self.load(path)
+
+        second = StringIO()
+        call_command("fast_dumpdata", stdout=second)
+        self.assertEqual(first.getvalue(), second.getvalue())
+
+    def test_existing_rows_fail_the_load(self):
+        self.load(SEED_FIXTURE)
+        with self.assertRaises(CommandError):
+            self.load(SEED_FIXTURE)
+        self.assertEqual(Product.objects.count(), 8)
+
+
+class SeedScaleTest(TestCase):
+    def test_seeded_orders_are_consistent(self):
+        call_command(
+            "seed_scale", "--users", "5", "--categories", "3", "--products", "20",
+            "--orders", "30", "--batch-size", "7", "--seed", "1", stdout=StringIO(),
+        )
+        self.assertEqual(Order.objects.count(), 30)
+        self.assertFalse(Order.objects.filter(status="new").exists())
+        for order in Order.objects.prefetch_related("items"):
+            items = list(order.items.all())
+            self.assertTrue(items)
+            self.assertEqual(order.total, sum(item.line_total for item in items))
+            self.assertEqual(order.item_count, sum(item.quantity for item in items))
+        user = get_user_model().objects.first()
+        self.assertEqual(dashboard_counts(user)["num_orders"], 30)
+
+        # The sequence continues after the explicit pks.
+        order = Order.objects.create(user=user)
+        self.assertGreater(order.pk, 30)
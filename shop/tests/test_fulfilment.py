@@ -0,0 +1,135 @@
+from io import StringIO
+from threading import Thread
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from shop.fulfilment import process_batch
+from shop.models import Order, OrderItem, Product, ProductCategory
+
+
+def reject_expensive(orders):
+    return [order for order in orders if order.total > 1000]
+
+
+def broken_step(orders):
+    raise RuntimeError("Carrier unavailable")
+
+
+def break_on_large_orders(orders):
+    if any(order.item_count > 10 for order in orders):
+        raise RuntimeError("Carrier rejected the parcel")
+    return []
+
+
+class FulfilmentTestBase:
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="fulfilment_user")
+        category = ProductCategory.objects.create(name="Fulfilment category")
+        self.product = Product.objects.create(
+            name="Fulfilment product", price=100, stock_quantity=100, category=category
+        )
+
+    def create_order(self, quantity=1, status="processing"):
+        order = Order.objects.create(user=self.user, status=status)
+        if quantity:
+            OrderItem.objects.create(order=order, product=self.product, quantity=quantity)
+            order.update_totals()
+        return order
+
+
+class ProcessBatchTest(FulfilmentTestBase, TestCase):
+    def test_completes_processing_orders_and_fails_empty_ones(self):
+        good = [self.create_order() for _ in range(3)]
+        empty = self.create_order(quantity=0)
+        other = self.create_order(status="new")
+
+        self.assertEqual(process_batch(10), (4, 3, 1))
+        self.assertEqual(
+            set(Order.objects.filter(status="completed").values_list("pk", flat=True)),
+            {order.pk for order in good},
+        )
+        empty.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(empty.status, "failed")
+        self.assertEqual(other.status, "new")
+
+    def test_batch_size_limits_the_claim(self):
+        for _ in range(5):
+            self.create_order()
+        self.assertEqual(process_batch(2), (2, 2, 0))
+        self.assertEqual(Order.objects.filter(status="processing").count(), 3)
+
+    @override_settings(ORDER_FULFILMENT_STEPS=[
+        "shop.fulfilment.require_items",
+        "shop.tests.test_fulfilment.reject_expensive",
+    ])
+    def test_pluggable_steps(self):
+        cheap = self.create_order(quantity=2)
+        expensive = self.create_order(quantity=20)
+        self.assertEqual(process_batch(10), (2, 1, 1))
+        cheap.refresh_from_db()
+        expensive.refresh_from_db()
+        self.assertEqual((cheap.status, expensive.status), ("completed", "failed"))
+
+    def test_step_error_fails_only_the_raising_order(self):
+        good = [self.create_order() for _ in range(3)]
+        poison = self.create_order(quantity=20)
+        with self.assertLogs("shop.fulfilment", "ERROR") as logs:
+            self.assertEqual(process_batch(10, [break_on_large_orders]), (4, 3, 1))
+        self.assertIn(f"order {poison.pk}", logs.output[-1])
+        poison.refresh_from_db()
+        self.assertEqual(poison.status, "failed")
+        self.assertEqual(
+            Order.objects.filter(pk__in=[order.pk for order in good], status="completed").count(), 3
+        )
+
+    def test_step_error_fails_every_raising_order(self):
+        order = self.create_order()
+        with self.assertLogs("shop.fulfilment", "ERROR"):
+            self.assertEqual(process_batch(10, [broken_step]), (1, 0, 1))
+        order.refresh_from_db()
+        self.assertEqual(order.status, "failed")
+
+    def test_command_reports_throughput(self):
+        for _ in range(5):
+            self.create_order()
+        stdout = StringIO()
+        call_command("process_orders", "--batch-size", "2", stdout=stdout, stderr=StringIO())
+        self.assertIn("Processed 5 orders (5 completed, 0 failed)", stdout.getvalue())
+        self.assertFalse(Order.objects.filter(status="processing").exists())
+
+
+@skipUnless(
+    connection.features.has_select_for_update_skip_locked,
+    "Parallel workers need SELECT ... FOR UPDATE SKIP LOCKED."
+)
+class ParallelWorkersTest(FulfilmentTestBase, TransactionTestCase):
+    workers = 4
+
+    def test_each_order_is_processed_once(self):
+        orders = [self.create_order() for _ in range(200)]
+        seen = []
+
+        def record(batch):
+            seen.extend(order.pk for order in batch)
+            return []
+
+        def work():
+            try:
+                while process_batch(10, [record])[0]:
+                    pass
+            finally:
+                connection.close()
+
+        threads = [Thread(target=work) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(seen), sorted(order.pk for order in orders))
+        self.assertEqual(Order.objects.filter(status="completed").count(), 200)
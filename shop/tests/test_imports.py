@@ -0,0 +1,102 @@
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from shop.counters import dashboard_counts
+from shop.models import Order, OrderItem, Product, ProductCategory
+
+
+CSV_HEADER = "sku,name,description,price,stock_quantity,category\n"
+
+
+class ImportProductsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.category = ProductCategory.objects.create(name="Meat")
+
+    def import_file(self, content, name="products.csv", **options):
+        path = Path(self.directory.name) / name
+        path.write_text(content, encoding="utf-8")
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            "import_products", str(path), stdout=stdout, stderr=stderr, **options
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_creates_products_and_categories(self):
+        stdout, _ = self.import_file(
+            CSV_HEADER
+            + "A1,Beef Steak,aged,12.50,5,Meat\n"
+            + "F1,Salmon,,20,3,Fish\n"
+        )
+        self.assertIn("2 created, 0 updated, 0 rejected", stdout)
+
+        steak = Product.objects.get(sku="A1")
+        salmon = Product.objects.get(sku="F1")
+        self.assertEqual(steak.category, self.category)
+        self.assertEqual(steak.price, Decimal("12.50"))
+        self.assertEqual(salmon.category.name, "Fish")
+        user = get_user_model().objects.create_user(username="counter")
+        counts = dashboard_counts(user)
+        self.assertEqual(counts["num_products"], 2)
+        self.assertEqual(counts["num_categories"], 2)
+
+    def test_updates_by_sku(self):
+        product = Product.objects.create(
+            sku="A1", name="Old", price=1, stock_quantity=1, category=self.category
+        )
+        stdout, _ = self.import_file(CSV_HEADER + "A1,New,,2,7,Meat\n")
+        self.assertIn("0 created, 1 updated", stdout)
+
+        product.refresh_from_db()
+        self.assertEqual(product.name, "New")
+        self.assertEqual(product.stock_quantity, 7)
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        stdout, stderr = self.import_file(
+            CSV_HEADER
+            + "A1,Beef Steak,,12.50,5,Meat\n"
+            + "A2,,,1,1,Meat\n"
+            + "A3,Pork,,abc,1,Meat\n"
+            + "A4,Lamb,,1,-2,Meat\n"
+            + "A5,Veal,,3,1,Meat\n",
+            batch_size=2,
+        )
+        self.assertIn("2 created, 0 updated, 3 rejected", stdout)
+        self.assertIn("line 3: name is required", stderr)
+        self.assertIn("line 4: price must be a number", stderr)
+        self.assertIn("line 5: stock_quantity must not be negative", stderr)
+        self.assertEqual(
+            sorted(Product.objects.values_list("sku", flat=True)), ["A1", "A5"]
+        )
+
+    def test_jsonl(self):
+        stdout, stderr = self.import_file(
+            '{"sku": "A1", "name": "Beef", "price": "3.10", "category": "Meat"}\n'
+            "not json\n",
+            name="products.jsonl",
+        )
+        self.assertIn("1 created", stdout)
+        self.assertIn("line 2: invalid JSON", stderr)
+        self.assertEqual(Product.objects.get(sku="A1").stock_quantity, 0)
+
+    def test_price_change_reprices_open_carts(self):
+        product = Product.objects.create(
+            sku="A1", name="Beef", price=10, stock_quantity=10, category=self.category
+        )
+        user = get_user_model().objects.create_user(username="buyer")
+        order = Order.objects.create(user=user)
+        item = OrderItem.objects.create(order=order, product=product, quantity=2)
+
+        self.import_file(CSV_HEADER + "A1,Beef,,15,10,Meat\n")
+        item.refresh_from_db()
+        order.refresh_from_db()
+        self.assertEqual(item.unit_price, 15)
+        self.assertEqual(order.total, 30)
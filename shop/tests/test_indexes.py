@@ -0,0 +1,37 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from shop.indexes import full_scans, hot_queries
+from shop.models import Order, Product, ProductCategory
+
+
+class HotQueryIndexTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="index_user", password="index_pass", is_staff=True
+        )
+        category = ProductCategory.objects.create(name="Index category")
+        Product.objects.create(
+            name="Index product", price=Decimal("15.00"), stock_quantity=1, category=category
+        )
+        Order.objects.create(user=self.user, status="processing")
+
+    def assertUsesIndex(self, name, queryset):
+        self.assertNotIn(
+            queryset.model._meta.db_table, full_scans(queryset),
+            f"{name}:\n{queryset.explain()}",
+        )
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in hot_queries(self.user).items():
+            with self.subTest(query=name):
+                self.assertUsesIndex(name, queryset)
+
+    def test_check_command(self):
+        out = StringIO()
+        call_command("check_indexes", stdout=out)
+        self.assertNotIn("FULL SCAN", out.getvalue())
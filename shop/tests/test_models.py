@@ -1,6 +1,14 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from shop.models import Product, ProductCategory
+from shop.counters import dashboard_counts, get_counts, increment, recount, user_orders_key
+from shop.models import Counter, Order, OrderItem, Product, ProductCategory
 
 
 class ProductModelTests(TestCase):
@@ -26,4 +34,191 @@ class ProductCategoryModelTests(TestCase):
         self.assertEqual(
             str(category),
             "Test_Category"
-        )
\ No newline at end of file
+        )
+
+
+class OrderModelTests(TestCase):
+    def test_update_totals(self):
+        user = get_user_model().objects.create_user(
+            username="Test_User",
+            password="testuser3478",
+        )
+        category = ProductCategory.objects.create(
+            name="Test_Category",
+        )
+        product = Product.objects.create(
+            name="Test_Product",
+            category=category,
+            price="12.50",
+        )
+        order = Order.objects.create(user=user)
+        empty_order = Order.objects.create(user=user, status="completed")
+        OrderItem.objects.create(order=order, product=product, quantity=3)
+
+        Order.objects.update_totals()
+        order.refresh_from_db()
+        empty_order.refresh_from_db()
+        self.assertEqual(order.total, Decimal("37.50"))
+        self.assertEqual(order.item_count, 3)
+        self.assertEqual(empty_order.total, 0)
+        self.assertEqual(empty_order.item_count, 0)
+
+    def test_line_changes_update_totals(self):
+        user = get_user_model().objects.create_user(
+            username="Test_User",
+            password="testuser3478",
+        )
+        category = ProductCategory.objects.create(
+            name="Test_Category",
+        )
+        product = Product.objects.create(
+            name="Test_Product",
+            category=category,
+            price="12.50",
+        )
+        other_product = Product.objects.create(
+            name="Other_Product",
+            category=category,
+            price="2.00",
+        )
+        order = Order.objects.create(user=user, status="completed")
+        item = OrderItem.objects.create(order=order, product=product, quantity=3)
+        OrderItem.objects.create(order=order, product=other_product, quantity=1)
+
+        item.quantity = 2
+        item.save()
+        order.refresh_from_db()
+        self.assertEqual(order.total, Decimal("27.00"))
+        self.assertEqual(order.item_count, 3)
+
+        product.delete()
+        order.refresh_from_db()
+        self.assertEqual(order.total, Decimal("2.00"))
+        self.assertEqual(order.item_count, 1)
+
+        order.items.get().delete()
+        order.refresh_from_db()
+        self.assertEqual(order.total, Decimal("0.00"))
+        self.assertEqual(order.item_count, 0)
+
+        OrderItem.objects.create(order=order, product=other_product, quantity=4)
+        OrderItem.objects.filter(order=order).delete()
+        order.refresh_from_db()
+        self.assertEqual(order.item_count, 0)
+
+    def test_deleting_a_category_fast_deletes_order_lines(self):
+        user = get_user_model().objects.create_user(
+            username="Test_User",
+            password="testuser3478",
+        )
+        category = ProductCategory.objects.create(
+            name="Test_Category",
+        )
+        product = Product.objects.create(
+            name="Test_Product",
+            category=category,
+            price="12.50",
+        )
+        orders = [
+            Order.objects.create(user=user, status="completed")
+            for _ in range(5)
+        ]
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, line_total="12.50")
+            for order in orders
+        ])
+        Order.objects.update_totals()
+
+        with CaptureQueriesContext(connection) as queries:
+            category.delete()
+        statements = [query["sql"] for query in queries]
+        self.assertFalse([
+            sql for sql in statements
+            if sql.startswith('SELECT "shop_orderitem"."id"')
+        ])
+        self.assertEqual(
+            len([sql for sql in statements if sql.startswith('UPDATE "shop_order"')]),
+            1,
+        )
+        self.assertEqual(
+            set(Order.objects.values_list("item_count", flat=True)), {0}
+        )
+
+    def test_rebuild_snapshots_missing_prices(self):
+        user = get_user_model().objects.create_user(
+            username="Test_User",
+            password="testuser3478",
+        )
+        category = ProductCategory.objects.create(
+            name="Test_Category",
+        )
+        product = Product.objects.create(
+            name="Test_Product",
+            category=category,
+            price="12.50",
+        )
+        order = Order.objects.create(user=user, status="completed")
+        OrderItem.objects.create(order=order, product=product, quantity=2)
+        # As loaddata leaves lines from a fixture without prices.
+        OrderItem.objects.update(unit_price=None, line_total=0)
+        Order.objects.update(total=0, item_count=0)
+
+        call_command("rebuild_order_totals", stdout=StringIO())
+        item = order.items.get()
+        order.refresh_from_db()
+        self.assertEqual(item.unit_price, Decimal("12.50"))
+        self.assertEqual(item.line_total, Decimal("25.00"))
+        self.assertEqual(order.total, Decimal("25.00"))
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="Test_User",
+            password="testuser3478",
+        )
+        self.category = ProductCategory.objects.create(name="Test_Category")
+
+    def test_signals_keep_counts(self):
+        product = Product.objects.create(
+            name="Test_Product", category=self.category, price=10
+        )
+        order = Order.objects.create(user=self.user)
+        self.assertEqual(
+            dashboard_counts(self.user),
+            {
+                "num_categories": 1,
+                "num_products": 1,
+                "num_users": 1,
+                "num_orders": 1,
+                "num_myorders": 1,
+            },
+        )
+
+        order.delete()
+        product.delete()
+        counts = dashboard_counts(self.user)
+        self.assertEqual(counts["num_orders"], 0)
+        self.assertEqual(counts["num_myorders"], 0)
+        self.assertEqual(counts["num_products"], 0)
+
+    def test_counts_sum_shards(self):
+        with self.settings(COUNTER_SHARDS=4):
+            for _ in range(20):
+                increment("orders")
+        self.assertGreater(Counter.objects.filter(name="orders").count(), 1)
+        self.assertEqual(get_counts(["orders"]), {"orders": 20})
+
+    def test_recount_repairs_drift(self):
+        Order.objects.create(user=self.user)
+        Counter.objects.filter(name="orders").update(value=42)
+        Counter.objects.update_or_create(name="orders", shard=3, defaults={"value": 5})
+        Counter.objects.create(name=user_orders_key(self.user.pk + 1), value=3)
+
+        values, removed = recount()
+        self.assertEqual(values["orders"], 1)
+        self.assertEqual(removed, 1)
+        self.assertEqual(dashboard_counts(self.user)["num_orders"], 1)
+        self.assertFalse(
+            Counter.objects.filter(name=user_orders_key(self.user.pk + 1)).exists()
+        )
@@ -0,0 +1,204 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from shop.counters import increment
+from shop.models import Counter, Order, Product, ProductCategory
+from shop.pagination import CursorPaginator
+
+PRODUCT_URL = reverse("shop:product-list")
+ORDER_URL = reverse("shop:order-list")
+
+
+class CursorPaginatorTest(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            username="cursor_user",
+            password="cursor73563",
+        )
+        self.orders = [
+            Order.objects.create(user=user, status="completed")
+            for _ in range(7)
+        ]
+        # Identical timestamps force the paginator to break ties on id.
+        Order.objects.update(created_at=self.orders[0].created_at)
+
+    def test_pages_forward_and_back_on_ties(self):
+        paginator = CursorPaginator(
+            Order.objects.all(), 3, ("-created_at", "-id")
+        )
+        expected = sorted(self.orders, key=lambda order: -order.id)
+
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        self.assertEqual(list(first), expected[:3])
+        self.assertEqual(list(second), expected[3:6])
+        self.assertEqual(list(third), expected[6:])
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual(list(back), expected[3:6])
+        self.assertTrue(back.has_next())
+
+    def test_page_query_keeps_filters(self):
+        paginator = CursorPaginator(Order.objects.all(), 3, ("-id",))
+        page = paginator.page()
+        page.set_query(QueryDict("status=new"))
+
+        query = QueryDict(page.next_query)
+        self.assertEqual(query["status"], "new")
+        self.assertEqual(query["cursor"], page.next_cursor)
+
+
+@override_settings(PAGINATION_MODE="cursor")
+class CursorPaginatedViewsTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="cursor_staff",
+            password="cursor73563",
+            is_staff=True,
+        )
+        self.client.force_login(self.user)
+        meat = ProductCategory.objects.create(name="Meat")
+        fish = ProductCategory.objects.create(name="Fish")
+        for index in range(15):
+            Product.objects.create(
+                name=f"Product {index}",
+                category=meat if index % 2 else fish,
+                price=10,
+            )
+
+    def test_product_list_follows_next_cursor_without_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(PRODUCT_URL)
+        self.assertTrue(response.context["cursor_pagination"])
+        self.assertEqual(len(response.context["product_list"]), 10)
+        self.assertFalse(
+            any("COUNT(" in query["sql"] for query in queries.captured_queries)
+        )
+
+        page = response.context["page_obj"]
+        response = self.client.get(f"{PRODUCT_URL}?{page.next_query}")
+        self.assertEqual(len(response.context["product_list"]), 5)
+        self.assertFalse(response.context["page_obj"].has_next())
+
+    def test_product_list_cursor_keeps_category_filter(self):
+        category = ProductCategory.objects.get(name="Meat")
+        response = self.client.get(PRODUCT_URL, {"category": category.pk})
+        products = list(response.context["product_list"])
+        self.assertEqual(len(products), 7)
+        self.assertTrue(all(product.category == category for product in products))
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(ORDER_URL, {"cursor": "broken"})
+        self.assertEqual(response.status_code, 404)
+
+        for values in ([None], [[1]], [{"id": 1}]):
+            with self.subTest(values=values):
+                payload = json.dumps(["n", values]).encode()
+                cursor = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+                response = self.client.get(PRODUCT_URL, {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class CachedCountPaginatorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username="count_staff",
+            password="count73563",
+            is_staff=True,
+        )
+        self.client.force_login(self.user)
+        self.category = ProductCategory.objects.create(name="Counted")
+        for index in range(15):
+            Product.objects.create(name=f"Product {index}", category=self.category, price=index)
+
+    def count_queries(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(PRODUCT_URL, params or {})
+        counts = [query for query in queries.captured_queries if "COUNT(" in query["sql"]]
+        return response, len(counts)
+
+    def test_count_is_cached_per_filter(self):
+        response, counts = self.count_queries({"price_min": 10})
+        self.assertEqual((response.context["paginator"].count, counts), (5, 1))
+        response, counts = self.count_queries({"price_min": 10})
+        self.assertEqual((response.context["paginator"].count, counts), (5, 0))
+
+        response, counts = self.count_queries({"price_min": 12})
+        self.assertEqual((response.context["paginator"].count, counts), (3, 1))
+
+    def test_creating_a_row_drops_cached_counts(self):
+        self.count_queries({"price_min": 10})
+        product = Product.objects.create(name="Product 15", category=self.category, price=11)
+        response, counts = self.count_queries({"price_min": 10})
+        self.assertEqual((response.context["paginator"].count, counts), (6, 1))
+
+        # Edits keep the cached count; the short page corrects it.
+        product.price = 1
+        product.save()
+        response, counts = self.count_queries({"price_min": 10})
+        self.assertEqual((response.context["paginator"].count, counts), (5, 0))
+
+    def test_page_past_stale_count_recounts(self):
+        self.count_queries()
+        # bulk_create() sends no signals, so the cached count is now behind.
+        Product.objects.bulk_create(
+            Product(name=f"Bulk {index}", category=self.category, price=1)
+            for index in range(10)
+        )
+        response = self.client.get(PRODUCT_URL, {"page": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["paginator"].count, 25)
+        self.assertEqual(len(response.context["product_list"]), 5)
+
+        response = self.client.get(PRODUCT_URL, {"page": 4})
+        self.assertEqual(response.status_code, 404)
+
+    def test_unfiltered_list_reads_counters(self):
+        response, counts = self.count_queries()
+        self.assertEqual((response.context["paginator"].count, counts), (15, 0))
+        self.assertContains(response, "About 15 results")
+
+        Product.objects.create(name="Product 15", category=self.category, price=1)
+        response, counts = self.count_queries()
+        self.assertEqual((response.context["paginator"].count, counts), (16, 0))
+
+    def test_rows_missing_from_counters_are_listed(self):
+        # As after loaddata, which sends no signals to count the rows.
+        Counter.objects.filter(name="products").delete()
+        response, counts = self.count_queries()
+        self.assertEqual(counts, 1)
+        self.assertEqual(response.context["paginator"].count, 15)
+        self.assertEqual(len(response.context["product_list"]), 10)
+        self.assertTrue(response.context["page_obj"].has_next())
+        self.assertContains(response, "15 results")
+        self.assertNotContains(response, "About")
+
+    def test_short_page_settles_the_count(self):
+        increment("products", 3)
+        response, counts = self.count_queries({"page": 2})
+        self.assertEqual(counts, 0)
+        self.assertEqual(response.context["paginator"].count, 15)
+        self.assertFalse(response.context["paginator"].estimated)
+        self.assertEqual(len(response.context["product_list"]), 5)
+
+    def test_empty_page_inside_stale_count_recounts(self):
+        # Counters ahead of the rows, as after a bulk delete.
+        increment("products", 10)
+        response = self.client.get(PRODUCT_URL, {"page": 3})
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(PRODUCT_URL, {"page": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["product_list"]), 5)
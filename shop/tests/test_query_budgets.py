@@ -0,0 +1,209 @@
+from decimal import Decimal
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import SupportRequest
+from shop.counters import recount
+from shop.instrumentation import QueryBudgetMixin
+from shop.models import Order, OrderItem, Product, ProductCategory
+
+
+class QueryBudgetTestBase(QueryBudgetMixin, TestCase):
+    # Every page is measured, then the data grows, then it is measured
+    # again: a pinned count that holds at both sizes can't hide a query per
+    # row. Caches are warmed first so the counts are the steady state, which
+    # for the paginated lists includes a cached COUNT(*) or a counter read.
+    orders = 50
+    items_per_order = 5
+    sequence = count()
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.admin = User.objects.create_superuser(
+            username="budget_admin", password="budget_admin_pass"
+        )
+        self.customer = User.objects.create_user(
+            username="budget_customer", password="budget_customer_pass"
+        )
+        self.category = ProductCategory.objects.create(name="Budget category")
+        self.products = []
+        self.seed()
+        self.order = Order.objects.filter(user=self.customer).first()
+
+    def seed(self):
+        categories = ProductCategory.objects.bulk_create(
+            ProductCategory(name=f"Budget category {next(self.sequence)}")
+            for _ in range(5)
+        )
+        self.products += Product.objects.bulk_create(
+            Product(
+                name=f"Budget product {next(self.sequence)}",
+                price=Decimal("12.50"),
+                stock_quantity=10 ** 6,
+                category=category,
+            )
+            for category in [self.category, *categories]
+            for _ in range(self.items_per_order)
+        )
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(username=f"budget_user_{next(self.sequence)}")
+            for _ in range(5)
+        )
+        orders = Order.objects.bulk_create(
+            Order(user=user, status="completed")
+            for user in [self.customer, *users]
+            for _ in range(self.orders // 5)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order,
+                product=product,
+                quantity=2,
+                unit_price=product.price,
+                line_total=2 * product.price,
+            )
+            for order in orders
+            for product in self.products[-self.items_per_order:]
+        )
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update_totals()
+        SupportRequest.objects.bulk_create(
+            SupportRequest(user=user, title="Budget", content="Budget request")
+            for user in users
+        )
+        # bulk_create() sends no signals to count the rows.
+        recount()
+
+    def assertConstantQueries(self, budget, request, grow=None):
+        counts = []
+        for _ in range(2):
+            request()
+            with self.assertQueryBudget(budget) as recorder:
+                response = request()
+            self.assertLess(response.status_code, 400)
+            counts.append(recorder.count)
+            (grow or self.seed)()
+        self.assertEqual(counts, [budget, budget])
+
+
+class ShopViewQueryBudgetTest(QueryBudgetTestBase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def get(self, name, *args):
+        url = reverse(name, args=args)
+        return lambda: self.client.get(url)
+
+    def test_index(self):
+        self.assertConstantQueries(3, self.get("shop:index"))
+
+    def test_product_list(self):
+        self.assertConstantQueries(4, self.get("shop:product-list"))
+
+    def test_product_detail(self):
+        self.assertConstantQueries(3, self.get("shop:product-detail", self.products[0].pk))
+
+    def test_product_update(self):
+        self.assertConstantQueries(3, self.get("shop:product-update", self.products[0].pk))
+
+    def test_category_list(self):
+        self.assertConstantQueries(4, self.get("shop:productcategory-list"))
+
+    def test_category_detail(self):
+        self.assertConstantQueries(4, self.get("shop:productcategory-detail", self.category.pk))
+
+    def test_order_list(self):
+        self.assertConstantQueries(4, self.get("shop:order-list"))
+
+    def test_order_detail(self):
+        def add_items():
+            OrderItem.objects.bulk_create(
+                OrderItem(order=self.order, product=product, quantity=1,
+                          unit_price=product.price, line_total=product.price)
+                for product in Product.objects.exclude(order_items__order=self.order)[:10]
+            )
+            self.seed()
+
+        self.assertConstantQueries(
+            6, self.get("shop:order-detail", self.order.pk), add_items
+        )
+
+
+class AccountViewQueryBudgetTest(QueryBudgetTestBase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.customer)
+
+    def test_my_order_list(self):
+        url = reverse("accounts:myorder-list")
+        self.assertConstantQueries(3, lambda: self.client.get(url))
+
+    def test_my_order_detail(self):
+        url = reverse("accounts:myorder-detail", args=[self.order.pk])
+        self.assertConstantQueries(5, lambda: self.client.get(url))
+
+    def test_user_list_and_detail(self):
+        self.client.force_login(self.admin)
+        list_url = reverse("accounts:user-list")
+        detail_url = reverse("accounts:user-detail", args=[self.customer.pk])
+        self.assertConstantQueries(4, lambda: self.client.get(list_url))
+        self.assertConstantQueries(3, lambda: self.client.get(detail_url))
+
+
+class CartQueryBudgetTest(QueryBudgetTestBase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.customer)
+
+    def fill_cart(self, lines):
+        for product in self.products[:lines]:
+            self.client.post(reverse("shop:add-to-cart", args=[product.pk]), {"quantity": 1})
+
+    def test_cart_detail(self):
+        url = reverse("shop:cart-detail")
+        self.fill_cart(5)
+        self.assertConstantQueries(
+            5, lambda: self.client.get(url), lambda: self.fill_cart(20)
+        )
+
+    def test_add_to_cart(self):
+        url = reverse("shop:add-to-cart", args=[self.products[0].pk])
+        self.assertConstantQueries(
+            11, lambda: self.client.post(url, {"quantity": 1}), lambda: self.fill_cart(20)
+        )
+
+    def test_checkout(self):
+        url = reverse("shop:order-confirm")
+        counts = []
+        for lines in (5, 20):
+            self.fill_cart(lines)
+            with self.assertQueryBudget(13) as recorder:
+                response = self.client.post(url)
+            self.assertRedirects(response, reverse("accounts:myorder-list"), fetch_redirect_response=False)
+            counts.append(recorder.count)
+        self.assertEqual(counts, [13, 13])
+
+
+class AdminQueryBudgetTest(QueryBudgetTestBase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def test_changelists(self):
+        budgets = {
+            "shop_user": 6,
+            "shop_productcategory": 5,
+            "shop_product": 6,
+            "shop_order": 5,
+            "shop_orderitem": 6,
+            "accounts_supportrequest": 5,
+        }
+        for model, budget in budgets.items():
+            with self.subTest(model=model):
+                url = reverse(f"admin:{model}_changelist")
+                self.assertConstantQueries(budget, lambda: self.client.get(url))
@@ -0,0 +1,121 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from shop.fragments import card_key
+from shop.models import Counter, Product, ProductCategory
+from shop.routers import STICKY_COOKIE, ReplicaRouter, _routing, read_only
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTest(TestCase):
+    # "replica" is a second, separate database here, so the same rows are
+    # given different names on each side to show where a page read from.
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="replica_user", password="replica_pass", is_staff=True
+        )
+        self.category = ProductCategory.objects.create(name="Primary category")
+        self.product = Product.objects.create(
+            name="Primary product",
+            price=Decimal("10.00"),
+            stock_quantity=10,
+            category=self.category,
+        )
+        self.user.save(using="replica", force_insert=True)
+        self.category.name = "Replica category"
+        self.category.save(using="replica", force_insert=True)
+        self.product.name = "Replica product"
+        self.product.save(using="replica", force_insert=True)
+        Counter.objects.using("replica").all().delete()
+        Counter.objects.using("replica").bulk_create(Counter.objects.all())
+        self.client.force_login(self.user)
+
+    def test_read_only_views_read_from_replica(self):
+        pages = [
+            (reverse("shop:product-list"), "Replica product"),
+            (reverse("shop:product-detail", args=[self.product.pk]), "Replica product"),
+            (reverse("shop:productcategory-list"), "Replica category"),
+            (reverse("shop:productcategory-detail", args=[self.category.pk]), "Replica category"),
+        ]
+        for url, name in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, name)
+                self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_cached_data_is_read_from_primary(self):
+        cache.clear()
+        response = self.client.get(reverse("shop:product-list"))
+        self.assertContains(response, "Category: Replica category")
+        # The category index is filled from the primary.
+        self.assertContains(response, ">Primary category</option>")
+        # The product was just saved, so its card from the replica's rows
+        # may be older than its version and isn't stored.
+        self.assertIsNone(cache.get(card_key(self.product.pk, True)))
+
+        with self.settings(REPLICA_STICKY_SECONDS=0):
+            self.client.get(reverse("shop:product-list"))
+        self.assertIsNotNone(cache.get(card_key(self.product.pk, True)))
+
+    def test_other_views_read_from_primary(self):
+        response = self.client.get(reverse("shop:product-update", args=[self.product.pk]))
+        self.assertContains(response, "Primary product")
+
+    def test_write_makes_client_sticky_to_primary(self):
+        response = self.client.post(
+            reverse("shop:add-to-cart", args=[self.product.pk]), {"quantity": 1}
+        )
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(
+            Product.objects.using("replica").get(pk=self.product.pk).stock_quantity, 10
+        )
+
+        response = self.client.get(reverse("shop:product-detail", args=[self.product.pk]))
+        self.assertContains(response, "Primary product")
+
+        self.client.cookies.pop(STICKY_COOKIE)
+        response = self.client.get(reverse("shop:product-detail", args=[self.product.pk]))
+        self.assertContains(response, "Replica product")
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        response = self.client.get(reverse("shop:product-detail", args=[self.product.pk]))
+        self.assertContains(response, "Primary product")
+
+
+class ReplicaRouterTest(TestCase):
+    def test_primary_outside_requests(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Product))
+        self.assertEqual(router.db_for_write(Product), "default")
+
+    def test_sessions_read_from_primary(self):
+        router = ReplicaRouter()
+        token = _routing.set({"replica": "replica", "wrote": False})
+        try:
+            self.assertIsNone(router.db_for_read(Session))
+            self.assertEqual(router.db_for_read(Product), "replica")
+        finally:
+            _routing.reset(token)
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_relations_and_migrations(self):
+        router = ReplicaRouter()
+        primary, replica = Product(), ProductCategory()
+        primary._state.db, replica._state.db = "default", "replica"
+        self.assertIs(router.allow_relation(primary, replica), True)
+        self.assertIs(router.allow_migrate("default", "shop"), True)
+        self.assertIs(router.allow_migrate("replica", "shop"), False)
+
+    def test_read_only_decorator(self):
+        def view(request):
+            pass
+
+        self.assertIs(read_only(view).read_only, True)
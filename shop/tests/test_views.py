@@ -1,10 +1,32 @@
+import csv
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
 from http.client import responses
+from io import StringIO
+from threading import Thread
+from unittest import skipUnless
+from unittest.mock import Mock, patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from shop.models import Product, ProductCategory, Order, OrderItem
+from shop.cart import CacheCart
+from shop.checks import check_shared_cache
+from shop.fragments import card_cache_stats
+from shop.instrumentation import QueryBudgetMixin, QueryRecorder
+from shop.models import Product, ProductCategory, Order, OrderItem, StockReservation
+from shop.reservations import (
+    reconcile_reserved_quantities,
+    release_expired,
+    sync_reservations,
+)
+from shop.search import search_products
 
 PRODUCTCATEGORY_URL = reverse("shop:productcategory-list")
 PRODUCT_URL = reverse("shop:product-list")
@@ -28,6 +50,17 @@ class PrivateTestBase(TestCase):
         self.client.force_login(self.user)
 
 
+class IndexTest(PrivateTestBase):
+    def test_index_reads_counters_in_one_query(self):
+        Order.objects.create(user=self.user, status="completed")
+        # session, user, counters
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("shop:index"))
+        self.assertEqual(response.context["num_users"], 1)
+        self.assertEqual(response.context["num_orders"], 1)
+        self.assertEqual(response.context["num_myorders"], 1)
+
+
 class PublicProductCategoryTest(TestCase):
     def test_login_required(self):
         response = self.client.get(PRODUCTCATEGORY_URL)
@@ -112,8 +145,198 @@ class PrivateProductTest(PrivateTestBase):
         self.assertContains(response, "Test_Product_1")
         self.assertNotContains(response, "Test_Product_2")
 
+    def test_search_products_ranked_by_relevance(self):
+        productcategory = ProductCategory.objects.create(name="Test_Product_Category")
+        Product.objects.create(
+            name="Smoked Sausage",
+            description="beef",
+            category=productcategory,
+            price=200
+        )
+        Product.objects.create(
+            name="Beef Steak",
+            description="aged beef",
+            category=productcategory,
+            price=220
+        )
+        Product.objects.create(
+            name="Chicken Wings",
+            category=productcategory,
+            price=120
+        )
+
+        response = self.client.get(PRODUCT_URL, {"name": "bee"})
+        self.assertEqual(
+            [product.name for product in response.context["product_list"]],
+            ["Beef Steak", "Smoked Sausage"]
+        )
+
+    def test_search_builds_sql_for_the_querysets_database(self):
+        queryset = Product.objects.all()
+        self.assertTrue(search_products(queryset, "beef").query.extra_tables)
+        with patch("shop.search.connections", {queryset.db: Mock(vendor="mysql")}):
+            self.assertFalse(search_products(queryset, "beef").query.extra_tables)
+
+    def test_search_follows_renamed_product(self):
+        productcategory = ProductCategory.objects.create(name="Test_Product_Category")
+        product = Product.objects.create(
+            name="Pork Ribs",
+            category=productcategory,
+            price=200
+        )
+        product.name = "Lamb Ribs"
+        product.save()
+
+        response = self.client.get(PRODUCT_URL, {"name": "lamb"})
+        self.assertContains(response, "Lamb Ribs")
+        response = self.client.get(PRODUCT_URL, {"name": "pork"})
+        self.assertNotContains(response, "Lamb Ribs")
+
+
+class ProductCardCacheTest(PrivateTestBase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.productcategory = ProductCategory.objects.create(name="Test_Product_Category")
+        self.product = Product.objects.create(
+            name="Test_Product_1",
+            category=self.productcategory,
+            price=200,
+            stock_quantity=5,
+        )
+
+    def test_second_render_hits_cache(self):
+        misses = card_cache_stats["misses"]
+        hits = card_cache_stats["hits"]
+        self.client.get(PRODUCT_URL)
+        self.client.get(PRODUCT_URL)
+        self.assertEqual(card_cache_stats["misses"] - misses, 1)
+        self.assertEqual(card_cache_stats["hits"] - hits, 1)
+
+    def test_product_change_invalidates_card(self):
+        self.client.get(PRODUCT_URL)
+        self.product.price = 250
+        self.product.save()
+        self.assertContains(self.client.get(PRODUCT_URL), "Price: 250")
+
+    def test_category_change_invalidates_card(self):
+        self.client.get(PRODUCT_URL)
+        self.productcategory.name = "Renamed_Category"
+        self.productcategory.save()
+        self.assertContains(self.client.get(PRODUCT_URL), "Category: Renamed_Category")
+
+    def test_stock_is_not_cached(self):
+        self.client.get(PRODUCT_URL)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=3)
+        self.assertContains(self.client.get(PRODUCT_URL), "In stock: 3")
+
+    def test_page_reads_cache_once(self):
+        Product.objects.create(
+            name="Test_Product_2",
+            category=self.productcategory,
+            price=300,
+            stock_quantity=5,
+        )
+        self.client.get(PRODUCT_URL)
+        with patch.object(cache, "get_many", wraps=cache.get_many) as get_many:
+            response = self.client.get(PRODUCT_URL)
+        self.assertContains(response, "Test_Product_2")
+        get_many.assert_called_once()
+
+    def test_shared_cache_check(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ["shop.E001"])
+        with self.settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "django_cache",
+        }}):
+            self.assertEqual(check_shared_cache(None), [])
 
-class OrderTestBase(TestCase):
+    def test_staff_buttons_are_not_cached(self):
+        update_url = reverse("shop:product-update", args=[self.product.pk])
+        self.assertNotContains(self.client.get(PRODUCT_URL), update_url)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertContains(self.client.get(PRODUCT_URL), update_url)
+
+
+class CategoryChoicesTest(PrivateTestBase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user.is_staff = True
+        self.user.save()
+        self.productcategory = ProductCategory.objects.create(name="Test_Product_Category")
+
+    def test_choices_come_from_cache(self):
+        self.client.get(PRODUCT_URL)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(PRODUCT_URL)
+        self.assertContains(response, "Test_Product_Category")
+        self.assertFalse(
+            [query for query in queries if 'FROM "shop_productcategory"' in query["sql"]]
+        )
+
+    def test_new_category_appears_in_choices(self):
+        self.client.get(PRODUCT_URL)
+        self.client.post(
+            reverse("shop:productcategory-create"), {"name": "New_Category"}
+        )
+        self.assertContains(self.client.get(PRODUCT_URL), "New_Category")
+
+    def test_product_form_uses_cached_category(self):
+        response = self.client.post(
+            reverse("shop:product-create"),
+            {
+                "name": "Test_Product",
+                "description": "",
+                "price": 10,
+                "stock_quantity": 1,
+                "category": self.productcategory.pk,
+            },
+        )
+        self.assertRedirects(response, PRODUCT_URL)
+        self.assertEqual(
+            Product.objects.get(name="Test_Product").category, self.productcategory
+        )
+
+    def test_deleted_category_is_rejected(self):
+        pk = self.productcategory.pk
+        self.client.post(reverse("shop:productcategory-delete", args=[pk]))
+        response = self.client.post(
+            reverse("shop:product-create"),
+            {
+                "name": "Test_Product",
+                "price": 10,
+                "stock_quantity": 1,
+                "category": pk,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("category", response.context["form"].errors)
+
+    def test_stale_index_checks_database(self):
+        # Another worker's changes, whose version bumps this one hasn't seen.
+        deleted = ProductCategory.objects.create(name="Deleted_Elsewhere")
+        deleted_pk = deleted.pk
+        self.assertContains(self.client.get(PRODUCT_URL), "Deleted_Elsewhere")
+        with patch("shop.signals.bump_category_version"):
+            created = ProductCategory.objects.create(name="Created_Elsewhere")
+            deleted.delete()
+
+        data = {"name": "Test_Product", "price": 10, "stock_quantity": 1}
+        response = self.client.post(
+            reverse("shop:product-create"), {**data, "category": created.pk}
+        )
+        self.assertRedirects(response, PRODUCT_URL)
+        response = self.client.post(
+            reverse("shop:product-create"), {**data, "category": deleted_pk}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("category", response.context["form"].errors)
+
+
+class OrderTestBase(QueryBudgetMixin, TestCase):
     def setUp(self):
         User = get_user_model()
         self.staff_user = User.objects.create_user(
@@ -169,6 +392,224 @@ class OrderListTest(OrderTestBase):
         response = self.client.get(self.order_list_url)
         self.assertEqual(response.status_code, 200)
 
+    def test_filter_orders_by_stored_total(self):
+        Order.objects.update_totals()
+        self.client.force_login(self.staff_user)
+        response = self.client.get(self.order_list_url, {"total_min": 2000})
+        self.assertEqual(list(response.context["order_list"]), [self.order])
+        response = self.client.get(self.order_list_url, {"total_min": 3000})
+        self.assertEqual(list(response.context["order_list"]), [])
+
+    def test_search_orders(self):
+        other = Order.objects.create(user=self.staff_user, status="completed")
+        numbered = get_user_model().objects.create_user(username=str(other.pk))
+        numbered_order = Order.objects.create(user=numbered, status="completed")
+        self.client.force_login(self.staff_user)
+
+        def search(name):
+            response = self.client.get(self.order_list_url, {"name": name})
+            return set(response.context["order_list"])
+
+        self.assertEqual(search(f"#{other.pk}"), {other})
+        self.assertEqual(search("#99999999999999999999"), set())
+        self.assertEqual(search("@regular_user"), {self.order})
+        self.assertEqual(search("@regular"), set())
+        self.assertEqual(search("GULAR"), {self.order})
+        # A number is an order id or part of a username.
+        self.assertEqual(search(str(other.pk)), {other, numbered_order})
+
+    @override_settings(TIME_ZONE="America/New_York")
+    def test_filter_orders_by_local_date(self):
+        # 03:30 UTC on the 2nd is still the 1st in New York.
+        Order.objects.filter(pk=self.order.pk).update(
+            created_at=datetime(2024, 3, 2, 3, 30, tzinfo=dt_timezone.utc)
+        )
+        self.client.force_login(self.staff_user)
+        for date_from, date_to, expected in [
+            ("2024-03-01", "2024-03-01", [self.order]),
+            ("2024-03-02", "", []),
+            ("", "2024-02-29", []),
+            ("2024-02-29", "2024-03-01", [self.order]),
+            ("2024-03-01", "9999-12-31", [self.order]),
+        ]:
+            with self.subTest(date_from=date_from, date_to=date_to):
+                response = self.client.get(
+                    self.order_list_url, {"date_from": date_from, "date_to": date_to}
+                )
+                self.assertEqual(list(response.context["order_list"]), expected)
+
+    def test_order_list_query_budget(self):
+        for _ in range(10):
+            order = Order.objects.create(user=self.regular_user, status="completed")
+            OrderItem.objects.create(order=order, product=self.product, quantity=1)
+        self.client.force_login(self.staff_user)
+        # session, user, order counters, page
+        with self.assertQueryBudget(4):
+            response = self.client.get(self.order_list_url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_budget_reports_n_plus_one(self):
+        orders = [
+            Order.objects.create(user=self.regular_user, status="completed")
+            for _ in range(5)
+        ]
+        with self.assertRaisesMessage(AssertionError, "Possible N+1 (5 times)"):
+            with self.assertQueryBudget(10):
+                for order in Order.objects.filter(pk__in=[order.pk for order in orders]):
+                    order.user.username
+
+
+@override_settings(SQL_INSTRUMENTATION=True)
+class SQLInstrumentationTest(OrderTestBase):
+    def test_headers_and_log_line(self):
+        self.client.force_login(self.staff_user)
+        with self.assertLogs("shop.sql", "INFO") as logs:
+            response = self.client.get(self.order_list_url)
+        self.assertEqual(response["X-DB-Queries"], "4")
+        self.assertIn("X-DB-Time-Ms", response)
+        self.assertNotIn("X-DB-N-Plus-One", response)
+        self.assertIn("view=shop:order-list queries=4", logs.output[0])
+
+    def test_repeated_queries_share_a_fingerprint(self):
+        with QueryRecorder().record() as recorder:
+            for pk in (1, 2, 3):
+                list(Product.objects.filter(pk__in=range(pk + 1)))
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(list(recorder.repeated().values()), [3])
+        self.assertEqual(recorder.n_plus_one(3), recorder.repeated())
+
+
+class OrderExportTest(OrderTestBase):
+    def setUp(self):
+        super().setUp()
+        self.export_url = reverse("shop:order-export")
+
+    def test_export_forbidden_for_regular_user(self):
+        self.client.force_login(self.regular_user)
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_orders_csv(self):
+        Order.objects.update_totals()
+        self.client.force_login(self.staff_user)
+        response = self.client.get(self.export_url)
+        rows = list(csv.reader(
+            b"".join(response.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(rows[0], ["id", "created_at", "status", "user", "item_count", "total"])
+        self.assertEqual(rows[1][0], str(self.order.pk))
+        self.assertEqual(rows[1][3:], ["regular_user", "10", "2200.00"])
+        self.assertEqual(len(rows), 2)
+
+    def test_export_lines_jsonl_with_filters(self):
+        Order.objects.create(user=self.staff_user, status="completed")
+        self.client.force_login(self.staff_user)
+        response = self.client.get(
+            self.export_url, {"kind": "lines", "format": "jsonl", "status": "new"}
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(
+            json.loads(lines[0]),
+            {
+                "order_id": self.order.pk,
+                "order_created_at": str(self.order.created_at),
+                "order_status": "new",
+                "user": "regular_user",
+                "product_id": self.product.pk,
+                "product": "Test_Product_1",
+                "quantity": 10,
+                "unit_price": "220.00",
+                "line_total": "2200.00",
+            },
+        )
+
+    def test_export_orders_command(self):
+        Order.objects.create(user=self.staff_user, status="completed")
+        stdout = StringIO()
+        call_command("export_orders", "--name", "staff", stdout=stdout)
+        rows = list(csv.reader(stdout.getvalue().splitlines()))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][3], "staff_user")
+
+    def test_export_orders_command_rejects_invalid_filter(self):
+        with self.assertRaises(CommandError):
+            call_command("export_orders", "--total-min", "x", stdout=StringIO())
+
+
+class OrderBulkStatusTest(OrderTestBase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse("shop:order-bulk-status")
+        self.processing = [
+            Order.objects.create(user=self.staff_user, status="processing")
+            for _ in range(3)
+        ]
+        self.completed = Order.objects.create(user=self.regular_user, status="completed")
+        self.client.force_login(self.employee_user)
+
+    def statuses(self):
+        return dict(Order.objects.values_list("pk", "status"))
+
+    def test_selected_orders(self):
+        response = self.client.post(self.url, {
+            "status": "completed",
+            "scope": "selected",
+            "orders": [self.processing[0].pk, self.processing[1].pk, self.completed.pk, self.order.pk],
+        })
+        self.assertRedirects(response, f"{self.order_list_url}?", fetch_redirect_response=False)
+        statuses = self.statuses()
+        self.assertEqual(statuses[self.processing[0].pk], "completed")
+        self.assertEqual(statuses[self.processing[1].pk], "completed")
+        self.assertEqual(statuses[self.processing[2].pk], "processing")
+        # Not allowed transitions are skipped and not counted.
+        self.assertEqual(statuses[self.order.pk], "new")
+        messages = [str(message) for message in response.wsgi_request._messages]
+        self.assertEqual(messages, ["2 orders marked as completed."])
+
+    def test_filtered_orders_in_one_update(self):
+        with self.assertNumQueries(3):
+            self.client.post(
+                f"{self.url}?name=staff_user",
+                {"status": "failed", "scope": "filtered"},
+            )
+        statuses = self.statuses()
+        self.assertEqual([statuses[order.pk] for order in self.processing], ["failed"] * 3)
+        self.assertEqual(statuses[self.completed.pk], "completed")
+
+    def test_invalid_filter_changes_nothing(self):
+        self.client.post(
+            f"{self.url}?total_min=x",
+            {"status": "failed", "scope": "filtered"},
+        )
+        self.assertFalse(Order.objects.filter(status="failed").exists())
+
+    def test_selection_required_and_new_not_a_target(self):
+        self.client.post(self.url, {"status": "completed", "scope": "selected"})
+        self.client.post(self.url, {"status": "new", "scope": "filtered"})
+        self.assertEqual(Order.objects.filter(status="processing").count(), 3)
+        self.assertEqual(Order.objects.filter(status="new").count(), 1)
+        with self.assertRaises(ValueError):
+            Order.objects.set_status("new")
+
+    def test_forbidden_for_regular_user(self):
+        self.client.force_login(self.regular_user)
+        response = self.client.post(self.url, {"status": "failed", "scope": "filtered"})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Order.objects.filter(status="failed").exists())
+
+    def test_admin_action(self):
+        self.client.force_login(self.staff_user)
+        self.staff_user.is_superuser = True
+        self.staff_user.save()
+        response = self.client.post(reverse("admin:shop_order_changelist"), {
+            "action": "mark_completed",
+            "_selected_action": [order.pk for order in self.processing] + [self.completed.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Order.objects.filter(status="completed").count(), 4)
+
 
 class OrderDetailTest(OrderTestBase):
     def test_order_detail_forbidden_for_regular_user(self):
@@ -196,6 +637,19 @@ class OrderDetailTest(OrderTestBase):
         self.assertEqual(self.order.status, "processing")
         self.assertRedirects(response, self.order_detail_url)
 
+    def test_order_cannot_be_moved_back_to_new(self):
+        # The user already has a cart (self.order), and a placed order must
+        # not become one either way.
+        placed = Order.objects.create(user=self.regular_user, status="completed")
+        self.client.force_login(self.staff_user)
+        response = self.client.post(
+            reverse("shop:order-detail", args=[placed.pk]), {"status": "new"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].errors["status"])
+        placed.refresh_from_db()
+        self.assertEqual(placed.status, "completed")
+
     def test_regular_user_cannot_update_order(self):
         self.client.force_login(self.regular_user)
         response = self.client.post(
@@ -255,6 +709,28 @@ class AddToCartTest(CartTestBase):
         item = OrderItem.objects.get(product=self.product)
         self.assertEqual(item.quantity, 5)
 
+    def test_add_to_cart_query_count(self):
+        url = reverse("shop:add-to-cart", args=[self.product.pk])
+        self.client.post(url, {"quantity": 1})
+        # session, user, product, locked cart, locked product, upsert,
+        # reservation, reserved quantity, totals and the savepoint pair
+        # around them.
+        with self.assertNumQueries(11):
+            self.client.post(url, {"quantity": 1})
+
+    def test_add_to_cart_updates_order_totals(self):
+        self.client.post(
+            reverse("shop:add-to-cart", args=[self.product.pk]),
+            {"quantity": 1}
+        )
+        self.client.post(
+            reverse("shop:add-to-cart", args=[self.product.pk]),
+            {"quantity": 4}
+        )
+        order = Order.objects.get(user=self.user, status="new")
+        self.assertEqual(order.total, 1000)
+        self.assertEqual(order.item_count, 5)
+
     def test_quantity_cant_exceed_stock(self):
         self.client.post(
             reverse("shop:add-to-cart", args=[self.product.pk]),
@@ -263,6 +739,23 @@ class AddToCartTest(CartTestBase):
         item = OrderItem.objects.get(product=self.product)
         self.assertEqual(item.quantity, 20)
 
+    @patch("shop.cart.DatabaseCart.addable_quantity", return_value=20)
+    def test_stock_taken_meanwhile_is_clamped_under_lock(self, addable_quantity):
+        # Another cart reserved 15 units after the view read the product.
+        Product.objects.filter(pk=self.product.pk).update(reserved_quantity=15)
+        url = reverse("shop:add-to-cart", args=[self.product.pk])
+        response = self.client.post(url, {"quantity": 10})
+        messages = [str(message) for message in response.wsgi_request._messages]
+        self.assertEqual(messages, ["5 more items in stock"])
+        self.assertEqual(OrderItem.objects.get(product=self.product).quantity, 5)
+
+        response = self.client.post(url, {"quantity": 1})
+        messages = [str(message) for message in response.wsgi_request._messages]
+        self.assertEqual(messages[-1], "0 more items in stock")
+        self.assertEqual(OrderItem.objects.get(product=self.product).quantity, 5)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 20)
+
     def test_quantity_less_or_zero_doesnt_exist(self):
         self.client.post(
             reverse("shop:add-to-cart", args=[self.product.pk]),
@@ -271,6 +764,52 @@ class AddToCartTest(CartTestBase):
         self.assertFalse(Order.objects.exists())
 
 
+@skipUnless(
+    connection.vendor == "postgresql",
+    "SQLite serializes writers, so it can't exercise concurrent carts."
+)
+class ConcurrentAddToCartTest(TransactionTestCase):
+    clients_count = 20
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username="ConcurrentUser",
+            password="concurrent4567",
+        )
+        category = ProductCategory.objects.create(name="Test_Product_Category")
+        self.product = Product.objects.create(
+            name="Test_Product_1",
+            category=category,
+            stock_quantity=15,
+            price=200,
+        )
+
+    def add_to_cart(self):
+        client = Client()
+        client.force_login(self.user)
+        try:
+            client.post(
+                reverse("shop:add-to-cart", args=[self.product.pk]),
+                {"quantity": 1}
+            )
+        finally:
+            connection.close()
+
+    def test_concurrent_adds_share_one_cart_line(self):
+        threads = [
+            Thread(target=self.add_to_cart) for _ in range(self.clients_count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        order = Order.objects.get(user=self.user, status="new")
+        item = order.items.get()
+        self.assertEqual(item.quantity, 15)
+        self.assertEqual(order.item_count, 15)
+
+
 class CartDetailTest(CartTestBase):
     def test_empty_cart(self):
         response = self.client.get(reverse("shop:cart-detail"))
@@ -304,6 +843,8 @@ class CartUpdateTest(CartTestBase):
         )
         self.item.refresh_from_db()
         self.assertEqual(self.item.quantity, 3)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total, 600)
 
     def test_quantity_more_than_stock(self):
         self.client.post(
@@ -368,6 +909,22 @@ class ConfirmOrderTest(CartTestBase):
         self.assertEqual(order.status, "processing")
         self.assertEqual(self.product.stock_quantity, 15)
 
+    def test_confirmed_order_keeps_price_snapshot(self):
+        order = Order.objects.create(user=self.user, status="new")
+        item = OrderItem.objects.create(
+            order=order,
+            product=self.product,
+            quantity=2,
+        )
+        self.client.post(reverse("shop:order-confirm"))
+        Product.objects.filter(pk=self.product.pk).update(price=999)
+
+        order.refresh_from_db()
+        item.refresh_from_db()
+        self.assertEqual(item.unit_price, 200)
+        self.assertEqual(item.line_total, 400)
+        self.assertEqual(order.total, 400)
+
     def test_confirm_order_no_order(self):
         response = self.client.post(reverse("shop:order-confirm"))
         self.assertRedirects(response, reverse("shop:cart-detail"))
@@ -382,3 +939,266 @@ class ConfirmOrderTest(CartTestBase):
         self.client.post(reverse("shop:order-confirm"))
         order.refresh_from_db()
         self.assertEqual(order.status, "new")
+
+    def test_confirm_order_reports_only_failed_lines(self):
+        other_product = Product.objects.create(
+            name="Test_Product_2",
+            category=self.productcategory,
+            stock_quantity=3,
+            price=100,
+        )
+        order = Order.objects.create(user=self.user, status="new")
+        OrderItem.objects.create(order=order, product=self.product, quantity=5)
+        OrderItem.objects.create(order=order, product=other_product, quantity=4)
+
+        response = self.client.post(reverse("shop:order-confirm"), follow=True)
+        errors = [str(message) for message in response.context["messages"]]
+        self.assertEqual(errors, ["3 items in stock for Test_Product_2"])
+
+        self.product.refresh_from_db()
+        order.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 20)
+        self.assertEqual(order.status, "new")
+
+    def test_confirm_order_query_count_independent_of_lines(self):
+        order = Order.objects.create(user=self.user, status="new")
+        for index in range(10):
+            product = Product.objects.create(
+                name=f"Bulk_Product_{index}",
+                category=self.productcategory,
+                stock_quantity=10,
+                price=10,
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=2)
+
+        with self.assertNumQueries(13):
+            self.client.post(reverse("shop:order-confirm"))
+        self.assertFalse(
+            Product.objects.filter(name__startswith="Bulk_Product_")
+            .exclude(stock_quantity=8)
+            .exists()
+        )
+
+
+class StockReservationTest(CartTestBase):
+    def add_to_cart(self, quantity):
+        return self.client.post(
+            reverse("shop:add-to-cart", args=[self.product.pk]),
+            {"quantity": quantity},
+        )
+
+    def test_add_to_cart_holds_stock(self):
+        self.add_to_cart(5)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 20)
+        self.assertEqual(self.product.reserved_quantity, 5)
+        self.assertEqual(self.product.available_quantity, 15)
+
+    def test_hold_follows_cart_updates(self):
+        self.add_to_cart(5)
+        item = OrderItem.objects.get(product=self.product)
+        self.client.post(reverse("shop:cart-update", args=[item.pk]), {"quantity": 2})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 2)
+
+        self.client.post(reverse("shop:cart-remove", args=[item.pk]))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_held_stock_is_not_available_to_others(self):
+        other_order = Order.objects.create(
+            user=get_user_model().objects.create_user(username="Other", password="x"),
+            status="new",
+        )
+        OrderItem.objects.create(order=other_order, product=self.product, quantity=18)
+        sync_reservations(other_order)
+
+        self.add_to_cart(5)
+        item = OrderItem.objects.get(order__user=self.user, product=self.product)
+        self.assertEqual(item.quantity, 2)
+
+    def test_release_expired_returns_stock(self):
+        self.add_to_cart(5)
+        released = release_expired(now=timezone.now() + timedelta(days=1))
+        self.product.refresh_from_db()
+        self.assertEqual(released, 1)
+        self.assertEqual(self.product.reserved_quantity, 0)
+        self.assertTrue(OrderItem.objects.filter(product=self.product).exists())
+
+    def test_release_expired_keeps_live_holds(self):
+        self.add_to_cart(5)
+        self.assertEqual(release_expired(), 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 5)
+
+    def test_confirm_order_consumes_hold(self):
+        self.add_to_cart(5)
+        self.client.post(reverse("shop:order-confirm"))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 15)
+        self.assertEqual(self.product.reserved_quantity, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_deleting_order_returns_stock(self):
+        self.add_to_cart(5)
+        Order.objects.get(user=self.user).delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 0)
+
+        self.add_to_cart(2)
+        Order.objects.filter(user=self.user).delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 0)
+
+        self.add_to_cart(3)
+        self.user.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 0)
+
+    def test_reconcile_reserved_quantities(self):
+        self.add_to_cart(5)
+        Product.objects.filter(pk=self.product.pk).update(reserved_quantity=11)
+        reconcile_reserved_quantities()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved_quantity, 5)
+
+
+@override_settings(CART_BACKEND="session")
+class SessionCartTest(CartTestBase):
+    def add_to_cart(self, quantity, product=None):
+        product = product or self.product
+        return self.client.post(
+            reverse("shop:add-to-cart", args=[product.pk]),
+            {"quantity": quantity},
+        )
+
+    def test_add_to_cart_writes_no_order(self):
+        self.add_to_cart(2)
+        self.add_to_cart(3)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+        response = self.client.get(reverse("shop:cart-detail"))
+        [item] = response.context["items"]
+        self.assertEqual(item.product, self.product)
+        self.assertEqual(item.quantity, 5)
+        self.assertEqual(response.context["total"], 1000)
+
+    def test_add_to_cart_clamps_to_available(self):
+        self.add_to_cart(15)
+        self.add_to_cart(10)
+        response = self.client.get(reverse("shop:cart-detail"))
+        self.assertEqual(response.context["items"][0].quantity, 20)
+
+    def test_cart_detail_loads_products_in_one_query(self):
+        for index in range(5):
+            product = Product.objects.create(
+                name=f"Session_Product_{index}",
+                category=self.productcategory,
+                stock_quantity=10,
+                price=10,
+            )
+            self.add_to_cart(1, product)
+        # session, user, products
+        with self.assertNumQueries(3):
+            self.client.get(reverse("shop:cart-detail"))
+
+    def test_update_and_remove(self):
+        self.add_to_cart(5)
+        url = reverse("shop:cart-update", args=[self.product.pk])
+        self.client.post(url, {"quantity": 30})
+        response = self.client.get(reverse("shop:cart-detail"))
+        self.assertEqual(response.context["items"][0].quantity, 20)
+
+        self.client.post(reverse("shop:cart-remove", args=[self.product.pk]))
+        response = self.client.get(reverse("shop:cart-detail"))
+        self.assertEqual(response.context["items"], [])
+
+    def test_update_missing_line(self):
+        response = self.client.post(
+            reverse("shop:cart-update", args=[self.product.pk]), {"quantity": 1}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_confirm_order_persists_cart(self):
+        self.add_to_cart(5)
+        self.client.post(reverse("shop:order-confirm"))
+
+        order = Order.objects.get(user=self.user)
+        item = order.items.get()
+        self.product.refresh_from_db()
+        self.assertEqual(order.status, "processing")
+        self.assertEqual(order.total, 1000)
+        self.assertEqual(order.item_count, 5)
+        self.assertEqual(item.unit_price, 200)
+        self.assertEqual(item.line_total, 1000)
+        self.assertEqual(self.product.stock_quantity, 15)
+
+        response = self.client.get(reverse("shop:cart-detail"))
+        self.assertEqual(response.context["items"], [])
+
+    def test_confirm_order_out_of_stock_keeps_cart(self):
+        self.add_to_cart(5)
+        Product.objects.filter(pk=self.product.pk).update(stock_quantity=3)
+
+        response = self.client.post(reverse("shop:order-confirm"), follow=True)
+        errors = [str(message) for message in response.context["messages"]]
+        self.assertEqual(errors, ["3 items in stock for Test_Product_1"])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(response.context["items"][0].quantity, 5)
+
+
+@override_settings(CART_BACKEND="cache")
+class CacheCartTest(SessionCartTest):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_concurrent_changes_keep_both(self):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        first, second = CacheCart(request), CacheCart(request)
+
+        with first.changing():
+            quantities = first.get_quantities()
+            other = Thread(target=second.add, args=(self.product, 2))
+            other.start()
+            other.join(0.2)
+            self.assertTrue(other.is_alive())
+            quantities[self.product.pk] = 3
+            first.set_quantities(quantities)
+        other.join()
+        self.assertEqual(first.get_quantities(), {self.product.pk: 5})
+
+    def lock_key(self):
+        return f"shop:cart:{self.user.pk}:lock"
+
+    def test_outlived_lock_isnt_released_by_its_old_holder(self):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        with CacheCart(request).changing():
+            # The lock expired and another change took it.
+            cache.set(self.lock_key(), "next holder")
+        self.assertEqual(cache.get(self.lock_key()), "next holder")
+
+    @patch("shop.cart.CART_LOCK_TIMEOUT", 0.05)
+    def test_busy_cart_gives_up(self):
+        cache.set(self.lock_key(), "stuck")
+        response = self.add_to_cart(1)
+        self.assertRedirects(response, reverse("shop:cart-detail"), fetch_redirect_response=False)
+        messages = [str(message) for message in response.wsgi_request._messages]
+        self.assertEqual(messages, ["Your cart is being changed elsewhere. Try again."])
+        self.assertIsNone(cache.get(f"shop:cart:{self.user.pk}"))
+
+    def test_order_is_placed_outside_the_lock(self):
+        self.add_to_cart(5)
+        place_order = CacheCart.place_order
+
+        def unlocked_place_order(cart, quantities):
+            self.assertIsNone(cache.get(self.lock_key()))
+            return place_order(cart, quantities)
+
+        with patch.object(CacheCart, "place_order", unlocked_place_order):
+            self.client.post(reverse("shop:order-confirm"))
+        self.assertEqual(Order.objects.get(user=self.user).item_count, 5)
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import path
 
+from . import async_views
 from .views import (
     index,
     ProductListView,
@@ -8,6 +10,8 @@ from .views import (
     ProductUpdateView,
     ProductDeleteView,
     OrderListView,
+    OrderExportView,
+    OrderBulkStatusView,
     ProductCategoryListView,
     ProductCategoryDetailView,
     ProductCategoryCreateView,
@@ -36,6 +40,10 @@ urlpatterns = [
 
     path('orders/', OrderListView.as_view(),
          name='order-list'),
+    path('orders/export/', OrderExportView.as_view(),
+         name='order-export'),
+    path('orders/bulk-status/', OrderBulkStatusView.as_view(),
+         name='order-bulk-status'),
     path('orders/<int:pk>/', OrderDetailView.as_view(),
          name='order-detail'),
 
@@ -62,4 +70,20 @@ urlpatterns = [
          name="cart-remove"),
 ]
 
+async_catalog_urlpatterns = [
+    path('', async_views.index, name='index'),
+    path('products/', async_views.ProductListView.as_view(),
+         name='product-list'),
+    path('products/<int:pk>/', async_views.ProductDetailView.as_view(),
+         name='product-detail'),
+    path('categories/', async_views.ProductCategoryListView.as_view(),
+         name='productcategory-list'),
+    path('categories/<int:pk>/', async_views.ProductCategoryDetailView.as_view(),
+         name='productcategory-detail'),
+]
+
+# Earlier patterns win, so these replace the synchronous catalog views.
+if settings.ASYNC_CATALOG_VIEWS:
+    urlpatterns = async_catalog_urlpatterns + urlpatterns
+
 app_name = "shop"
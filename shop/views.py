@@ -1,18 +1,30 @@
+from functools import wraps
+
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db import transaction
-from django.db.models import F, Sum, Q
+from django.db.models import Count, F, Sum, Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse_lazy, reverse
 from django.views import View, generic
-from django.contrib.auth import get_user_model
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 
-from shop.mixins import OrderFilterMixin, ProductFilterMixin, BackUrlDetailMixin
-from shop.models import Product, Order, ProductCategory, OrderItem
+from shop.mixins import (
+    OrderFilterMixin,
+    ProductFilterMixin,
+    BackUrlDetailMixin,
+    CursorPaginationMixin,
+)
+from shop.cart import CartBusy, get_cart
+from shop.counters import dashboard_counts
+from shop.exports import EXPORT_COLUMNS, EXPORT_FORMATS, render_export
+from shop.models import Product, Order, ProductCategory, OrderItem, OutOfStock
+from shop.pagination import CachedCountPaginator
 from shop.forms import (
     ProductForm,
+    OrderBulkStatusForm,
     OrderStatusUpdateForm,
     ProductCategorySearchForm,
     ProductCategoryForm
@@ -21,25 +33,23 @@ from shop.forms import (
 
 @login_required
 def index(request):
-    context = {
-        "num_categories": ProductCategory.objects.count(),
-        "num_products": Product.objects.count(),
-        "num_users": get_user_model().objects.count(),
-        "num_orders": Order.objects.count(),
-        "num_myorders": Order.objects.filter(user=request.user).count() if request.user.is_authenticated else 0,
-    }
+    context = dashboard_counts(request.user)
     return render(request, 'shop/index.html', context=context)
 
 
-class ProductListView(LoginRequiredMixin, ProductFilterMixin, generic.ListView):
+class ProductListView(LoginRequiredMixin, CursorPaginationMixin, ProductFilterMixin, generic.ListView):
     model = Product
     paginate_by = 10
+    paginator_class = CachedCountPaginator
     ordering = ["id"]
+    cursor_ordering = ("id",)
+    read_only = True
 
 
 class ProductDetailView(LoginRequiredMixin, BackUrlDetailMixin, generic.DetailView):
     model = Product
     queryset = Product.objects.select_related("category")
+    read_only = True
 
 
 class ProductCreateView(LoginRequiredMixin, UserPassesTestMixin, generic.CreateView):
@@ -59,6 +69,20 @@ class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, generic.UpdateV
     def test_func(self):
         return self.request.user.is_employee or self.request.user.is_staff
 
+    def form_valid(self, form):
+        with transaction.atomic():
+            response = super().form_valid(form)
+            if "price" in form.changed_data:
+                OrderItem.objects.filter(
+                    order__status="new",
+                    product=self.object
+                ).snapshot_prices()
+                Order.objects.filter(
+                    status="new",
+                    items__product=self.object
+                ).update_totals()
+        return response
+
 
 class ProductDeleteView(LoginRequiredMixin, UserPassesTestMixin, generic.DeleteView):
     model = Product
@@ -68,13 +92,75 @@ class ProductDeleteView(LoginRequiredMixin, UserPassesTestMixin, generic.DeleteV
         return self.request.user.is_employee or self.request.user.is_staff
 
 
-class OrderListView(LoginRequiredMixin, UserPassesTestMixin, OrderFilterMixin, generic.ListView):
+class OrderListView(LoginRequiredMixin, UserPassesTestMixin, CursorPaginationMixin, OrderFilterMixin, generic.ListView):
     model = Order
     paginate_by = 10
+    paginator_class = CachedCountPaginator
+    cursor_ordering = ("-created_at", "-id")
+    read_only = True
+
+    def test_func(self):
+        return self.request.user.is_employee or self.request.user.is_staff
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["bulk_form"] = OrderBulkStatusForm()
+        return context
+
 
+class OrderBulkStatusView(LoginRequiredMixin, UserPassesTestMixin, OrderFilterMixin, View):
+    # Posted from the order list with its filter in the query string, which
+    # "All orders matching the filter" applies to.
     def test_func(self):
         return self.request.user.is_employee or self.request.user.is_staff
 
+    def post(self, request, *args, **kwargs):
+        form = OrderBulkStatusForm(request.POST)
+        if form.is_valid():
+            self.apply(form)
+        else:
+            for errors in form.errors.values():
+                messages.error(request, errors[0])
+        return redirect(f"{reverse('shop:order-list')}?{request.GET.urlencode()}")
+
+    def apply(self, form):
+        if form.cleaned_data["scope"] == "selected":
+            orders = Order.objects.filter(pk__in=form.cleaned_data["orders"])
+        else:
+            orders = self.get_queryset()
+            if not self.filter_form.is_valid():
+                messages.error(self.request, "Fix the order filter before applying it.")
+                return
+
+        status = form.cleaned_data["status"]
+        changed = orders.set_status(status)
+        messages.success(
+            self.request,
+            f"{changed} orders marked as {dict(Order.STATUS_CHOICES)[status].lower()}."
+        )
+
+
+class OrderExportView(LoginRequiredMixin, UserPassesTestMixin, OrderFilterMixin, View):
+    def test_func(self):
+        return self.request.user.is_employee or self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        kind = request.GET.get("kind")
+        if kind not in EXPORT_COLUMNS:
+            kind = "orders"
+        export_format = request.GET.get("format")
+        if export_format not in EXPORT_FORMATS:
+            export_format = "csv"
+
+        response = StreamingHttpResponse(
+            render_export(self.get_queryset(), kind, export_format),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{kind}.{export_format}"'
+        )
+        return response
+
 
 class OrderDetailView(LoginRequiredMixin, UserPassesTestMixin, BackUrlDetailMixin, generic.DetailView):
     model = Order
@@ -106,6 +192,8 @@ class OrderDetailView(LoginRequiredMixin, UserPassesTestMixin, BackUrlDetailMixi
 class ProductCategoryListView(LoginRequiredMixin, generic.ListView):
     model = ProductCategory
     paginate_by = 10
+    paginator_class = CachedCountPaginator
+    read_only = True
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super(ProductCategoryListView, self).get_context_data(**kwargs)
@@ -116,7 +204,9 @@ class ProductCategoryListView(LoginRequiredMixin, generic.ListView):
         return context
 
     def get_queryset(self):
-        queryset = ProductCategory.objects.all().order_by("id")
+        queryset = ProductCategory.objects.annotate(
+            product_count=Count("products")
+        ).order_by("id")
         name = self.request.GET.get("name")
         if name:
             queryset = queryset.filter(name__icontains=name)
@@ -125,6 +215,8 @@ class ProductCategoryListView(LoginRequiredMixin, generic.ListView):
 
 class ProductCategoryDetailView(LoginRequiredMixin, BackUrlDetailMixin, generic.DetailView):
     model = ProductCategory
+    read_only = True
+
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super(ProductCategoryDetailView, self).get_context_data(**kwargs)
         context["products"] = Product.objects.filter(category=self.object).select_related("category")
@@ -157,122 +249,103 @@ class ProductCategoryDeleteView(LoginRequiredMixin, UserPassesTestMixin, generic
         return self.request.user.is_employee or self.request.user.is_staff
 
 
+def retry_if_cart_busy(view):
+    # Another change of the same cache cart held its lock for too long.
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except CartBusy:
+            messages.error(request, "Your cart is being changed elsewhere. Try again.")
+            return redirect("shop:cart-detail")
+    return wrapper
+
+
 @login_required
+@retry_if_cart_busy
 def add_to_cart(request, pk):
     product = get_object_or_404(Product, pk=pk)
     quantity = int(request.POST.get("quantity", 1))
 
     next_url = request.GET.get("next") or reverse("shop:product-list")
 
-    if quantity > product.stock_quantity:
-        quantity = product.stock_quantity
+    cart = get_cart(request)
+    addable = cart.addable_quantity(product)
+    if quantity > addable:
+        quantity = addable
         messages.warning(
             request,
-            f"{product.stock_quantity} items in stock"
+            f"{addable} items in stock"
         )
 
     if quantity <= 0:
         messages.error(request, "There must be at least 1.")
         return redirect(next_url)
 
-    order, _ = Order.objects.get_or_create(
-        user=request.user,
-        status="new"
-    )
-
-    order_item, created = OrderItem.objects.get_or_create(
-        order=order,
-        product=product,
-    )
-
-    if created:
-        order_item.quantity = quantity
-    else:
-        new_quantity = order_item.quantity + quantity
-        if new_quantity > product.stock_quantity:
-            order_item.quantity = product.stock_quantity
-            messages.warning(
-                request,
-                f"{product.stock_quantity} items in stock"
-            )
-        else:
-            order_item.quantity = new_quantity
-    order_item.save()
+    added = cart.add(product, quantity)
+    if added < quantity:
+        # Another cart took the stock since it was read above.
+        messages.warning(
+            request,
+            f"{added} more items in stock"
+        )
 
     return redirect(next_url)
 
 
 @login_required
 def cart_detail(request):
-    order = Order.objects.filter(
-        user=request.user,
-        status="new"
-    ).prefetch_related("items__product").first()
-
-    if order and order.status != "new":
-        order = None
-
-    return render(request, 'shop/cart_detail.html', {'order': order})
+    return render(
+        request,
+        'shop/cart_detail.html',
+        get_cart(request).get_context_data()
+    )
 
 
 @login_required
 @require_POST
+@retry_if_cart_busy
 def update_cart(request, pk):
-    item = get_object_or_404(
-        OrderItem,
-        pk=pk,
-        order__user=request.user,
-        order__status="new"
-    )
+    cart = get_cart(request)
+    item = cart.get_line(pk)
 
     quantity = int(request.POST.get("quantity", 1))
 
     if quantity <= 0:
-        item.delete()
+        cart.remove(item)
         messages.info(request, f"{item.product.name} removed from cart.")
         return redirect("shop:cart-detail")
 
-    if quantity > item.product.stock_quantity:
-        quantity = item.product.stock_quantity
+    available = cart.max_quantity(item)
+    if quantity > available:
+        quantity = available
         messages.warning(
             request,
-            f"{item.product.stock_quantity} items in stock"
+            f"{available} items in stock"
         )
 
-    item.quantity = quantity
-    item.save()
+    cart.set_quantity(item, quantity)
 
     return redirect("shop:cart-detail")
 
 
 @login_required
 @require_POST
+@retry_if_cart_busy
 def confirm_order(request):
-    order = Order.objects.filter(
-        user=request.user,
-        status="new"
-    ).prefetch_related("items__product").first()
-
-    if not order:
-        messages.error(request, "No order found.")
-        return redirect("shop:cart-detail")
-
-    for item in order.items.all():
-        if item.quantity > item.product.stock_quantity:
+    try:
+        order = get_cart(request).checkout()
+    except OutOfStock as error:
+        for product in error.products:
             messages.error(
                 request,
-                f"{item.product.stock_quantity} items in stock for {item.product.name}"
+                f"{error.available[product.pk]} items in stock for {product.name}"
             )
-            return redirect("shop:cart-detail")
-
-    with transaction.atomic():
-        for item in order.items.all():
-            product = item.product
-            product.stock_quantity -= item.quantity
-            product.save()
+        return redirect("shop:cart-detail")
 
-        order.status = "processing"
-        order.save()
+    if not order:
+        messages.error(request, "No order found.")
+        return redirect("shop:cart-detail")
 
     messages.success(request, "Your order was successfully processed.")
     return redirect("accounts:myorder-list")
@@ -280,13 +353,8 @@ def confirm_order(request):
 
 @login_required
 @require_POST
+@retry_if_cart_busy
 def remove_from_cart(request, pk):
-    item = get_object_or_404(
-        OrderItem,
-        pk=pk,
-        order__user=request.user,
-        order__status="new"
-    )
-
-    item.delete()
+    cart = get_cart(request)
+    cart.remove(cart.get_line(pk))
     return redirect("shop:cart-detail")